@@ -1,4 +1,5 @@
 from api.albums.ressources import AlbumList, Album, PictureList
+from api.representation import register_json
 from api.request_helper import charset_fix_decorator
 from flask import Blueprint
 import flask_restful
@@ -8,6 +9,7 @@ def album_blueprint():
     album_bp = Blueprint("albums", __name__)
 
     album_api = flask_restful.Api(decorators=[charset_fix_decorator])
+    register_json(album_api)
     album_api.init_app(album_bp)
 
     album_api.add_resource(AlbumList, "/")
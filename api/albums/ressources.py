@@ -1,8 +1,8 @@
 from api.albums import fieldsets
-from api.request_helper import limit_query
+from api.request_helper import paginate_query, total_count_headers
 from api.users import authorization
 from flask.ext.restful import abort
-from flask.ext.restful_fieldsets import marshal_with_fieldset
+from api.serializers import marshal_with_fieldset, eager_load
 from flask.ext import restful
 
 from db_backend import mapping
@@ -13,10 +13,10 @@ class AlbumList(restful.Resource):
     @authorization.require_login
     @marshal_with_fieldset(fieldsets.AlbumFields)
     def get(self):
-        albums_qry = connection.session.query(mapping.DbPixAlbums).order_by(mapping.DbPixAlbums.time.desc())
-        albums_qry = limit_query(albums_qry)
-
-        return albums_qry.all()
+        albums_qry = eager_load(connection.session.query(mapping.DbPixAlbums), fieldsets.AlbumFields)
+        albums, headers = paginate_query(albums_qry, (mapping.DbPixAlbums.time, mapping.DbPixAlbums.a_id))
+        headers.update(total_count_headers(mapping.album_counts.count, exact=False))
+        return albums, 200, headers
 
 
 class Album(restful.Resource):
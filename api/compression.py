@@ -0,0 +1,234 @@
+"""Compression of the api responses.
+
+The text responses (json, the calendar feed) are compressed with gzip or
+deflate if the client accepts it. Responses are only compressed above a
+minimum size, streamed responses are compressed chunk by chunk while
+they are sent.
+
+Resources with responses that are the same for many clients (categories,
+locations, the topic list of the guests) mark them with keep_compressed
+or the precompressed decorator: their compressed bytes are kept in a
+process wide cache keyed by the digest of the uncompressed body, so the
+same body is compressed only once. Kept responses are not streamed.
+"""
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request
+
+
+# The encodings in the order they are preferred, with their zlib wbits.
+_encodings = (("gzip", 16 + zlib.MAX_WBITS),
+              ("deflate", zlib.MAX_WBITS))
+
+_compressible_types = frozenset(("application/json", "application/javascript", "application/xml"))
+
+
+def is_compressible(mimetype):
+    """Check if responses of a mimetype are worth to be compressed.
+
+    :type mimetype: str
+    :rtype: bool
+    """
+    return mimetype is not None and (mimetype.startswith("text/") or mimetype in _compressible_types)
+
+
+def negotiate_encoding(accept_encodings):
+    """Select the content encoding for a request.
+
+    :type accept_encodings: werkzeug.datastructures.Accept
+    :param accept_encodings: The parsed Accept-Encoding header.
+    :rtype: str
+    :return: "gzip", "deflate" or None if the client accepts neither.
+    """
+    best = None
+    best_quality = 0
+    for name, wbits in _encodings:
+        quality = accept_encodings[name]
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def _compressor(encoding, level):
+    return zlib.compressobj(level, zlib.DEFLATED, dict(_encodings)[encoding])
+
+
+def compress(data, encoding, level=6):
+    """Compress a body.
+
+    :type data: bytes
+    :type encoding: str
+    :param encoding: "gzip" or "deflate".
+    :type level: int
+    :rtype: bytes
+    """
+    compressor = _compressor(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def iter_compressed(chunks, encoding, level=6, charset="utf-8"):
+    """Compress the chunks of a streamed body.
+
+    Every chunk is flushed, so the client can decode what was sent so far.
+    The chunks are closed when the compressed stream is closed.
+
+    :type chunks: collections.Iterable
+    :param chunks: The bytes (or str) chunks of the body.
+    :type encoding: str
+    :type level: int
+    :type charset: str
+    :param charset: The charset to encode str chunks.
+    :rtype: collections.Iterable[bytes]
+    """
+    compressor = _compressor(encoding, level)
+    try:
+        for chunk in chunks:
+            if not isinstance(chunk, bytes):
+                chunk = chunk.encode(charset)
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+class CompressedCache(object):
+    """A LRU cache of compressed bodies.
+    """
+
+    def __init__(self, size=128):
+        """
+        :type size: int
+        :param size: The maximum number of kept bodies.
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._bodies = OrderedDict()
+
+    def get(self, data, encoding, level):
+        """Get the compressed body, compress it if it is not cached yet.
+
+        :type data: bytes
+        :type encoding: str
+        :type level: int
+        :rtype: bytes
+        """
+        key = (encoding, level, hashlib.sha1(data).digest(), len(data))
+        with self._lock:
+            compressed = self._bodies.get(key)
+            if compressed is not None:
+                self._bodies.move_to_end(key)
+                self.hits += 1
+                return compressed
+            self.misses += 1
+
+        compressed = compress(data, encoding, level)
+        with self._lock:
+            self._bodies[key] = compressed
+            while len(self._bodies) > self.size:
+                self._bodies.popitem(last=False)
+        return compressed
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        :rtype: dict
+        """
+        return {"size": len(self._bodies),
+                "hits": self.hits,
+                "misses": self.misses}
+
+
+compressed_cache = CompressedCache()
+
+
+def keep_compressed():
+    """Keep the compressed body of the current response in the cache.
+    """
+    g.keep_compressed = True
+
+
+def precompressed(func):
+    """A decorator to keep the compressed responses of the decorated endpoint.
+
+    :param func: The endpoint to decorate.
+    """
+
+    @wraps(func)
+    def nufun(*args, **kwargs):
+        keep_compressed()
+        return func(*args, **kwargs)
+
+    return nufun
+
+
+def compress_response(resp, min_size=500, level=6):
+    """Compress a response if the client of the current request accepts it.
+
+    :type resp: flask.Response
+    :type min_size: int
+    :param min_size: The minimal body size of a response to compress, streamed
+        responses of unknown size are always compressed.
+    :type level: int
+    :param level: The zlib compression level.
+    :rtype: flask.Response
+    """
+    if not is_compressible(resp.mimetype) or resp.direct_passthrough or "Content-Encoding" in resp.headers:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    if resp.status_code < 200 or resp.status_code in (204, 304) or request.method == "HEAD":
+        return resp
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return resp
+
+    keep = getattr(g, "keep_compressed", False)
+    if resp.is_streamed and not keep:
+        if resp.content_length is not None and resp.content_length < min_size:
+            return resp
+        resp.response = iter_compressed(resp.response, encoding, level, resp.charset)
+        resp.headers.pop("Content-Length", None)
+    else:
+        data = resp.get_data()
+        if len(data) < min_size:
+            return resp
+        resp.set_data(compressed_cache.get(data, encoding, level) if keep else compress(data, encoding, level))
+    resp.headers["Content-Encoding"] = encoding
+    return resp
+
+
+def setup_compression(app, min_size=500, level=6, cache_size=128):
+    """Set up the response compression for this app.
+
+    The app config values COMPRESS_MIN_SIZE and COMPRESS_LEVEL override
+    the given defaults, COMPRESS_LEVEL 0 turns the compression off.
+
+    :param app: The Flask app
+    :param min_size: The minimal body size of a response to compress.
+    :param level: The zlib compression level.
+    :param cache_size: The maximum number of kept compressed bodies.
+    """
+    global compressed_cache
+    app.config.setdefault("COMPRESS_MIN_SIZE", min_size)
+    app.config.setdefault("COMPRESS_LEVEL", level)
+    compressed_cache = CompressedCache(cache_size)
+
+    @app.after_request
+    def compress_after_request(resp):
+        if app.config["COMPRESS_LEVEL"] <= 0:
+            return resp
+        return compress_response(resp, app.config["COMPRESS_MIN_SIZE"], app.config["COMPRESS_LEVEL"])
@@ -0,0 +1,99 @@
+"""Conditional GET support for the resources.
+
+A resource declares a validator: a cheap callable (e.g. an aggregate
+query over the rows of the topic list) that returns the version of the
+data the resource would send. The version is turned into a weak ETag (together
+with the requested url and the permissions of the user). The validator
+can give the time of the last change for Last-Modified as well, but only
+if every change (deletions included) advances it.
+
+If the client already holds the current version (If-None-Match or
+If-Modified-Since) the request is answered with 304 Not Modified before
+the resource queries and serializes the data.
+"""
+import calendar
+import hashlib
+from functools import wraps
+
+from api.users import authorization
+from flask import current_app, request
+from flask.ext.restful import unpack
+from werkzeug.http import quote_etag, http_date
+from werkzeug.wrappers import BaseResponse
+
+
+def make_etag(version):
+    """Make the ETag of a version for the current request and user.
+
+    :param version: The version from the validator, its repr has to
+        change with the data.
+    :rtype: str
+    :return: The unquoted ETag.
+    """
+    user = authorization.current_user
+    key = (request.full_path, getattr(user, "id", None), sorted(user.perm_masks), version)
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+def _timestamp(date_value):
+    return calendar.timegm(date_value.utctimetuple())
+
+
+def is_not_modified(etag, last_modified=None):
+    """Check if the client of the current request holds the current version.
+
+    If-None-Match takes precedence over If-Modified-Since.
+
+    :type etag: str
+    :param etag: The unquoted weak ETag of the current version.
+    :type last_modified: int
+    :param last_modified: The timestamp of the last change, None if unknown.
+    :rtype: bool
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return int(last_modified) <= _timestamp(request.if_modified_since)
+    return False
+
+
+def _validator_headers(etag, last_modified):
+    headers = {"ETag": quote_etag(etag, weak=True)}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(int(last_modified))
+    return headers
+
+
+def conditional(validator):
+    """A decorator to answer conditional GET requests of a resource method.
+
+    Place it above marshal_with_fieldset, the validator is called with the
+    arguments of the decorated method.
+
+    :type validator: callable
+    :param validator: Returns the version of the data and the timestamp of
+        its last change (or None) as tuple.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def nufun(*args, **kwargs):
+            version, last_modified = validator(*args, **kwargs)
+            etag = make_etag(version)
+            headers = _validator_headers(etag, last_modified)
+            if is_not_modified(etag, last_modified):
+                return current_app.response_class(status=304, headers=headers)
+
+            resp = func(*args, **kwargs)
+            if isinstance(resp, BaseResponse):
+                if resp.status_code == 200:
+                    resp.headers.extend(headers)
+                return resp
+            data, code, resp_headers = unpack(resp)
+            if code == 200:
+                resp_headers = dict(resp_headers or {}, **headers)
+            return data, code, resp_headers
+
+        return nufun
+
+    return decorator
@@ -1,4 +1,6 @@
-from api.events.ressources import EventList, EventCategoryList, LocationList, Event, Organizer, OrganizerList
+from api.events.ressources import EventList, EventFeed, EventCategoryList, LocationList, Event, Organizer, \
+    OrganizerList
+from api.representation import register_json
 from api.request_helper import charset_fix_decorator
 from flask import Blueprint
 import flask_restful
@@ -8,9 +10,12 @@ def event_blueprint():
     event_bp = Blueprint("events", __name__)
 
     event_api = flask_restful.Api(decorators=[charset_fix_decorator])
+    register_json(event_api)
     event_api.init_app(event_bp)
 
     event_api.add_resource(EventList,"/", "/category/<int:category_id>", "/category/<category_tag>")
+    event_api.add_resource(EventFeed, "/feed.ics", "/category/<int:category_id>/feed.ics",
+                           "/category/<category_tag>/feed.ics")
     event_api.add_resource(Event, "/<int:event_id>")
     event_api.add_resource(EventCategoryList, "/categories")
     event_api.add_resource(LocationList, "/locations")
@@ -20,6 +20,7 @@ class EventInterval():
     day after the start (computed or given).
     """
     max_interval = timedelta(days=100)
+    default_months = 1
 
     def __init__(self):
         self._start = None
@@ -45,10 +46,10 @@ class EventInterval():
             if end is None:
                 start = date.today() + relativedelta(day=1)
             else:
-                start = end - relativedelta(day=1, months=+1)
+                start = end - relativedelta(day=1, months=+self.default_months)
 
         if end is None:
-            end = start + relativedelta(months=+1)
+            end = start + relativedelta(months=+self.default_months)
 
         end = datetime.combine(end, time(tzinfo=timezone.utc))
         start = datetime.combine(start, time(tzinfo=timezone.utc))
@@ -85,6 +86,16 @@ class EventInterval():
         return self._end
 
 
+class FeedInterval(EventInterval):
+    """The date interval of the calendar feed.
+
+    It is computed like the EventInterval, but the default is one year
+    and the interval may be wider.
+    """
+    max_interval = timedelta(days=400)
+    default_months = 12
+
+
 def _resolve_category(fn):
     @wraps(fn)
     def nufun(*args, **kwargs):
@@ -1,42 +1,74 @@
-from api.events.request_parsing import EventInterval, _resolve_category
-from api.request_helper import limit_query, limit_list
+from api.events.request_parsing import EventInterval, FeedInterval, _resolve_category
+from api.request_helper import limit_query, limit_list, limit_iterable
 from api.users import authorization
 from api.events import fieldsets
 from flask.ext import restful
 
 from db_backend import mapping
 from db_backend.mapping.config import connection
-from db_backend.utils.events import EventCategory
+from db_backend.utils.events import EventCategory, merge_event_instances
+from db_backend.utils.ical import iter_calendar
+from flask import Response
 from flask.ext.restful import abort
-from flask.ext.restful_fieldsets import marshal_with_fieldset
+from api.serializers import marshal_with_fieldset, eager_load
+from api.compression import precompressed
+from api.conditional import conditional
 from sqlalchemy.orm import joinedload
 
 
+def _event_version(interval_cls):
+    def version(resource, category=None):
+        interval = interval_cls()
+        return mapping.DbEvents.revision_between(interval.start, interval.end,
+                                                 category.id if category is not None else None,
+                                                 authorization.current_user.perm_masks), None
+
+    return version
+
+
 class EventList(restful.Resource):
-    @marshal_with_fieldset(fieldsets.EventFields)
     @_resolve_category
+    @conditional(_event_version(EventInterval))
+    @marshal_with_fieldset(fieldsets.EventFields)
     def get(self, category=None):
         interval = EventInterval()
         print("%s, %s" % (interval.start, interval.end))
 
-        event_qry = mapping.DbEvents.query_between(interval.start,
-                                                   interval.end)
-        event_qry = event_qry.options(joinedload(mapping.DbEvents.topic).joinedload(mapping.DbTopics.forum))
-        event_qry = event_qry.options(joinedload(mapping.DbEvents.location))
-        if category is not None:
-            event_qry = event_qry.filter(mapping.DbEvents.category == category.id)
+        event_ids = mapping.DbEvents.ids_between(interval.start, interval.end,
+                                                 category.id if category is not None else None)
+        if not len(event_ids):
+            return []
+
+        event_qry = connection.session.query(mapping.DbEvents).filter(mapping.DbEvents.event_id.in_(event_ids)) \
+            .filter(mapping.DbEvents.readable_by(authorization.current_user.perm_masks))
+        event_qry = eager_load(event_qry.options(joinedload(mapping.DbEvents.topic)), fieldsets.EventFields)
+
+        return limit_iterable(merge_event_instances(event_qry, interval.start, interval.end))
+
+
+class EventFeed(restful.Resource):
+    @_resolve_category
+    @conditional(_event_version(FeedInterval))
+    def get(self, category=None):
+        interval = FeedInterval()
 
-        event_list = []
-        for event in event_qry:
-            if not event.topic.forum.can_read(authorization.current_user.perm_masks):
-                continue
-            event_list.extend(event.instances_between(interval.start,
-                                                      interval.end))
+        event_ids = mapping.DbEvents.ids_between(interval.start, interval.end,
+                                                 category.id if category is not None else None)
+        events = []
+        if len(event_ids):
+            event_qry = connection.session.query(mapping.DbEvents).filter(mapping.DbEvents.event_id.in_(event_ids)) \
+                .filter(mapping.DbEvents.readable_by(authorization.current_user.perm_masks))
+            event_qry = event_qry.options(joinedload(mapping.DbEvents.topic))
+            event_qry = event_qry.options(joinedload(mapping.DbEvents.location))
+            events = event_qry.order_by(mapping.DbEvents.start, mapping.DbEvents.event_id).all()
 
-        return limit_list(event_list)
+        name = "eXma Events" if category is None else "eXma Events: %s" % category.name
+        return Response(iter_calendar(events, name), mimetype="text/calendar",
+                        headers={"Content-Disposition": "inline; filename=feed.ics"})
 
 
 class EventCategoryList(restful.Resource):
+    @precompressed
     @marshal_with_fieldset(fieldsets.EventCategoryFields)
     def get(self):
         return limit_list(EventCategory.all_categories())
@@ -55,9 +87,10 @@ class Event(restful.Resource):
 
 
 class LocationList(restful.Resource):
+    @precompressed
     @marshal_with_fieldset(fieldsets.EventLocationFields)
     def get(self):
-        location_qry = connection.session.query(mapping.DbLocations)
+        location_qry = eager_load(connection.session.query(mapping.DbLocations), fieldsets.EventLocationFields)
         return limit_query(location_qry).all()
 
 
@@ -73,7 +106,7 @@ class Location(restful.Resource):
 class OrganizerList(restful.Resource):
     @marshal_with_fieldset(fieldsets.OrganizerField)
     def get(self):
-        organizer_query = connection.session.query(mapping.DbOrganizers)
+        organizer_query = eager_load(connection.session.query(mapping.DbOrganizers), fieldsets.OrganizerField)
         return limit_query(organizer_query).all()
 
 
@@ -1,4 +1,4 @@
-from flask import url_for, request
+from flask import url_for, request, g, current_app
 from flask.ext.restful import fields, marshal
 from flask.ext.restful.fields import to_marshallable_type
 
@@ -43,8 +43,50 @@ class PixmaUrl(fields.Raw):
         :return: The absolute url for the image.
         :rtype: str
         """
-        if self.format_type is None:
-            path = url_for("send_picture", pic_id=value).lstrip("/")
+        prefix, suffix = pixma_url_template(self.format_type)
+        return "%s%d%s" % (prefix, int(value), suffix)
+
+
+# A picture id that is replaced by the real id in the url templates.
+_PIC_ID_PLACEHOLDER = 1234567890
+
+
+def _build_pixma_url_template(format_type, root):
+    if format_type is None:
+        path = url_for("pixma.send_picture", pic_id=_PIC_ID_PLACEHOLDER)
+    else:
+        path = url_for("pixma.send_picture", pic_id=_PIC_ID_PLACEHOLDER, type_string=format_type)
+    if root is not None:
+        path = "/".join((root.rstrip("/"), path.lstrip("/")))
+    prefix, suffix = path.split(str(_PIC_ID_PLACEHOLDER), 1)
+    return prefix, suffix
+
+
+def pixma_url_template(format_type=None):
+    """Get the template of the picture urls of the given format.
+
+    The urls are absolute to the url root of the request by default, the
+    templates are resolved once per request then. With the app config
+    PIXMA_URL_BASE (e.g. the url of a CDN) the urls start with this base
+    instead, with PIXMA_URL_RELATIVE the urls are relative to the host.
+    In both cases the templates are resolved once per app.
+
+    :param format_type: The format of the image, see PixmaUrl.
+    :type format_type: str
+    :rtype: (str, str)
+    :return: The parts of the url before and after the picture id.
+    """
+    resolved = getattr(g, "pixma_url_templates", None)
+    if resolved is None:
+        base = current_app.config.get("PIXMA_URL_BASE")
+        if base is None and not current_app.config.get("PIXMA_URL_RELATIVE", False):
+            resolved = request.url_root, {}
         else:
-            path = url_for("send_picture", pic_id=value, type_string=self.format_type).lstrip("/")
-        return "/".join((request.url_root.rstrip("/"), path))
+            resolved = base, current_app.extensions.setdefault("pixma_url_templates", {})
+        g.pixma_url_templates = resolved
+
+    root, templates = resolved
+    template = templates.get(format_type)
+    if template is None:
+        template = templates[format_type] = _build_pixma_url_template(format_type, root)
+    return template
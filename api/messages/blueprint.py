@@ -1,4 +1,5 @@
 from api.messages.ressources import MessageList, Message, FolderList
+from api.representation import register_json
 from api.request_helper import charset_fix_decorator
 from flask import Blueprint
 import flask_restful
@@ -8,6 +9,7 @@ def message_blueprint():
     message_bp = Blueprint("messages", __name__)
 
     message_api = flask_restful.Api(decorators=[charset_fix_decorator])
+    register_json(message_api)
     message_api.init_app(message_bp)
 
     message_api.add_resource(MessageList, "/", "/folder/<folder_id>")
@@ -1,16 +1,21 @@
 from api.messages import fieldsets
-from api.request_helper import limit_query
+from api.request_helper import paginate_query, total_count_headers
 from api.users import authorization
+from api.conditional import conditional
 from flask.ext.restful import abort, reqparse
-from flask.ext.restful_fieldsets import marshal_with_fieldset
+from api.serializers import marshal_with_fieldset, eager_load
 from flask.ext import restful
-from sqlalchemy.orm import joinedload
 
 from db_backend import mapping
 
 
+def _message_list_version(resource, folder_id=None):
+    return mapping.DbMessageTopics.change_stamp(authorization.current_user, folder_id), None
+
+
 class MessageList(restful.Resource):
     @authorization.require_login
+    @conditional(_message_list_version)
     @marshal_with_fieldset(fieldsets.MessageFields)
     def get(self, folder_id=None):
 
@@ -19,10 +24,9 @@ class MessageList(restful.Resource):
         parser.add_argument('before', type=int)
         req_args = parser.parse_args()
 
-        message_qry = mapping.DbMessageTopics.for_user(authorization.current_user).order_by(
-            mapping.DbMessageTopics.mt_date.desc())
+        message_qry = mapping.DbMessageTopics.for_user(authorization.current_user)
 
-        message_qry = message_qry.options(joinedload('body'))
+        message_qry = eager_load(message_qry, fieldsets.MessageFields)
 
         if req_args.get("since") is not None:
             message_qry = message_qry.filter(mapping.DbMessageTopics.mt_id > req_args["since"])
@@ -31,9 +35,20 @@ class MessageList(restful.Resource):
 
         if folder_id is not None:
             message_qry = message_qry.filter_by(mt_vid_folder=folder_id)
-        message_qry = limit_query(message_qry)
+        messages, headers = paginate_query(message_qry,
+                                           (mapping.DbMessageTopics.mt_date, mapping.DbMessageTopics.mt_id))
+        if req_args.get("since") is None and req_args.get("before") is None:
+            headers.update(total_count_headers(lambda: _folder_message_count(folder_id), exact=True))
+        return messages, 200, headers
+
 
-        return message_qry.all()
+def _folder_message_count(folder_id=None):
+    """Get the message count of a folder (or of all) from the counters in the virtual dirs.
+    """
+    dir_list = authorization.current_user.extra.virtual_dirs()
+    if folder_id is not None:
+        return (dir_list[folder_id].message_count or 0) if folder_id in dir_list else 0
+    return sum(vdir.message_count or 0 for vdir in dir_list.as_list)
 
 
 class FolderList(restful.Resource):
@@ -49,8 +64,7 @@ class Message(restful.Resource):
     @marshal_with_fieldset(fieldsets.MessageFields)
     def get(self, message_topic_id):
         message_qry = mapping.DbMessageTopics.for_user(authorization.current_user, message_topic_id)
-        message_qry = message_qry.options(joinedload('body'))
-        message = message_qry.first()
+        message = eager_load(message_qry, fieldsets.MessageFields).first()
         if message is None:
             abort(404, message="Message not found for user")
 
@@ -1,5 +1,151 @@
+"""The json representation of the api responses.
+
+The json is encoded with the fastest encoder that is installed (orjson,
+ujson, simplejson, the stdlib json as fallback). Large lists are passed
+as StreamedList: their items are serialized and encoded while the
+response is sent in chunks, so neither the serialized items nor the
+whole body have to be held in memory at once.
+"""
+from flask import current_app, make_response, stream_with_context
 from flask.ext.restful.representations import json
 
 
-def configure_default_json():
+# The minimal number of items a list needs to be streamed.
+STREAM_MIN_ITEMS = 50
+
+# The number of items encoded per chunk of a streamed list.
+STREAM_CHUNK_ITEMS = 32
+
+
+def _orjson_encoder():
+    import orjson
+    return orjson.dumps
+
+
+def _ujson_encoder():
+    import ujson
+
+    def dumps(data):
+        return ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False).encode("utf-8")
+
+    return dumps
+
+
+def _simplejson_encoder():
+    import simplejson
+
+    def dumps(data):
+        return simplejson.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    return dumps
+
+
+def _stdlib_encoder():
+    def dumps(data):
+        return json.dumps(data, **json.settings).encode("utf-8")
+
+    return dumps
+
+
+_encoders = (("orjson", _orjson_encoder),
+             ("ujson", _ujson_encoder),
+             ("simplejson", _simplejson_encoder),
+             ("json", _stdlib_encoder))
+
+encoder_name = "json"
+dumps = _stdlib_encoder()
+
+
+def configure_default_json(preferred=None):
+    """Select the json encoder.
+
+    :type preferred: str
+    :param preferred: The name of the encoder to use ("orjson", "ujson",
+        "simplejson" or "json"), the fastest installed one if not given.
+    :rtype: str
+    :return: The name of the selected encoder.
+    """
+    global encoder_name, dumps
     json.settings.setdefault("ensure_ascii", False)
+    for name, factory in _encoders:
+        if preferred is not None and name != preferred:
+            continue
+        try:
+            dumps = factory()
+        except ImportError:
+            continue
+        encoder_name = name
+        return name
+    raise ValueError("The json encoder %s is not installed" % preferred)
+
+
+class StreamedList(object):
+    """A list result whose items are serialized while the response is sent.
+    """
+
+    def __init__(self, items, serialize):
+        """
+        :type items: list
+        :param items: The items to serialize.
+        :type serialize: callable
+        :param serialize: The serializer of a single item.
+        """
+        self.items = items
+        self.serialize = serialize
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        serialize = self.serialize
+        for item in self.items:
+            yield serialize(item)
+
+
+def iter_json_array(items, chunk_items=STREAM_CHUNK_ITEMS):
+    """Encode the items as json array in chunks.
+
+    :type items: collections.Iterable
+    :type chunk_items: int
+    :param chunk_items: The number of items per chunk.
+    :rtype: collections.Iterable[bytes]
+    """
+    chunk = [b"["]
+    count = 0
+    for item in items:
+        if count:
+            chunk.append(b",")
+        chunk.append(dumps(item))
+        count += 1
+        if count % chunk_items == 0:
+            yield b"".join(chunk)
+            chunk = []
+    chunk.append(b"]")
+    yield b"".join(chunk)
+
+
+def output_json(data, code, headers=None):
+    """Make a response with the json encoded data.
+
+    StreamedList data is sent as chunked response. In debug mode the
+    json of flask-restful (indented and sorted) is used.
+    """
+    if current_app.debug:
+        if isinstance(data, StreamedList):
+            data = list(data)
+        return json.output_json(data, code, headers)
+
+    if isinstance(data, StreamedList):
+        resp = current_app.response_class(stream_with_context(iter_json_array(data)), status=code)
+    else:
+        resp = make_response(dumps(data), code)
+    resp.headers.extend(headers or {})
+    return resp
+
+
+def register_json(api):
+    """Use output_json for the json responses of an api.
+
+    :type api: flask_restful.Api
+    """
+    api.representation("application/json")(output_json)
@@ -1,5 +1,13 @@
-from flask.ext.restful import reqparse
+import base64
+import binascii
+import json
+from itertools import islice
+
+from flask import request
+from flask.ext.restful import reqparse, abort
 from functools import wraps
+from sqlalchemy import and_, or_, false
+from werkzeug.urls import url_encode
 
 
 def _fetch_limit_offset_args():
@@ -9,17 +17,21 @@ def _fetch_limit_offset_args():
     return parser.parse_args()
 
 
-def limit_query(query):
+def limit_query(query, default_limit=None):
     """Apply the limit/offset querystring args.
 
     :param query: The query to limit.
     :type query: sqlalchemy.orm.query.Query
+    :param default_limit: The limit if none is requested.
+    :type default_limit: int
     :return: The limited query.
     :rtype : sqlalchemy.orm.query.Query
     """
     parsed = _fetch_limit_offset_args()
     limit = parsed.get("limit")
     offset = parsed.get("offset")
+    if limit is None:
+        limit = default_limit
 
     if limit is not None and limit > 0:
         query = query.limit(limit)
@@ -40,6 +52,206 @@ def limit_list(list_to_limit):
     return list_to_limit
 
 
+TOTAL_COUNT_EXACT = "exact"
+TOTAL_COUNT_APPROXIMATE = "approximate"
+
+
+def total_count_headers(counter, exact):
+    """Get the total count headers if the client asked for them with count=1.
+
+    The count is returned in X-Total-Count, X-Total-Count-Type tells if it
+    is exact or approximate (e.g. taken from cached counters).
+
+    :param counter: Returns the total count, only called if requested.
+    :type counter: callable
+    :param exact: Tells if the count is exact.
+    :type exact: bool
+    :rtype: dict
+    """
+    parser = reqparse.RequestParser()
+    parser.add_argument('count', type=str)
+    requested = parser.parse_args().get("count")
+    if requested is None or requested.lower() not in ("1", "true", "yes"):
+        return {}
+    return {"X-Total-Count": str(counter()),
+            "X-Total-Count-Type": TOTAL_COUNT_EXACT if exact else TOTAL_COUNT_APPROXIMATE}
+
+
+CURSOR_NEXT = "n"
+CURSOR_PREV = "p"
+
+
+def encode_cursor(direction, values):
+    """Build an opaque cursor from the sort key values of a row.
+
+    :param direction: CURSOR_NEXT or CURSOR_PREV
+    :type direction: str
+    :param values: The values of the sort key columns.
+    :type values: list
+    :rtype: str
+    """
+    raw = json.dumps([direction] + list(values), separators=(",", ":")).encode("utf8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, key_length):
+    """Parse a cursor built by encode_cursor, aborts with 400 if it is invalid.
+
+    :param cursor: The cursor from the request.
+    :type cursor: str
+    :param key_length: The number of sort key columns.
+    :type key_length: int
+    :rtype: (str, list)
+    :return: The direction and the values of the sort key.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        parsed = json.loads(raw.decode("utf8"))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        parsed = None
+    if not isinstance(parsed, list) or len(parsed) != key_length + 1 \
+            or parsed[0] not in (CURSOR_NEXT, CURSOR_PREV):
+        abort(400, message="Invalid cursor")
+    return parsed[0], parsed[1:]
+
+
+def _is_nullable(column):
+    return getattr(getattr(column, "expression", column), "nullable", True)
+
+
+def _equal_key(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _beyond_key(column, value, descending):
+    """Build the clause selecting the values beyond the given one in sort order.
+
+    NULL sorts before all values, like MySQL and SQLite order it.
+    """
+    if value is None:
+        return false() if descending else column.isnot(None)
+    if not descending:
+        return column > value
+    if _is_nullable(column):
+        return or_(column < value, column.is_(None))
+    return column < value
+
+
+def _after_key(order_columns, values, descending):
+    """Build the clause selecting the rows after the given key in sort order.
+
+    The row value comparison is expanded to (a < x) or (a = x and b < y),
+    which all databases can answer from an index on the key columns.
+    NULL values in the key (of nullable columns) are compared with IS NULL.
+    """
+    clauses = []
+    for position, column in enumerate(order_columns):
+        compared = _beyond_key(column, values[position], descending)
+        clauses.append(and_(*([_equal_key(order_columns[before], values[before]) for before in range(position)]
+                              + [compared])))
+    return or_(*clauses)
+
+
+def _cursor_url(cursor):
+    args = request.args.copy()
+    args.pop("offset", None)
+    args["cursor"] = cursor
+    return "%s?%s" % (request.base_url, url_encode(args))
+
+
+def paginate_query(query, order_columns, descending=True, default_limit=None):
+    """Fetch a page of the query with keyset (cursor) pagination.
+
+    The query is ordered by the given columns, which have to end with the
+    primary key to make the order unique. The page is selected by the
+    cursor querystring arg, so deep pages cost the same as the first one.
+    The cursors of the neighbour pages are returned in the X-Next-Cursor
+    and X-Prev-Cursor headers and as Link header. If an offset is
+    requested, the query is limited like limit_query does it.
+
+    :param query: The query to paginate, an existing order is replaced.
+    :type query: sqlalchemy.orm.query.Query
+    :param order_columns: The columns of the sort key, e.g. (DbPosts.post_date, DbPosts.pid)
+    :type order_columns: tuple
+    :param descending: Sort descending (newest first).
+    :type descending: bool
+    :param default_limit: The page size if no limit is requested, None for all rows.
+    :type default_limit: int
+    :rtype: (list, dict)
+    :return: The rows of the page and the headers for the response.
+    """
+    parser = reqparse.RequestParser()
+    parser.add_argument('limit', type=int)
+    parser.add_argument('offset', type=int)
+    parser.add_argument('cursor', type=str)
+    parsed = parser.parse_args()
+
+    query = query.order_by(None)
+    if parsed.get("offset") is not None and parsed.get("cursor") is None:
+        ordered = query.order_by(*[column.desc() if descending else column for column in order_columns])
+        return limit_query(ordered, default_limit).all(), {}
+
+    limit = parsed.get("limit")
+    if limit is None or limit <= 0:
+        limit = default_limit
+
+    direction = CURSOR_NEXT
+    if parsed.get("cursor") is not None:
+        direction, values = decode_cursor(parsed["cursor"], len(order_columns))
+        query = query.filter(_after_key(order_columns, values, descending == (direction == CURSOR_NEXT)))
+
+    forward = descending == (direction == CURSOR_NEXT)
+    query = query.order_by(*[column.desc() if forward else column.asc() for column in order_columns])
+    more = False
+    if limit is None:
+        rows = query.all()
+    else:
+        rows = query.limit(limit + 1).all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+    if direction == CURSOR_PREV:
+        rows.reverse()
+
+    def key(row):
+        return [getattr(row, column.key) for column in order_columns]
+
+    headers = {}
+    links = []
+    if len(rows) and (more if direction == CURSOR_NEXT else parsed.get("cursor") is not None):
+        headers["X-Next-Cursor"] = encode_cursor(CURSOR_NEXT, key(rows[-1]))
+        links.append('<%s>; rel="next"' % _cursor_url(headers["X-Next-Cursor"]))
+    if len(rows) and (more if direction == CURSOR_PREV else parsed.get("cursor") is not None):
+        headers["X-Prev-Cursor"] = encode_cursor(CURSOR_PREV, key(rows[0]))
+        links.append('<%s>; rel="prev"' % _cursor_url(headers["X-Prev-Cursor"]))
+    if len(links):
+        headers["Link"] = ", ".join(links)
+    return rows, headers
+
+
+def limit_iterable(iterable, default_limit=None):
+    """Apply the limit/offset querystring args to an iterable.
+
+    Only the first offset + limit items are consumed, so a generator
+    stops producing items after them.
+
+    :param iterable: The items to limit.
+    :type iterable: collections.Iterable
+    :param default_limit: The limit if none is requested.
+    :type default_limit: int
+    :return: The items of the requested page.
+    :rtype: list
+    """
+    parsed = _fetch_limit_offset_args()
+    limit = parsed.get("limit")
+    offset = parsed.get("offset")
+    if limit is None or limit <= 0:
+        limit = default_limit
+    if offset is None or offset < 0:
+        offset = 0
+
+    return list(islice(iterable, offset, None if limit is None else offset + limit))
+
+
 def charset_fix_decorator(response_func):
     """Fix the output mime-type by adding the charset information.
     """
@@ -0,0 +1,260 @@
+"""Compiled serializers for the fieldsets.
+
+flask-restful's marshal walks the field dict for every object and every
+nested object. Here the field dict a Fieldset builds for a selection of
+fields and embeds is compiled once into a serializer: the attribute
+names and the format methods are resolved ahead of time, plain objects
+are read with getattr directly. The output is the same as of marshal.
+
+marshal_with_fieldset is used like the one of restful_fieldsets, the
+compiled serializers are cached per fieldset and selection. Large lists
+are returned as StreamedList, their items are serialized while the
+response is sent (see api.representation).
+
+eager_load adds the loader options for the relationships a fieldset
+serializes (plain keys and embeds) to a query, so a list is loaded with
+a constant number of queries.
+"""
+from collections import OrderedDict
+from functools import wraps
+import threading
+
+from flask.ext.restful import fields, unpack
+from flask.ext.restful.fields import get_value, is_indexable_but_not_string
+from sqlalchemy import inspect, orm
+
+from api.representation import StreamedList, STREAM_MIN_ITEMS
+
+
+_FORMAT = 0
+_NESTED = 1
+_DICT = 2
+_GENERIC = 3
+
+
+def _same_function(function, reference):
+    # The flask.ext import hook may load flask_restful.fields a second time
+    # as flask.ext.restful.fields, so the functions of the field classes are
+    # compared by their code location.
+    code = getattr(function, "__code__", None)
+    return function is reference or (code is not None and
+                                     (code.co_filename, code.co_firstlineno) ==
+                                     (reference.__code__.co_filename, reference.__code__.co_firstlineno))
+
+
+def _compile_field(key, field):
+    """Compile the output of a single field.
+
+    :rtype: tuple
+    :return: The kind, the field, the attribute name, whether the name is
+        dotted and the callable for a present value.
+    """
+    if isinstance(field, dict):
+        return _DICT, None, None, False, compile_fields(field)
+    if isinstance(field, type):
+        field = field()
+
+    name = key if field.attribute is None else field.attribute
+    if not isinstance(name, str):
+        return _GENERIC, field, None, False, field.output
+
+    output = type(field).output
+    if _same_function(output, fields.Raw.output):
+        formatter = None if _same_function(type(field).format, fields.Raw.format) else field.format
+        return _FORMAT, field, name, "." in name, formatter
+    if _same_function(output, fields.Nested.output):
+        return _NESTED, field, name, "." in name, compile_fields(field.nested)
+    return _GENERIC, field, None, False, field.output
+
+
+def compile_fields(fields_dict):
+    """Compile a dict of fields to a serializer.
+
+    The serializer produces what marshal(data, fields_dict) does: an
+    OrderedDict for an object and a list of them for a list or tuple.
+    Missing (None) values are left to the output of the field, so the
+    defaults behave like with marshal.
+
+    :type fields_dict: dict
+    :rtype: callable
+    """
+    steps = [(key,) + _compile_field(key, field) for key, field in fields_dict.items()]
+
+    def serialize(data):
+        if isinstance(data, (list, tuple)):
+            return [serialize(item) for item in data]
+
+        plain = not is_indexable_but_not_string(data)
+        result = OrderedDict()
+        for key, kind, field, name, dotted, call in steps:
+            if kind is _FORMAT or kind is _NESTED:
+                if plain and not dotted:
+                    value = getattr(data, name, None)
+                else:
+                    value = get_value(name, data)
+                if value is None:
+                    result[key] = field.output(key, data)
+                elif call is None:
+                    result[key] = value
+                else:
+                    result[key] = call(value)
+            elif kind is _DICT:
+                result[key] = call(data)
+            else:
+                result[key] = call(key, data)
+        return result
+
+    return serialize
+
+
+class CompiledFieldset(object):
+    """A decorator that serializes the result of a resource method with a fieldset.
+
+    The fields and embeds are selected by the request like with
+    restful_fieldsets, the serializer of every selection is compiled
+    once.
+    """
+
+    def __init__(self, fieldset_cls, cache_size=64):
+        """
+        :type fieldset_cls: type
+        :param fieldset_cls: The Fieldset class.
+        :type cache_size: int
+        :param cache_size: The maximum number of cached selections.
+        """
+        self.fieldset = fieldset_cls()
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._serializers = {}
+        self._paths = {}
+
+    def serializer(self, selected_fields=None, selected_embed=None):
+        """Get the compiled serializer for a selection.
+
+        :type selected_fields: set of str
+        :type selected_embed: set of str
+        :rtype: callable
+        """
+        key = (frozenset(selected_fields or ()), frozenset(selected_embed or ()))
+        serializer = self._serializers.get(key)
+        if serializer is None:
+            serializer = compile_fields(self.fieldset.marshall_dict(selected_fields, selected_embed))
+            with self._lock:
+                if len(self._serializers) >= self.cache_size:
+                    self._serializers.clear()
+                self._serializers[key] = serializer
+        return serializer
+
+    def relationship_paths(self, mapper, selected_fields=None, selected_embed=None):
+        """Get the relationship paths of a mapped class the selection reads.
+
+        :type mapper: sqlalchemy.orm.Mapper
+        :type selected_fields: set of str
+        :type selected_embed: set of str
+        :rtype: list of tuple of str
+        """
+        key = (mapper, frozenset(selected_fields or ()), frozenset(selected_embed or ()))
+        paths = self._paths.get(key)
+        if paths is None:
+            paths = relationship_paths(self.fieldset.marshall_dict(selected_fields, selected_embed), mapper)
+            with self._lock:
+                if len(self._paths) >= self.cache_size:
+                    self._paths.clear()
+                self._paths[key] = paths
+        return paths
+
+    @staticmethod
+    def serialize(serialize, data):
+        if isinstance(data, (list, tuple)) and len(data) >= STREAM_MIN_ITEMS:
+            return StreamedList(data, serialize)
+        return serialize(data)
+
+    def __call__(self, f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            resp = f(*args, **kwargs)
+            # noinspection PyProtectedMember
+            serialize = self.serializer(*self.fieldset._parse_request_overrides())
+            if isinstance(resp, tuple):
+                data, code, headers = unpack(resp)
+                return self.serialize(serialize, data), code, headers
+            return self.serialize(serialize, resp)
+
+        return wrapper
+
+
+def marshal_with_fieldset(fieldset_cls):
+    """Serialize the result of the decorated method with a compiled fieldset.
+
+    :type fieldset_cls: type
+    :rtype: CompiledFieldset
+    """
+    return CompiledFieldset(fieldset_cls)
+
+
+def relationship_paths(fields_dict, mapper):
+    """Find the relationships of a mapped class that the given fields read.
+
+    Embedded (nested) fields are followed into the related class.
+
+    :type fields_dict: dict
+    :type mapper: sqlalchemy.orm.Mapper
+    :rtype: list of tuple of str
+    :return: The attribute names of the relationship paths.
+    """
+    paths = []
+    for key, field in fields_dict.items():
+        if isinstance(field, (dict, type)):
+            continue
+        name = key if field.attribute is None else field.attribute
+        if not isinstance(name, str) or name not in mapper.relationships:
+            continue
+        relationship = mapper.relationships[name]
+        paths.append((name,))
+        if _same_function(type(field).output, fields.Nested.output) and isinstance(field.nested, dict):
+            paths.extend((name,) + path for path in relationship_paths(field.nested, relationship.mapper))
+    return paths
+
+
+def loader_option(entity, path):
+    """Create the eager loading option for a relationship path.
+
+    Collections are loaded with a selectin load, single objects joined.
+
+    :type entity: type
+    :param entity: The mapped class the path starts at.
+    :type path: tuple of str
+    :rtype: sqlalchemy.orm.Load
+    """
+    option = None
+    for name in path:
+        attribute = getattr(entity, name)
+        strategy = "selectinload" if attribute.property.uselist else "joinedload"
+        option = getattr(orm if option is None else option, strategy)(attribute)
+        entity = attribute.property.mapper.class_
+    return option
+
+
+_eager_fieldsets = {}
+
+
+def eager_load(query, fieldset_cls):
+    """Eagerly load the relationships the fieldset serializes for this request.
+
+    The fields and embeds are selected by the request like for
+    marshal_with_fieldset.
+
+    :type query: sqlalchemy.orm.Query
+    :type fieldset_cls: type
+    :param fieldset_cls: The Fieldset class the query result is serialized with.
+    :rtype: sqlalchemy.orm.Query
+    """
+    compiled = _eager_fieldsets.get(fieldset_cls)
+    if compiled is None:
+        compiled = _eager_fieldsets[fieldset_cls] = CompiledFieldset(fieldset_cls)
+    entity = query.column_descriptions[0]["entity"]
+    # noinspection PyProtectedMember
+    paths = compiled.relationship_paths(inspect(entity), *compiled.fieldset._parse_request_overrides())
+    if len(paths):
+        query = query.options(*[loader_option(entity, path) for path in paths])
+    return query
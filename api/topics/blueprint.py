@@ -1,3 +1,4 @@
+from api.representation import register_json
 from api.request_helper import charset_fix_decorator
 from api.topics.ressources import TopicList, Topic, PostList
 from flask import Blueprint
@@ -8,9 +9,10 @@ def topic_blueprint():
     topic_bp = Blueprint("topics", __name__)
 
     topic_api = flask_restful.Api(decorators=[charset_fix_decorator])
+    register_json(topic_api)
     topic_api.init_app(topic_bp)
 
-    topic_api.add_resource(TopicList, "/")
+    topic_api.add_resource(TopicList, "/", "/forum/<int:forum_id>")
     topic_api.add_resource(Topic, "/<int:topic_id>")
     topic_api.add_resource(PostList, "/<int:topic_id>/posts")
 
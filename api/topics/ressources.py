@@ -1,28 +1,64 @@
-from api.request_helper import limit_query
+from api.request_helper import limit_query, paginate_query, total_count_headers
 from api.topics import fieldsets
 from api.users import authorization
 from flask.ext.restful import abort
-from flask.ext.restful_fieldsets import marshal_with_fieldset
+from api.serializers import marshal_with_fieldset
+from api.compression import keep_compressed
+from api.conditional import conditional
 from flask.ext import restful
 
 from db_backend import mapping
 from db_backend.mapping.config import connection
 
 
+def _topic_list_query(forum_id=None):
+    """Build the query of the approved topics the current user can read.
+
+    Aborts with 404 if the requested forum is not readable.
+
+    :type forum_id: int
+    :param forum_id: The forum to list, None for all readable forums.
+    :rtype: (sqlalchemy.orm.query.Query, collections.Iterable[int])
+    :return: The query (None if no forum is readable) and the ids of the listed forums.
+    """
+    user_masks = authorization.current_user.perm_masks
+    topic_qry = connection.session.query(mapping.DbTopics).filter_by(approved=1)
+    if forum_id is not None:
+        if not mapping.forum_permissions.is_permitted(forum_id, user_masks):
+            abort(404, message="No forum with this id available")
+        return topic_qry.filter_by(forum_id=forum_id), [forum_id]
+
+    forum_ids = mapping.DbForums.readable_ids(user_masks)
+    if not len(forum_ids):
+        return None, forum_ids
+    return topic_qry.filter(mapping.DbForumPerms.readable(mapping.DbTopics.forum_id, user_masks)), forum_ids
+
+
+def _topic_page(topic_qry):
+    return limit_query(topic_qry.order_by(mapping.DbTopics.last_post.desc()), default_limit=100)
+
+
+def _topic_list_version(resource, forum_id=None):
+    topic_qry, forum_ids = _topic_list_query(forum_id)
+    if topic_qry is None:
+        return (), None
+    return (mapping.DbTopics.list_stamp(_topic_page(topic_qry)), mapping.forum_topic_counts.count(forum_ids)), None
+
+
 class TopicList(restful.Resource):
+    @conditional(_topic_list_version)
     @marshal_with_fieldset(fieldsets.TopicFields)
     def get(self, forum_id=None):
-        guest_forums = mapping.DbForums.guest_readable()
-        guest_forum_ids = [f.id for f in guest_forums]
-
-        topic_qry = connection.session.query(mapping.DbTopics).filter(
-            mapping.DbTopics.forum_id.in_(guest_forum_ids)).filter_by(approved=1).order_by(
-            mapping.DbTopics.last_post.desc()).limit(100)
-        topic_qry = limit_query(topic_qry)
+        if not authorization.current_user.authenticated():
+            keep_compressed()
+        topic_qry, forum_ids = _topic_list_query(forum_id)
+        if topic_qry is None:
+            return [], 200, total_count_headers(lambda: 0, exact=False)
 
-        topics = topic_qry.all()
+        topics = _topic_page(topic_qry).all()
+        headers = total_count_headers(lambda: mapping.forum_topic_counts.count(forum_ids), exact=False)
 
-        return topics
+        return topics, 200, headers
 
 
 class PostList(restful.Resource):
@@ -32,8 +68,9 @@ class PostList(restful.Resource):
         if topic is None:
             abort(404, message="No topic with this id available")
 
-        posts = mapping.DbPosts.by_topic_query(topic_id).limit(40)
-        return posts.all()
+        posts, headers = paginate_query(mapping.DbPosts.by_topic_query(topic_id),
+                                        (mapping.DbPosts.post_date, mapping.DbPosts.pid), default_limit=40)
+        return posts, 200, headers
 
 
 class Topic(restful.Resource):
@@ -1,10 +1,13 @@
 from db_backend.utils.user import ApiUser
+from db_backend.utils.user_cache import UserCache
 from flask.ext.restful import abort
 from functools import wraps
 from werkzeug.local import LocalProxy
 
 debug = False
 
+user_cache = None
+
 current_user = LocalProxy(lambda: _request_ctx_stack.top.user)
 from flask import session, _request_ctx_stack
 
@@ -27,13 +30,30 @@ def require_login(func):
     return nufun
 
 
-def setup_auth(app, user_lookup):
+def invalidate_user(user_id=None):
+    """Drop the cached snapshot of a user, e.g. after a ban or group change.
+
+    :type user_id: int
+    :param user_id: The user to drop, None to drop all users.
+    """
+    if user_cache is not None:
+        user_cache.invalidate(user_id)
+
+
+def setup_auth(app, user_lookup, cache_ttl=60, cache_size=1024):
     """Set up the authenticaton module for this app.
 
+    The users are resolved from a process wide cache of user snapshots,
+    user_lookup is only called for users that are not cached.
+
     :param app: The Flask app
-    :param api: The Flask RESTful API
+    :param user_lookup: Loads a user by its id.
+    :param cache_ttl: The seconds a cached user is used.
+    :param cache_size: The maximum number of cached users.
     """
     #ToDo: This has to be made more general to use it with other "modules" of the api.
+    global user_cache
+    user_cache = UserCache(user_lookup, cache_ttl, cache_size)
 
     @app.before_request
     def load_user():
@@ -41,7 +61,7 @@ def setup_auth(app, user_lookup):
         ctx.user = ApiUser()
         user_id = session.get("login_user_id")
         if user_id is not None:
-            user = user_lookup(user_id)
+            user = user_cache.get(user_id)
             if user is not None and not user.is_banned():
                 ctx.user = user
 
@@ -1,3 +1,4 @@
+from api.representation import register_json
 from api.request_helper import charset_fix_decorator
 from api.users.ressources import Login, Logout
 from flask import Blueprint
@@ -8,6 +9,7 @@ def user_blueprint():
     user_bp = Blueprint("user", __name__)
 
     user_api = flask_restful.Api(decorators=[charset_fix_decorator])
+    register_json(user_api)
     user_api.init_app(user_bp)
 
     user_api.add_resource(Login, "/login")
@@ -1,4 +1,4 @@
-from api.users.authorization import current_user
+from api.users.authorization import current_user, invalidate_user
 from db_backend import mapping
 from flask import session
 from flask.ext import restful
@@ -34,6 +34,7 @@ class Login(restful.Resource):
         if user.is_banned():
             abort(403, message="You are banned until %s" % user.ban.end.ctime())
 
+        invalidate_user(user.id)
         session["login_user_id"] = user.id
 
         return {"message": "Successful logged in"}
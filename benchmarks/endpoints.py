@@ -0,0 +1,273 @@
+"""Drive every route of the api against a synthetic database.
+
+For each endpoint the latency percentiles, the number of SQL statements
+and the size of the response body are measured and written to a json
+file. Pass the file of an earlier run with --baseline to see the changes:
+
+    python -m benchmarks.endpoints --scale small --output after.json --baseline before.json
+"""
+import argparse
+import datetime
+import importlib.util
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from db_backend import synthetic
+from db_backend.connection import connection
+from db_backend.settings import DatabaseSettings
+from db_backend.utils.events import occurrence_cache
+
+
+_root = os.path.join(os.path.dirname(__file__), "..")
+
+
+class StatementCounter(object):
+    """Counts the statements sent to the given engines.
+    """
+
+    def __init__(self, engines):
+        self._lock = threading.Lock()
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._count)
+
+    # noinspection PyUnusedLocal
+    def _count(self, *args, **kwargs):
+        with self._lock:
+            self.count += 1
+
+
+def percentile(sorted_values, fraction):
+    """Get the nearest-rank percentile of a sorted list.
+
+    :type sorted_values: list of float
+    :type fraction: float
+    :param fraction: The percentile as fraction, e.g. 0.95
+    :rtype: float
+    """
+    if not len(sorted_values):
+        return 0.0
+    rank = int(math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def load_app():
+    """Import the app from exma-api.py.
+
+    :rtype: flask.Flask
+    """
+    spec = importlib.util.spec_from_file_location("exma_api", os.path.join(_root, "exma-api.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def sample_requests():
+    """Build the requests to send, with ids taken from the database.
+
+    :rtype: (str, list of dict)
+    :return: The name of the member to log in with and the requests.
+    """
+    from db_backend import mapping
+
+    session = connection.session
+    member_masks = {synthetic.GROUP_MEMBER}
+
+    topic = None
+    for forum in mapping.DbForums.readable_by(member_masks):
+        topic = session.query(mapping.DbTopics).filter_by(forum_id=forum.id, approved=1) \
+            .order_by(mapping.DbTopics.posts.desc()).first()
+        if topic is not None:
+            break
+    event_row = session.query(mapping.DbEvents).order_by(mapping.DbEvents.start.desc()).first()
+    album = session.query(mapping.DbPixAlbums).order_by(mapping.DbPixAlbums.a_id).first()
+    organizer = session.query(mapping.DbOrganizers).first()
+    member = session.query(mapping.DbMembers).filter_by(mgroup=synthetic.GROUP_MEMBER, temp_ban="0") \
+        .order_by(mapping.DbMembers.id).first()
+    session.remove()
+
+    return member.name, [
+        dict(name="start", url="/"),
+        dict(name="login", url="/login", method="POST",
+             data={"login": member.name, "password": synthetic.PASSWORD}),
+        dict(name="topics", url="/topics/"),
+        dict(name="topics_member", url="/topics/", login=True),
+        dict(name="topics_forum", url="/topics/forum/%d" % topic.forum_id, login=True),
+        dict(name="topic", url="/topics/%d" % topic.tid, login=True),
+        dict(name="posts", url="/topics/%d/posts" % topic.tid, login=True),
+        dict(name="events", url="/events/"),
+        dict(name="events_by_category_id", url="/events/category/1"),
+        dict(name="events_by_category_tag", url="/events/category/party"),
+        dict(name="events_feed", url="/events/feed.ics"),
+        dict(name="event", url="/events/%d" % event_row.event_id, login=True),
+        dict(name="event_categories", url="/events/categories"),
+        dict(name="locations", url="/events/locations"),
+        dict(name="organizer", url="/events/organizer/%d" % organizer.vid),
+        dict(name="organizers", url="/events/organizers"),
+        dict(name="messages", url="/messages/", login=True),
+        dict(name="messages_inbox", url="/messages/folder/in", login=True),
+        dict(name="messages_sent", url="/messages/folder/sent", login=True),
+        dict(name="message", url="/messages/single/%d" % _first_message(member.id), login=True),
+        dict(name="folders", url="/messages/folder", login=True),
+        dict(name="albums", url="/pixma/", login=True),
+        dict(name="album", url="/pixma/%d" % album.a_id, login=True),
+        dict(name="pictures", url="/pixma/%d/pictures" % album.a_id, login=True),
+        dict(name="picture", url="/piXma/%d.jpg" % album.thumb_id, login=True),
+        dict(name="picture_thumb", url="/piXma/%d_bt.jpg" % album.thumb_id, login=True),
+        dict(name="logout", url="/logout", login=True),
+    ]
+
+
+def _first_message(member_id):
+    from db_backend import mapping
+
+    message = connection.session.query(mapping.DbMessageTopics).filter_by(mt_owner_id=member_id).first()
+    connection.session.remove()
+    return message.mt_id if message is not None else 0
+
+
+def uncovered_rules(app, requests):
+    """Find the routes of the app that are not driven by the benchmark.
+
+    :rtype: list of str
+    """
+    uncovered = []
+    adapter = app.url_map.bind("localhost")
+    matched = set()
+    for request in requests:
+        try:
+            matched.add(adapter.match(request["url"], method=request.get("method", "GET"))[0])
+        except Exception:
+            pass
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint != "static" and rule.endpoint not in matched:
+            uncovered.append(rule.rule)
+    return uncovered
+
+
+def run_endpoint(app, request, iterations, counter):
+    client = app.test_client()
+    if request.get("login"):
+        login = client.post("/login", data={"login": request["member"], "password": synthetic.PASSWORD})
+        if login.status_code != 200:
+            raise RuntimeError("Login failed: %s" % login.data)
+
+    timings = []
+    statements = 0
+    body_bytes = 0
+    status = None
+    for iteration in range(iterations):
+        if request["name"] == "login":
+            client = app.test_client()
+        elif request["name"] == "logout":
+            client.post("/login", data={"login": request["member"], "password": synthetic.PASSWORD})
+
+        before = counter.count
+        started = time.perf_counter()
+        response = client.open(request["url"], method=request.get("method", "GET"), data=request.get("data"))
+        body = response.get_data()
+        timings.append(time.perf_counter() - started)
+        statements += counter.count - before
+        body_bytes += len(body)
+        status = response.status_code
+
+    timings.sort()
+    return {"url": request["url"],
+            "method": request.get("method", "GET"),
+            "status": status,
+            "requests": iterations,
+            "p50_ms": percentile(timings, 0.50) * 1000,
+            "p95_ms": percentile(timings, 0.95) * 1000,
+            "p99_ms": percentile(timings, 0.99) * 1000,
+            "mean_ms": sum(timings) / len(timings) * 1000,
+            "sql_statements": statements / iterations,
+            "bytes": body_bytes // iterations}
+
+
+def _change(new, old):
+    if not old:
+        return ""
+    return "%+6.1f%%" % ((new - old) / old * 100)
+
+
+def print_results(results, baseline=None):
+    baseline = (baseline or {}).get("endpoints", {})
+    print("%-24s %6s %9s %9s %9s %6s %9s" % ("endpoint", "status", "p50 ms", "p95 ms", "p99 ms", "sql", "bytes"))
+    for name, result in results["endpoints"].items():
+        line = "%-24s %6s %9.2f %9.2f %9.2f %6.1f %9d" % (name, result["status"], result["p50_ms"],
+                                                          result["p95_ms"], result["p99_ms"],
+                                                          result["sql_statements"], result["bytes"])
+        if name in baseline:
+            old = baseline[name]
+            line += "   p50 %s  sql %s  bytes %s" % (_change(result["p50_ms"], old["p50_ms"]),
+                                                      _change(result["sql_statements"], old["sql_statements"]),
+                                                      _change(result["bytes"], old["bytes"]))
+        print(line)
+
+
+def setup_database(filename, scale, seed):
+    if filename is not None and os.path.isfile(filename):
+        connection.configure(DatabaseSettings(url="sqlite:///%s" % filename), snapshot_file="")
+        return filename
+    return synthetic.use_synthetic_database(scale, seed, filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark all api endpoints against a synthetic database.")
+    parser.add_argument("--database", help="SQLite file to use (generated if it does not exist)")
+    parser.add_argument("--scale", choices=sorted(synthetic.Scale.presets), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests per endpoint")
+    parser.add_argument("--only", action="append", help="Only run the named endpoint(s)")
+    parser.add_argument("--output", default="benchmark_endpoints.json")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    database = setup_database(args.database, args.scale, args.seed)
+    app = load_app()
+    counter = StatementCounter([connection.engine] + connection.replica_engines)
+
+    member, requests = sample_requests()
+    for uncovered in uncovered_rules(app, requests):
+        print("Route not covered: %s" % uncovered)
+
+    results = {"meta": {"date": datetime.datetime.utcnow().isoformat(),
+                        "python": platform.python_version(),
+                        "database": database,
+                        "scale": args.scale,
+                        "seed": args.seed,
+                        "requests": args.requests},
+               "endpoints": OrderedDict()}
+    for request in requests:
+        if args.only and request["name"] not in args.only:
+            continue
+        request["member"] = member
+        if args.warmup:
+            run_endpoint(app, request, args.warmup, counter)
+        results["endpoints"][request["name"]] = run_endpoint(app, request, args.requests, counter)
+    results["meta"]["occurrence_cache"] = occurrence_cache.stats()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print("Event occurrence cache: %(hits)d hits, %(misses)d misses, %(size)d events" % occurrence_cache.stats())
+    print("Results written to %s" % args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
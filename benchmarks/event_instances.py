@@ -0,0 +1,134 @@
+"""Compare the slot based event instances with the former delegating ones.
+
+The events of a synthetic database are expanded to their instances
+within a window, once as the former EventInstance that delegates every
+attribute to the DbEvents and once as the slot based EventInstance that
+shares an EventRecord per event. The memory per instance and the time
+to read the attributes the event fieldset serializes are reported:
+
+    python -m benchmarks.event_instances --database bench.sqlite --days 365
+"""
+import argparse
+import datetime
+import sys
+import timeit
+import tracemalloc
+
+from sqlalchemy.orm import joinedload
+
+from benchmarks.endpoints import setup_database
+from db_backend import synthetic
+from db_backend.utils import timestamps
+from db_backend.utils.events import EventInstance, EventRecord, occurrence_cache, _event_duration
+
+
+# The attributes the EventFields read from an instance.
+SERIALIZED = ("event_id", "title", "start", "end", "editable", "allDay", "type_name", "overall_end",
+              "category_instance", "location")
+
+
+class DelegatingEventInstance(object):
+    # The former EventInstance
+    def __init__(self, date_instance, db_instance):
+        self.date_instance = date_instance
+        self.db_instance = db_instance
+        self.editable = False
+        self.allDay = False
+
+    @property
+    def start(self):
+        return self.date_instance
+
+    @property
+    def end(self):
+        return self.date_instance + _event_duration
+
+    @property
+    def overall_end(self):
+        return self.db_instance.end_date
+
+    @property
+    def title(self):
+        return self.db_instance.topic.title
+
+    def __getattr__(self, item):
+        return getattr(self.db_instance, item)
+
+
+def occurrences_between(db_events, start, end):
+    start, end = timestamps.to_db(start), timestamps.to_db(end)
+    for db_event in db_events:
+        yield db_event, [timestamps.from_db(occurrence) for occurrence in occurrence_cache.occurrences(db_event)
+                         if start <= occurrence <= end]
+
+
+def build_delegating(expanded):
+    return [DelegatingEventInstance(date_instance, db_event)
+            for db_event, dates in expanded for date_instance in dates]
+
+
+def build_slots(expanded):
+    instances = []
+    for db_event, dates in expanded:
+        record = EventRecord(db_event)
+        instances.extend(EventInstance(date_instance, db_event, record) for date_instance in dates)
+    return instances
+
+
+def measure_memory(build, expanded):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        instances = build(expanded)
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return instances, size
+
+
+def read_all(instances):
+    for instance in instances:
+        for name in SERIALIZED:
+            getattr(instance, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory and the attribute access of event instances.")
+    parser.add_argument("--database", help="SQLite file to use (generated if it does not exist)")
+    parser.add_argument("--scale", choices=sorted(synthetic.Scale.presets), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=365, help="Length of the expanded window")
+    parser.add_argument("--number", type=int, default=5, help="Repetitions per measurement")
+    args = parser.parse_args()
+
+    setup_database(args.database, args.scale, args.seed)
+    from db_backend import mapping
+    from db_backend.mapping.config import connection
+
+    db_events = connection.session.query(mapping.DbEvents) \
+        .options(joinedload(mapping.DbEvents.topic)) \
+        .options(joinedload(mapping.DbEvents.location)).all()
+    start = min(db_event.start_date for db_event in db_events)
+    end = start + datetime.timedelta(days=args.days)
+    expanded = list(occurrences_between(db_events, start, end))
+
+    delegating, delegating_size = measure_memory(build_delegating, expanded)
+    slots, slots_size = measure_memory(build_slots, expanded)
+    count = len(slots)
+    print("%d events, %d instances within %d days" % (len(db_events), count, args.days))
+    if not count:
+        return 1
+    for name in SERIALIZED:
+        if [getattr(instance, name) for instance in delegating] != [getattr(instance, name) for instance in slots]:
+            print("The instances differ in %s!" % name)
+            return 1
+
+    print("%-24s %12s %16s" % ("", "bytes/instance", "read us/instance"))
+    for label, instances, size in (("delegating", delegating, delegating_size), ("slots", slots, slots_size)):
+        seconds = timeit.timeit(lambda: read_all(instances), number=args.number)
+        print("%-24s %12.1f %16.3f" % (label, float(size) / count, seconds / args.number / count * 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
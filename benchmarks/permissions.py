@@ -0,0 +1,93 @@
+"""Compare the set based forum permission checks with the bitsets.
+
+The permission arrays of a number of forums are generated, then a
+single check and the filtering of all forums for a user are timed with
+the sets parse_permissions returns, the integer bitsets and (if numpy
+is installed) the vectorized bitsets:
+
+    python -m benchmarks.permissions --forums 500 --masks 30
+"""
+import argparse
+import random
+import sys
+import timeit
+
+from db_backend.utils.permissions import ForumBitsets, numpy
+from db_backend.utils.user import parse_permissions, mask_bits, ForumPermissions
+
+
+def permission_array(masks):
+    masks = ",".join(str(mask) for mask in masks)
+    return 'a:1:{s:10:"read_perms";s:%d:"%s";}' % (len(masks), masks)
+
+
+def generate_forums(count, mask_count, seed):
+    rand = random.Random(seed)
+    forums = {}
+    for forum_id in range(1, count + 1):
+        forums[forum_id] = permission_array(rand.sample(range(1, mask_count + 1), rand.randint(1, mask_count)))
+    return forums
+
+
+def is_fulfilled_sets(perms, mask_tuple):
+    # The former ForumPermissions.is_fulfilled
+    if perms is not None:
+        for mask in mask_tuple:
+            if mask in perms:
+                return True
+    return False
+
+
+def report(label, seconds, number):
+    print("%-34s %10.3f us" % (label, seconds / number * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the forum permission evaluation.")
+    parser.add_argument("--forums", type=int, default=500)
+    parser.add_argument("--masks", type=int, default=30, help="Number of distinct permission masks")
+    parser.add_argument("--number", type=int, default=2000, help="Repetitions per measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    forums = generate_forums(args.forums, args.masks, args.seed)
+    user_masks = {2, 3, args.masks}
+    user_bits = mask_bits(user_masks)
+
+    set_perms = dict((forum_id, parse_permissions(array)[ForumPermissions.PERM_READ])
+                     for forum_id, array in forums.items())
+    bit_perms = dict((forum_id, ForumPermissions(array)) for forum_id, array in forums.items())
+    bitsets = ForumBitsets(dict((forum_id, mask_bits(masks)) for forum_id, masks in set_perms.items()))
+    python_bitsets = ForumBitsets(bitsets.forum_bits)
+    python_bitsets._arrays = None
+
+    number = args.number
+    print("%d forums, %d masks, user masks %s" % (args.forums, args.masks, sorted(user_masks)))
+
+    some_forum = args.forums // 2
+    report("single check, sets", timeit.timeit(
+        lambda: is_fulfilled_sets(set_perms[some_forum], user_masks), number=number * 10), number * 10)
+    report("single check, bitset", timeit.timeit(
+        lambda: bit_perms[some_forum].is_fulfilled(user_bits, ForumPermissions.PERM_READ),
+        number=number * 10), number * 10)
+
+    expected = frozenset(forum_id for forum_id, perms in set_perms.items() if is_fulfilled_sets(perms, user_masks))
+    if python_bitsets.matching(user_bits) != expected or bitsets.matching(user_bits) != expected:
+        print("The bitsets do not match the sets!")
+        return 1
+
+    report("all forums, sets", timeit.timeit(
+        lambda: frozenset(forum_id for forum_id, perms in set_perms.items()
+                          if is_fulfilled_sets(perms, user_masks)), number=number), number)
+    report("all forums, bitsets", timeit.timeit(
+        lambda: python_bitsets.matching(user_bits), number=number), number)
+    if numpy is not None:
+        report("all forums, numpy bitsets", timeit.timeit(
+            lambda: bitsets.matching(user_bits), number=number), number)
+    else:
+        print("numpy is not installed, skipped the vectorized bitsets")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Compare the expansion of the event recurrences with the rrule and arithmetically.
+
+A number of daily and weekly events is generated around a window, then
+the occurrences of all events within the window are expanded with the
+rrule of every event (the former path), with the arithmetic ranges of
+expand_occurrences and with expand_between for all events at once
+(vectorized if numpy is installed):
+
+    python -m benchmarks.recurrence --events 10000 --days 100
+"""
+import argparse
+from bisect import bisect_left
+import random
+import sys
+import timeit
+
+from dateutil import rrule
+
+from db_backend.utils import events, timestamps
+from db_backend.utils.events import expand_occurrences, expand_between, recurrence_step
+
+
+DAY = 24 * 60 * 60
+
+
+class BenchmarkEvent(object):
+    def __init__(self, event_id, frequency, start, end):
+        self.event_id = event_id
+        self.recurrence_interval = frequency
+        self.start = start
+        self.end = end
+
+    @property
+    def recurrence_rule(self):
+        return rrule.rrule(self.recurrence_interval, dtstart=timestamps.from_db(self.start),
+                           until=timestamps.from_db(self.end))
+
+
+def generate_events(count, window_start, days, seed):
+    rand = random.Random(seed)
+    generated = []
+    for event_id in range(count):
+        start = window_start + rand.randint(-30, days) * DAY + rand.randint(0, 23) * 3600
+        frequency = rrule.DAILY if rand.random() < 0.3 else rrule.WEEKLY
+        generated.append(BenchmarkEvent(event_id, frequency, start, start + rand.randint(0, 90) * DAY))
+    return generated
+
+
+def expand_rrule(db_events, start, end):
+    # The former path: the occurrences of every event from its rrule.
+    start_date, end_date = timestamps.from_db(start), timestamps.from_db(end)
+    occurrences = []
+    for db_event in db_events:
+        rule = tuple(db_event.recurrence_rule)
+        for date_instance in rule[bisect_left(rule, start_date):]:
+            if date_instance > end_date:
+                break
+            occurrences.append(timestamps.to_db(date_instance))
+    return occurrences
+
+
+def expand_ranges(db_events, start, end):
+    occurrences = []
+    for db_event in db_events:
+        expanded = expand_occurrences(db_event)
+        for position in range(bisect_left(expanded, start), len(expanded)):
+            if expanded[position] > end:
+                break
+            occurrences.append(expanded[position])
+    return occurrences
+
+
+def expand_all(db_events, start, end):
+    spans = [(db_event.start, db_event.end, recurrence_step(db_event)) for db_event in db_events]
+    return expand_between(spans, start, end)[0]
+
+
+def report(label, seconds, number):
+    print("%-34s %10.2f ms" % (label, seconds / number * 1e3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the expansion of the event recurrences.")
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=100, help="Length of the expanded window")
+    parser.add_argument("--number", type=int, default=3, help="Repetitions per measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = timestamps.to_db(timestamps.new_datetime(2015, 1, 1))
+    end = start + args.days * DAY
+    db_events = generate_events(args.events, start, args.days, args.seed)
+
+    expected = sorted(expand_rrule(db_events, start, end))
+    print("%d events, %d days, %d occurrences" % (args.events, args.days, len(expected)))
+    numpy = events.numpy
+    try:
+        events.numpy = None
+        python_all = expand_all(db_events, start, end)
+    finally:
+        events.numpy = numpy
+    if sorted(expand_ranges(db_events, start, end)) != expected or python_all != expected \
+            or expand_all(db_events, start, end) != expected:
+        print("The arithmetic expansion does not match the rrule!")
+        return 1
+
+    number = args.number
+    report("per event, rrule", timeit.timeit(
+        lambda: expand_rrule(db_events, start, end), number=number), number)
+    report("per event, ranges", timeit.timeit(
+        lambda: expand_ranges(db_events, start, end), number=number), number)
+
+    def expand_python():
+        events.numpy = None
+        try:
+            return expand_all(db_events, start, end)
+        finally:
+            events.numpy = numpy
+
+    report("all events, python", timeit.timeit(expand_python, number=number), number)
+    if numpy is not None:
+        report("all events, numpy", timeit.timeit(
+            lambda: expand_all(db_events, start, end), number=number), number)
+    else:
+        print("numpy is not installed, skipped the vectorized expansion")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
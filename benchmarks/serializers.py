@@ -0,0 +1,81 @@
+"""Compare the compiled fieldset serializers with flask-restful's marshal.
+
+Rows of a synthetic database are serialized with the default field
+dict of the topic, post, message, event and picture fieldsets, once
+with marshal and once with the compiled serializer:
+
+    python -m benchmarks.serializers --database bench.sqlite --rows 500
+"""
+import argparse
+import sys
+import timeit
+
+from sqlalchemy.orm import joinedload
+
+from benchmarks.endpoints import setup_database, load_app
+from db_backend import synthetic
+
+
+def sample_rows(rows):
+    from db_backend import mapping
+    from db_backend.mapping.config import connection
+    from db_backend.utils import timestamps
+    from db_backend.utils.events import merge_event_instances
+
+    session = connection.session
+    db_events = session.query(mapping.DbEvents) \
+        .options(joinedload(mapping.DbEvents.topic)) \
+        .options(joinedload(mapping.DbEvents.location)).all()
+    start = min(db_event.start_date for db_event in db_events)
+    end = timestamps.from_db(max(db_event.end for db_event in db_events))
+    events = []
+    for instance in merge_event_instances(db_events, start, end):
+        events.append(instance)
+        if len(events) >= rows:
+            break
+
+    return [("topics", "TopicFields", session.query(mapping.DbTopics).limit(rows).all()),
+            ("posts", "PostFields", session.query(mapping.DbPosts).limit(rows).all()),
+            ("messages", "MessageFields", session.query(mapping.DbMessageTopics).limit(rows).all()),
+            ("events", "EventFields", events),
+            ("pictures", "PictureFields", session.query(mapping.DbPixPics).limit(rows).all())]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled fieldset serializers.")
+    parser.add_argument("--database", help="SQLite file to use (generated if it does not exist)")
+    parser.add_argument("--scale", choices=sorted(synthetic.Scale.presets), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rows", type=int, default=500, help="Serialized rows per fieldset")
+    parser.add_argument("--number", type=int, default=20, help="Repetitions per measurement (the best counts)")
+    args = parser.parse_args()
+
+    setup_database(args.database, args.scale, args.seed)
+    app = load_app()
+
+    from flask.ext.restful import marshal
+    from api.albums import fieldsets as album_fieldsets
+    from api.events import fieldsets as event_fieldsets
+    from api.messages import fieldsets as message_fieldsets
+    from api.serializers import compile_fields
+    from api.topics import fieldsets as topic_fieldsets
+    modules = (album_fieldsets, event_fieldsets, message_fieldsets, topic_fieldsets)
+
+    print("%-10s %6s %14s %14s %8s" % ("fieldset", "rows", "marshal ms", "compiled ms", "speedup"))
+    with app.test_request_context("/"):
+        for label, fieldset_name, objects in sample_rows(args.rows):
+            fieldset_cls = [getattr(module, fieldset_name) for module in modules if hasattr(module, fieldset_name)][0]
+            fields_dict = fieldset_cls().marshall_dict()
+            serialize = compile_fields(fields_dict)
+            if serialize(objects) != marshal(objects, fields_dict):
+                print("The compiled %s differ from marshal!" % fieldset_name)
+                return 1
+            marshal_seconds = min(timeit.repeat(lambda: marshal(objects, fields_dict), number=1, repeat=args.number))
+            compiled_seconds = min(timeit.repeat(lambda: serialize(objects), number=1, repeat=args.number))
+            print("%-10s %6d %14.2f %14.2f %7.1fx" % (label, len(objects), marshal_seconds * 1e3,
+                                                       compiled_seconds * 1e3, marshal_seconds / compiled_seconds))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
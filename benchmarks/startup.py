@@ -0,0 +1,62 @@
+"""Compare the startup time of live schema reflection with the schema snapshot.
+
+Every run imports the mapping module in a fresh interpreter, once with the
+snapshot disabled and once loading it from the snapshot file:
+
+    python -m benchmarks.startup --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from db_backend import snapshot
+
+
+_root = os.path.join(os.path.dirname(__file__), "..")
+
+_import_probe = ("import time\n"
+                 "started = time.perf_counter()\n"
+                 "import db_backend.mapping\n"
+                 "from db_backend.mapping.config import connection\n"
+                 "print('%f %s' % (time.perf_counter() - started, connection.metadata_source))\n")
+
+
+def measure_import(snapshot_file):
+    env = dict(os.environ, EXMA_SCHEMA_SNAPSHOT=snapshot_file or "")
+    output = subprocess.check_output([sys.executable, "-c", _import_probe], env=env, cwd=_root)
+    duration, source = output.decode("utf8").strip().splitlines()[-1].split()
+    return float(duration), source
+
+
+def run(label, snapshot_file, runs):
+    timings = []
+    sources = set()
+    for _ in range(runs):
+        duration, source = measure_import(snapshot_file)
+        timings.append(duration)
+        sources.add(source)
+    print("%-10s median %8.2f ms  min %8.2f ms  max %8.2f ms  (metadata from: %s)" % (
+        label, statistics.median(timings) * 1000, min(timings) * 1000, max(timings) * 1000,
+        ", ".join(sorted(sources))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mapping import with and without schema snapshot.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--file", default=snapshot.default_snapshot_file(),
+                        help="The snapshot file (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.file is None or not os.path.isfile(args.file):
+        print("No snapshot at %s, create it with 'python schema_snapshot.py refresh'" % args.file)
+        return 1
+
+    run("live", None, args.runs)
+    run("snapshot", os.path.abspath(args.file), args.runs)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import os
+from sqlalchemy import create_engine, MetaData
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+from db_backend import snapshot
+from db_backend import functions  # registers the SQL functions the api needs on SQLite connections
+from db_backend.pool import MeteredQueuePool
+from db_backend.routing import RoutingSession, RoutingQuery
+from db_backend.settings import DatabaseSettings
+
+
+_project_root = os.path.join(os.path.dirname(__file__), "../")
+
+
+def get_passwd(filename):
+    """Read the username/passwd from an extra file.
+
+    This is to prevent the password from being committed to the VCS.
+
+    :param filename: The name of the file where the pw is stored.
+    :return: The username:password
+    """
+    pw = ""
+    try:
+        with open(filename, "r") as f:
+            pw = f.read()
+    except OSError as e:
+        print("Got an oserror: %s!" % e)
+    return pw
+
+
+class Connection(object):
+    def __init__(self, settings=None, snapshot_file=None):
+        self._engine = None
+        self._replica_engines = None
+        self._metadata = None
+        self._session = None
+        self.configure(settings, snapshot_file)
+
+    def configure(self, settings=None, snapshot_file=None):
+        """Point the connection to another database.
+
+        This has to happen before the mapping is imported, as the mapped
+        tables are bound to the metadata of the configured database.
+
+        :type settings: DatabaseSettings
+        :param settings: The database settings, loaded from file/environment if not given.
+        :type snapshot_file: str
+        :param snapshot_file: The schema snapshot to use, an empty string disables it.
+        """
+        if self._metadata is not None:
+            raise RuntimeError("The tables are already mapped to %s" % self.engine.url)
+        self.dispose()
+
+        self.settings = settings if settings is not None else DatabaseSettings.load()
+        self._connection_string = self.settings.url or self._default_connection()
+        if snapshot_file is None:
+            snapshot_file = snapshot.default_snapshot_file()
+        self.snapshot_file = snapshot_file or None
+        self.metadata_source = None
+
+    def dispose(self):
+        """Close the sessions and all pooled connections.
+        """
+        if self._session is not None:
+            self._session.remove()
+            self._session = None
+        for engine in [self._engine] + (self._replica_engines or []):
+            if engine is not None:
+                engine.dispose()
+        self._engine = None
+        self._replica_engines = None
+
+    def _default_connection(self):
+        pw_file = os.path.join(_project_root, "exma_pw")
+        return 'mysql+cymysql://%s@127.0.0.1/exma?charset=utf8' % get_passwd(pw_file)
+
+    def _create_engine(self, connection_string):
+        engine_options = self.settings.engine_options(connection_string)
+        if self.settings.is_pooled(connection_string):
+            engine_options["poolclass"] = MeteredQueuePool
+        return create_engine(connection_string, **engine_options)
+
+    @property
+    def engine(self):
+        """The engine of the primary database.
+
+        :rtype: sqlalchemy.engine.Engine
+        """
+        if self._engine is None:
+            self._engine = self._create_engine(self._connection_string)
+        return self._engine
+
+    @property
+    def replica_engines(self):
+        """The engines of the configured read replicas.
+
+        :rtype: list of sqlalchemy.engine.Engine
+        """
+        if self._replica_engines is None:
+            self._replica_engines = [self._create_engine(url) for url in self.settings.replicas]
+        return self._replica_engines
+
+    def pool_status(self):
+        """Get the usage statistics of the connection pool.
+
+        :rtype: dict
+        :return: The checkout/wait statistics and the current pool usage.
+        """
+        pool = self.engine.pool
+        if not isinstance(pool, MeteredQueuePool):
+            return {}
+        return pool.metrics.status(pool)
+
+    @property
+    def metadata(self):
+        """Get the metadata holding the (reflected) ipb tables.
+
+        If a usable schema snapshot exists, the metadata is loaded from it
+        and no reflection against the database is needed. Otherwise the
+        tables get reflected live while they are mapped.
+
+        :rtype: sqlalchemy.MetaData
+        """
+        if self._metadata is None:
+            metadata = None
+            if self.snapshot_file is not None and os.path.isfile(self.snapshot_file):
+                metadata = snapshot.load_snapshot(self.snapshot_file, self.engine)
+            if metadata is not None:
+                self.metadata_source = "snapshot"
+            else:
+                metadata = MetaData(bind=self.engine)
+                self.metadata_source = "live"
+            self._metadata = metadata
+        return self._metadata
+
+    def save_snapshot(self, filename=None):
+        """Store the current metadata as schema snapshot.
+
+        :type filename: str
+        :param filename: The file to write, defaults to the configured snapshot file.
+        :rtype: dict
+        :return: The header of the written snapshot.
+        """
+        if filename is None:
+            filename = self.snapshot_file
+        return snapshot.write_snapshot(filename, self.metadata, self.engine)
+
+    @property
+    def session(self):
+        """The thread local session.
+
+        Reads are routed to the replicas (if any), writes to the primary,
+        see RoutingSession for the details.
+
+        :rtype: sqlalchemy.orm.scoped_session
+        """
+        if self._session is None:
+            self._session = scoped_session(sessionmaker(bind=self.engine,
+                                                        replicas=self.replica_engines,
+                                                        class_=RoutingSession,
+                                                        query_cls=RoutingQuery))
+        return self._session
+
+    def route_to_primary(self):
+        """Send all statements of the current (request) session to the primary.
+
+        Use this for requests that have to read their latest writes or
+        cannot bear the replication lag.
+        """
+        self.session().route_to_primary()
+
+
+connection = Connection()
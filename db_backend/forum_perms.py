@@ -0,0 +1,112 @@
+"""The materialized forum permissions.
+
+The ipb stores the permissions of a forum as php-serialized array in
+ipb_forums.permission_array, so the database can't filter by them. The
+exma_forum_perms table holds one (forum_id, mask_id, perm_type) row for
+every mask that has a permission in a forum. It is rebuilt from the
+permission arrays by sync_forum_perms (see forum_perms_sync.py), which
+has to run whenever the forum permissions changed.
+
+ForumPermsState tells if the table matches the permission arrays. The
+queries filter with the table only while it does, otherwise they fall
+back to the forum ids of the in-memory permission index.
+"""
+from sqlalchemy import MetaData, Table, Column, Index, Integer, String, select
+
+from db_backend.utils.cache import CachedTable
+from db_backend.utils.user import parse_permissions
+
+
+TABLE_NAME = "exma_forum_perms"
+
+
+def forum_perms_table(metadata):
+    """Get the table of the materialized permissions in the given metadata.
+
+    :type metadata: sqlalchemy.MetaData
+    :rtype: sqlalchemy.Table
+    """
+    if TABLE_NAME in metadata.tables:
+        return metadata.tables[TABLE_NAME]
+    return Table(TABLE_NAME, metadata,
+                 Column("forum_id", Integer, primary_key=True, autoincrement=False),
+                 Column("mask_id", Integer, primary_key=True, autoincrement=False),
+                 Column("perm_type", String(16), primary_key=True),
+                 Index("exma_forum_perms_lookup", "perm_type", "mask_id", "forum_id"))
+
+
+def permission_rows(forums):
+    """Expand the permission arrays of the forums to the table rows.
+
+    :type forums: list of (int, str)
+    :param forums: The forum ids and their permission arrays.
+    :rtype: list of dict
+    """
+    rows = []
+    for forum_id, permission_array in forums:
+        for perm_type, masks in parse_permissions(permission_array or "").items():
+            for mask_id in sorted(masks):
+                rows.append({"forum_id": forum_id, "mask_id": mask_id, "perm_type": perm_type})
+    return rows
+
+
+def rows_match(stored, expected):
+    """Check if the stored rows are the expected ones.
+
+    :type stored: collections.Iterable
+    :param stored: The (forum_id, mask_id, perm_type) rows of the table.
+    :type expected: list of dict
+    :param expected: The rows as returned by permission_rows.
+    :rtype: bool
+    """
+    return set(tuple(row) for row in stored) == set((row["forum_id"], row["mask_id"], row["perm_type"])
+                                                    for row in expected)
+
+
+class ForumPermsState(CachedTable):
+    """Tells if the materialized permissions are in sync with the forums.
+
+    The loader returns the rows of the table (None if it does not exist)
+    and the ids and permission arrays of the forums. The check is repeated
+    after the ttl, so a sync (or a permission change) is noticed after
+    that time.
+    """
+
+    @staticmethod
+    def compile_rows(loaded):
+        stored, forums = loaded
+        return stored is not None and rows_match(stored, permission_rows(forums))
+
+    def synced(self):
+        """
+        :rtype: bool
+        :return: True if the table matches the permission arrays.
+        """
+        return self._current()
+
+
+def sync_forum_perms(engine):
+    """Rebuild the materialized permissions from ipb_forums.
+
+    The table is created if it does not exist yet. It is only written if
+    the permissions changed, the rebuild runs in a single transaction.
+
+    :type engine: sqlalchemy.engine.Engine
+    :param engine: The engine of the primary database.
+    :rtype: bool
+    :return: True if the table was changed.
+    """
+    metadata = MetaData()
+    forums = Table("ipb_forums", metadata, autoload=True, autoload_with=engine)
+    table = forum_perms_table(metadata)
+    table.create(engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        expected = permission_rows(conn.execute(select([forums.c.id, forums.c.permission_array])))
+        current = conn.execute(select([table.c.forum_id, table.c.mask_id, table.c.perm_type]))
+        if rows_match(current, expected):
+            return False
+        conn.execute(table.delete())
+        if len(expected):
+            conn.execute(table.insert(), expected)
+    return True
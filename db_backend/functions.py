@@ -0,0 +1,42 @@
+"""SQL functions the api queries use besides the standard ones.
+
+MySQL has them built in. For SQLite (the synthetic database and the
+tests) they are registered on every new connection, importing this
+module is enough (db_backend.connection does it).
+"""
+import sqlite3
+import zlib
+
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+
+
+def crc32(value):
+    """Compute the CRC32 of a value like the CRC32 function of MySQL.
+
+    :type value: str or bytes or int or None
+    :rtype: int or None
+    :return: The checksum of the utf-8 bytes of the value, None for NULL.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, bytes):
+        value = str(value).encode("utf-8")
+    return zlib.crc32(value) & 0xffffffff
+
+
+def text_digest(column):
+    """Build the SQL expression of an integer digest of a (text) column.
+
+    The digest fits the values of event_index.row_digest, NULL gives 0.
+
+    :param column: The column or SQL expression.
+    :rtype: sqlalchemy.sql.elements.ColumnElement
+    """
+    return func.coalesce(func.crc32(column), 0)
+
+
+@event.listens_for(Engine, "connect")
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function("crc32", 1, crc32)
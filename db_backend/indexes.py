@@ -0,0 +1,77 @@
+"""The indexes the api relies on besides the ones of the ipb.
+
+The ipb schema lacks the indexes for some access paths of the api. They
+are declared here and created by ensure_indexes (see ensure_indexes.py):
+
+    python ensure_indexes.py
+"""
+from sqlalchemy import MetaData, Table, Index, inspect
+
+
+# table name -> [(index name, column names)]
+API_INDEXES = {"ipb_topics": [("exma_topics_forum_feed", ("forum_id", "approved", "last_post")),
+                              ("exma_topics_feed", ("approved", "last_post"))],
+               "ipb_posts": [("exma_posts_topic_pages", ("topic_id", "post_date", "pid"))],
+               "ipb_message_topics": [("exma_message_topics_pages", ("mt_owner_id", "mt_date", "mt_id"))],
+               "pixma_album": [("exma_album_pages", ("time", "a_id"))]}
+
+
+def api_indexes(metadata):
+    """Declare the api indexes on the tables of the given metadata.
+
+    Tables missing in the metadata are skipped.
+
+    :type metadata: sqlalchemy.MetaData
+    :rtype: list of sqlalchemy.Index
+    :return: The declared indexes.
+    """
+    indexes = []
+    for table_name, definitions in sorted(API_INDEXES.items()):
+        table = metadata.tables.get(table_name)
+        if table is None:
+            continue
+        existing = set(index.name for index in table.indexes)
+        for name, columns in definitions:
+            if name not in existing:
+                indexes.append(Index(name, *[table.c[column] for column in columns]))
+    return indexes
+
+
+def missing_indexes(engine):
+    """Get the api indexes that don't exist in the database.
+
+    An index is also regarded as existing if the database has another
+    index on the same columns.
+
+    :type engine: sqlalchemy.engine.Engine
+    :rtype: list of sqlalchemy.Index
+    """
+    inspector = inspect(engine)
+    metadata = MetaData()
+    table_names = set(inspector.get_table_names())
+    missing = []
+    for table_name, definitions in sorted(API_INDEXES.items()):
+        if table_name not in table_names:
+            continue
+        existing = inspector.get_indexes(table_name)
+        existing_names = set(index["name"] for index in existing)
+        existing_columns = set(tuple(index["column_names"]) for index in existing)
+        table = Table(table_name, metadata, autoload=True, autoload_with=engine)
+        for name, columns in definitions:
+            if name not in existing_names and tuple(columns) not in existing_columns:
+                missing.append(Index(name, *[table.c[column] for column in columns]))
+    return missing
+
+
+def ensure_indexes(engine):
+    """Create the missing api indexes.
+
+    :type engine: sqlalchemy.engine.Engine
+    :rtype: list of str
+    :return: The names of the created indexes.
+    """
+    created = []
+    for index in missing_indexes(engine):
+        index.create(engine)
+        created.append(index.name)
+    return created
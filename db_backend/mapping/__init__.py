@@ -3,23 +3,39 @@ import datetime
 from dateutil import rrule
 from db_backend.mapping.config import connection
 from db_backend.utils.events import make_event_instances, EventCategory
-from sqlalchemy import Table, Column, Integer, ForeignKey, and_, or_
+from sqlalchemy import Table, Column, Integer, ForeignKey, and_, or_, exists, false, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, backref, joinedload
 from db_backend.utils.message import DirList
+from db_backend import forum_perms
+from db_backend.functions import text_digest
 from db_backend.utils import user, timestamps
+from db_backend.utils.cache import CachedCounters, IncrementalCounters
+from db_backend.utils.event_index import EventIntervalIndex, row_digest
+from db_backend.utils.permissions import ForumPermissionIndex, GroupMaskCache, parse_id_list
 
 
 
 # ToDo: Refactor this in smaller modules
-# ToDo: Use any sort of DI to give a fake database for unittests
 
 
 Base = declarative_base()
 
+# Keeps the squared ids of the message stamps in the integer range of the databases.
+_STAMP_MODULUS = 2147483647
+
 
 def auto_table(name, *cols):
-    return Table(name, connection.metadata, *cols, autoload=True)
+    """Get a reflected table and apply the given column overrides.
+
+    Tables already known to the metadata (e.g. loaded from the schema
+    snapshot) are only extended, all others are reflected from the
+    database.
+    """
+    metadata = connection.metadata
+    if name in metadata.tables:
+        return Table(name, metadata, *cols, extend_existing=True)
+    return Table(name, metadata, *cols, autoload=True)
 
 
 class DbTopics(Base):
@@ -49,6 +65,27 @@ class DbTopics(Base):
                 return topic
         return None
 
+    @staticmethod
+    def list_stamp(topic_qry):
+        """Get a stamp of the topics a (limited) topic query selects.
+
+        The stamp is a single aggregate query over the selected rows: their
+        count and the sum of the row digests of the values the topic list
+        renders and the approved flag.
+
+        :type topic_qry: sqlalchemy.orm.query.Query
+        :param topic_qry: The query of the DbTopics, e.g. a page of the topic list.
+        :rtype: tuple of int
+        """
+        page = topic_qry.with_entities(DbTopics.tid, DbTopics.last_post, DbTopics.title,
+                                       DbTopics.last_poster_name, DbTopics.starter_name, DbTopics.approved).subquery()
+        digest = row_digest(page.c.tid, func.coalesce(page.c.last_post, 0), text_digest(page.c.title),
+                            text_digest(page.c.last_poster_name), text_digest(page.c.starter_name),
+                            func.coalesce(page.c.approved, 0))
+        count, digests = connection.session.query(func.count(), func.coalesce(func.sum(digest), 0)) \
+            .select_from(page).one()
+        return count, int(digests)
+
 
 class DbForums(Base):
     """This handles the ipb_forum data within the exma ipb database.
@@ -76,7 +113,21 @@ class DbForums(Base):
         :rtype: bool
         :return: True if read is granted.
         """
-        return self.perms.is_fulfilled(user_mask_tuple, user.ForumPermissions.PERM_READ)
+        return forum_permissions.is_permitted(self.id, user_mask_tuple, user.ForumPermissions.PERM_READ)
+
+    @staticmethod
+    def readable_ids(user_mask_set):
+        """Get the ids of all forums that are readable for the given masks.
+
+        The ids are taken from the process wide permission index, so no
+        query is sent in most cases.
+
+        :param user_mask_set: A collection of permission masks
+        :type user_mask_set: set of int
+        :rtype: frozenset of int
+        :return: The ids of the readable forums.
+        """
+        return forum_permissions.forums_with(user_mask_set, user.ForumPermissions.PERM_READ)
 
     @staticmethod
     def readable_by(user_mask_set):
@@ -87,11 +138,10 @@ class DbForums(Base):
         :rtype: list of DbForums
         :return: The list of fetched forum objects.
         """
-        forums = []
-        for forum in connection.session.query(DbForums):
-            if forum.can_read(user_mask_set):
-                forums.append(forum)
-        return forums
+        forum_ids = DbForums.readable_ids(user_mask_set)
+        if not len(forum_ids):
+            return []
+        return connection.session.query(DbForums).filter(DbForums.id.in_(forum_ids)).all()
 
     @staticmethod
     def guest_readable():
@@ -100,12 +150,77 @@ class DbForums(Base):
         :rtype: list of DbForums
         :return: The list of fetched forum objects.
         """
-        forums = []
-        for forum in connection.session.query(DbForums):
-            if forum.can_read(user.GUEST_MASK):
-                forums.append(forum)
+        return DbForums.readable_by(user.GUEST_MASK)
+
+
+class DbForumPerms(Base):
+    """The materialized forum permissions (table: exma_forum_perms).
+
+    The rows are maintained by db_backend.forum_perms.sync_forum_perms.
+    """
+    __table__ = forum_perms.forum_perms_table(connection.metadata)
+
+    @staticmethod
+    def permits(forum_id_column, user_mask_set, permission_type=user.ForumPermissions.PERM_READ):
+        """Get a clause to filter rows by the permissions of their forum.
+
+        :param forum_id_column: The column holding the forum id, e.g. DbTopics.forum_id
+        :type user_mask_set: set of int
+        :param user_mask_set: A collection of permission masks
+        :type permission_type: str
+        :param permission_type: The permission type to check.
+        :rtype: sqlalchemy.sql.elements.ClauseElement
+        :return: A clause that is true if one of the masks has the permission.
+        """
+        return exists().where(and_(DbForumPerms.forum_id == forum_id_column,
+                                   DbForumPerms.perm_type == permission_type,
+                                   DbForumPerms.mask_id.in_(list(user_mask_set))))
+
+    @staticmethod
+    def readable(forum_id_column, user_mask_set):
+        """Get a clause to filter rows by the read permission of their forum.
+
+        While the table is in sync with the forums (see forum_perms_state)
+        this is the EXISTS clause of permits. Otherwise it falls back to an
+        IN list of the readable forum ids from the permission index.
+
+        :param forum_id_column: The column holding the forum id, e.g. DbTopics.forum_id
+        :type user_mask_set: set of int
+        :param user_mask_set: A collection of permission masks
+        :rtype: sqlalchemy.sql.elements.ClauseElement
+        """
+        if forum_perms_state.synced():
+            return DbForumPerms.permits(forum_id_column, user_mask_set)
+        forum_ids = DbForums.readable_ids(user_mask_set)
+        if not len(forum_ids):
+            return false()
+        return forum_id_column.in_(sorted(forum_ids))
+
+
+def _load_forum_permissions():
+    return connection.session.query(DbForums.id, DbForums.permission_array).all()
+
 
-        return forums
+forum_permissions = ForumPermissionIndex(_load_forum_permissions)
+
+
+def _load_forum_perms_state():
+    if not connection.engine.has_table(forum_perms.TABLE_NAME):
+        return None, ()
+    stored = connection.session.query(DbForumPerms.forum_id, DbForumPerms.mask_id, DbForumPerms.perm_type).all()
+    return stored, _load_forum_permissions()
+
+
+# Tells if the topic and event queries can filter with exma_forum_perms.
+forum_perms_state = forum_perms.ForumPermsState(_load_forum_perms_state, ttl=60)
+
+
+def _load_forum_topic_counts():
+    return connection.session.query(DbForums.id, DbForums.topics).all()
+
+
+# The approved topics per forum, as counted by the board.
+forum_topic_counts = CachedCounters(_load_forum_topic_counts, ttl=60)
 
 
 class DbPosts(Base):
@@ -177,7 +292,7 @@ class DbEvents(Base):
 
     @property
     def end_date(self):
-        return timestamps(self.end)
+        return timestamps.from_db(self.end)
 
     @property
     def recurrence_interval(self):
@@ -218,6 +333,71 @@ class DbEvents(Base):
         return None
 
 
+    @staticmethod
+    def ids_between(start, end, category=None, forum_ids=None):
+        """Get the ids of the events between the given dates from the event index.
+
+        :param start: The start timestamp (inclusive)
+        :type start: datetime.datetime
+        :param end: The end timestamp (exclusive)
+        :type end: datetime.datetime
+        :param category: Only select events of this category id.
+        :type category: int
+        :param forum_ids: Only select events whose topic is in one of these forums.
+        :type forum_ids: set of int
+        :return: The event ids, ordered by the event start.
+        :rtype: list of int
+        """
+        return event_index.event_ids_between(timestamps.to_db(start), timestamps.to_db(end), category, forum_ids)
+
+    @staticmethod
+    def readable_by(user_mask_set):
+        """Get a clause to filter the events by the read permission of their forum.
+
+        The permissions are checked in the database, see DbForumPerms.readable.
+
+        :type user_mask_set: set of int
+        :param user_mask_set: A collection of permission masks
+        :rtype: sqlalchemy.sql.elements.ClauseElement
+        """
+        return DbEvents.topic.has(DbForumPerms.readable(DbTopics.forum_id, user_mask_set))
+
+    @staticmethod
+    def revision_between(start, end, category=None, user_mask_set=None):
+        """Get a revision stamp of the events between the given dates.
+
+        The stamp is a single aggregate query: the count of the events and
+        the sum of the row digests of all values the event list and the
+        calendar feed render (the ical revision of the event and the columns
+        of its location). The events are selected by the event index, so the
+        stamp changes as well if events are added to or removed from the
+        interval.
+
+        :param start: The start timestamp (inclusive)
+        :type start: datetime.datetime
+        :param end: The end timestamp (exclusive)
+        :type end: datetime.datetime
+        :param category: Only select events of this category id.
+        :type category: int
+        :param user_mask_set: Only select events readable with these masks.
+        :type user_mask_set: set of int
+        :rtype: tuple of int
+        """
+        event_ids = DbEvents.ids_between(start, end, category)
+        if not len(event_ids):
+            return 0, 0
+        location_digests = [text_digest(column) for column in DbLocations.__table__.columns if column.name != "lid"]
+        digest = row_digest(DbEvents.event_id, DbEvents.start, DbEvents.end, DbEvents.type, DbEvents.category,
+                            func.coalesce(DbEvents.location_id, 0), text_digest(DbTopics.title),
+                            func.coalesce(DbTopics.start_date, 0), *location_digests)
+        qry = connection.session.query(func.count(DbEvents.event_id), func.coalesce(func.sum(digest), 0)) \
+            .select_from(DbEvents).join(DbEvents.topic).outerjoin(DbEvents.location) \
+            .filter(DbEvents.event_id.in_(event_ids))
+        if user_mask_set is not None:
+            qry = qry.filter(DbForumPerms.readable(DbTopics.forum_id, user_mask_set))
+        count, digests = qry.one()
+        return count, int(digests)
+
     @classmethod
     def query_between(cls, start, end):
         """Create a query between the given dates.
@@ -241,6 +421,25 @@ class DbEvents(Base):
         return qry
 
 
+def _load_event_spans(after_id=None):
+    qry = connection.session.query(DbEvents.event_id, DbEvents.start, DbEvents.end, DbEvents.category,
+                                   DbTopics.forum_id).join(DbEvents.topic)
+    if after_id is not None:
+        qry = qry.filter(DbEvents.event_id > after_id)
+    return qry.all()
+
+
+def _load_event_stamp(max_id):
+    max_event_id = connection.session.query(func.max(DbEvents.event_id)).join(DbEvents.topic).scalar()
+    digest = row_digest(DbEvents.event_id, DbEvents.start, DbEvents.end, DbEvents.category, DbTopics.forum_id)
+    count, digests = connection.session.query(func.count(DbEvents.event_id), func.coalesce(func.sum(digest), 0)) \
+        .join(DbEvents.topic).filter(DbEvents.event_id <= max_id).one()
+    return max_event_id, (count, int(digests))
+
+
+event_index = EventIntervalIndex(_load_event_spans, _load_event_stamp)
+
+
 class DbLocations(Base):
     """Handle the location data for the events from the database (table: exma_locations).
     """
@@ -282,6 +481,17 @@ class DbPixAlbums(Base):
         return connection.session.query(DbPixAlbums).filter_by(a_id=album_id).first()
 
 
+def _load_album_count(after_id=None):
+    qry = connection.session.query(func.max(DbPixAlbums.a_id), func.count(DbPixAlbums.a_id))
+    if after_id is not None:
+        qry = qry.filter(DbPixAlbums.a_id > after_id)
+    max_id, count = qry.one()
+    return max_id, [(None, count)]
+
+
+album_counts = IncrementalCounters(_load_album_count, ttl=60)
+
+
 class DbPixComments(Base):
     __table__ = auto_table('pixma_comments',
                            Column('msg_id', Integer, primary_key=True),
@@ -314,6 +524,20 @@ class DbPixPics(Base):
     def by_id(pic_id):
         return connection.session.query(DbPixPics).filter_by(pid=pic_id).first()
 
+    @staticmethod
+    def count_hit(pic_id):
+        """Increment the hit counter of a picture and commit.
+
+        The counter is incremented by the database in a single UPDATE, which
+        is always sent to the primary. Concurrent views cannot lose updates
+        or write back stale values read from a replica.
+
+        :type pic_id: int
+        """
+        connection.session.query(DbPixPics).filter_by(pid=pic_id) \
+            .update({DbPixPics.hits: DbPixPics.hits + 1}, synchronize_session=False)
+        connection.session.commit()
+
 
 class DbMessageTopics(Base):
     """This is a message topic from the ipb database. The table is ipb_message_topics.
@@ -347,18 +571,41 @@ class DbMessageTopics(Base):
     def for_user(user, topic_id=None):
         """Return a queryset of all Messages or a single message owned by a specific user.
 
-        :type user: DbMembers
+        :type user: DbMembers or db_backend.utils.user_cache.CachedUser
         :param user: Teh user to select the messages for.
         :type topic_id: int
         :param topic_id: optional a topic id to get a single message topic.
         :rtype: sqlalchemy.orm.query.Query
         :return: The query.
         """
-        qry = connection.session.query(DbMessageTopics).filter(DbMessageTopics.owner == user)
+        qry = connection.session.query(DbMessageTopics).filter(DbMessageTopics.mt_owner_id == user.id)
         if topic_id is not None:
             qry = qry.filter_by(mt_id=topic_id)
         return qry
 
+    @staticmethod
+    def change_stamp(user, folder_id=None):
+        """Get a cheap stamp of the messages owned by a user.
+
+        :type user: DbMembers or db_backend.utils.user_cache.CachedUser
+        :param user: The owner of the messages.
+        :type folder_id: str
+        :param folder_id: optional a folder to get the stamp for.
+        :rtype: tuple
+        :return: Per folder the folder id, the message count, the maximum
+            message topic id and the sum of the squared ids. A message moved
+            to another folder changes the sums of both folders.
+        """
+        qry = connection.session.query(DbMessageTopics.mt_vid_folder,
+                                       func.count(DbMessageTopics.mt_id),
+                                       func.max(DbMessageTopics.mt_id),
+                                       func.sum((DbMessageTopics.mt_id * DbMessageTopics.mt_id) % _STAMP_MODULUS)) \
+            .filter(DbMessageTopics.mt_owner_id == user.id) \
+            .group_by(DbMessageTopics.mt_vid_folder)
+        if folder_id is not None:
+            qry = qry.filter_by(mt_vid_folder=folder_id)
+        return tuple(sorted((folder, count, max_id, int(squares)) for folder, count, max_id, squares in qry))
+
 
 class DbMessageText(Base):
     """Hold the real message bodies of the users messages. Table is ipb_message_text.
@@ -383,7 +630,14 @@ class DbGroups(Base):
 
 
 def _split_set(raw_value):
-    return set([int(item) for item in raw_value.split(",") if len(item)])
+    return set(parse_id_list(raw_value))
+
+
+def _load_group_masks():
+    return connection.session.query(DbGroups.g_id, DbGroups.g_perm_id).all()
+
+
+group_masks = GroupMaskCache(_load_group_masks)
 
 
 class DbMembers(Base, user.ApiUser):
@@ -405,16 +659,13 @@ class DbMembers(Base, user.ApiUser):
     def group_permissions(self):
         """Get all permission masks that the user have from its group memberships
 
-        :rtype: set of int
+        The masks are taken from the process wide group table, so no
+        query is sent in most cases.
+
+        :rtype: frozenset of int
         :return: A set of group permission masks
         """
-        result = self.primary_group.permission_masks
-        if len(self.secondary_group_ids) > 0:
-            qry = connection.session.query(DbGroups.g_perm_id.label("perm")) \
-                .filter(DbGroups.g_id.in_(self.secondary_group_ids))
-            for group_perms in qry:
-                result.update(_split_set(group_perms.perm))
-        return result
+        return group_masks.masks_for(self.mgroup, self.mgroup_others)
 
     def password_valid(self, password):
         """Check if a given password is the password of the user.
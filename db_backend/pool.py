@@ -0,0 +1,86 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics(object):
+    """Collects statistics about the connection checkouts of a pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        """Record the time a checkout had to wait for a connection.
+
+        :type seconds: float
+        :param seconds: The time waited.
+        :type timed_out: bool
+        :param timed_out: True if the checkout failed with a pool timeout.
+        """
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def status(self, pool=None):
+        """Get the collected values (and the current pool state) as dict.
+
+        :type pool: sqlalchemy.pool.QueuePool
+        :param pool: The pool to include the current usage from.
+        :rtype: dict
+        """
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            status = {"checkouts": self.checkouts,
+                      "timeouts": self.timeouts,
+                      "wait_total": self.wait_total,
+                      "wait_max": self.wait_max,
+                      "wait_avg": self.wait_total / attempts if attempts else 0.0}
+        if pool is not None:
+            status.update(size=pool.size(),
+                          checked_out=pool.checkedout(),
+                          checked_in=pool.checkedin(),
+                          overflow=pool.overflow())
+        return status
+
+
+class MeteredQueuePool(QueuePool):
+    """A QueuePool that measures how long the checkouts wait for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # Keep the statistics when the engine gets disposed.
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
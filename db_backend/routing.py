@@ -0,0 +1,101 @@
+import random
+
+from sqlalchemy.orm import Session, Query
+from sqlalchemy.sql.dml import UpdateBase
+
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+
+class RoutingQuery(Query):
+    """A query that can be pinned to the primary or to a replica.
+    """
+    _route = None
+
+    def _routed(self, route):
+        query = self._clone()
+        query._route = route
+        return query
+
+    def from_primary(self):
+        """Run this query against the primary database.
+
+        :rtype: RoutingQuery
+        :return: The pinned query.
+        """
+        return self._routed(PRIMARY)
+
+    def from_replica(self):
+        """Run this query against a replica, even after the session wrote something.
+
+        :rtype: RoutingQuery
+        :return: The pinned query.
+        """
+        return self._routed(REPLICA)
+
+    def _connection_from_session(self, **kw):
+        if self._route is not None and hasattr(self.session, "engine_for"):
+            kw["bind"] = self.session.engine_for(self._route)
+        return super()._connection_from_session(**kw)
+
+
+class RoutingSession(Session):
+    """A session that sends reads to the replicas and writes to the primary.
+
+    The bind of the session is the primary. One of the replicas is chosen
+    on the first read and used for the lifetime of the session, so a
+    request sees a consistent state. As soon as the session flushed, all
+    further statements go to the primary to let the request read its own
+    writes. Without replicas everything goes to the primary.
+    """
+
+    def __init__(self, replicas=(), **kwargs):
+        """
+        :type replicas: list of sqlalchemy.engine.Engine
+        :param replicas: The engines of the read replicas.
+        :param kwargs: The arguments for the Session.
+        """
+        super().__init__(**kwargs)
+        self.replicas = list(replicas)
+        self._reset_routing()
+
+    def _reset_routing(self):
+        self._route = None
+        self._replica = None
+        self._wrote = False
+
+    def route_to_primary(self):
+        """Send all further statements of this session to the primary.
+        """
+        self._route = PRIMARY
+
+    def route_to_replica(self):
+        """Send all further reads of this session to a replica (the default).
+        """
+        self._route = None
+        self._wrote = False
+
+    def engine_for(self, route):
+        """Get the engine for a route.
+
+        :type route: str
+        :param route: PRIMARY or REPLICA
+        :rtype: sqlalchemy.engine.Engine
+        """
+        if route == REPLICA and len(self.replicas):
+            if self._replica is None:
+                self._replica = random.choice(self.replicas)
+            return self._replica
+        return self.bind
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self._wrote = True
+        if self._wrote or self._route == PRIMARY:
+            return self.engine_for(PRIMARY)
+        return self.engine_for(REPLICA)
+
+    def close(self):
+        super().close()
+        self._reset_routing()
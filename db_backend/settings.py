@@ -0,0 +1,122 @@
+import os
+from configparser import ConfigParser
+
+
+_default_config_file = os.path.join(os.path.dirname(__file__), "..", "exma_db.ini")
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_list(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    return tuple(item.strip() for item in str(value).split(",") if len(item.strip()))
+
+
+class DatabaseSettings(object):
+    """The settings used to create the database engine and its pool.
+
+    The settings are read from the [database] section of an ini file
+    (exma_db.ini in the project root or the file named in EXMA_DB_CONFIG).
+    Environment variables (EXMA_DB_<SETTING>, e.g. EXMA_DB_POOL_SIZE)
+    override the values from the file. The replicas are given as comma
+    separated list of urls.
+    """
+    section = "database"
+    env_prefix = "EXMA_DB_"
+
+    # name -> (converter, default)
+    options = {"url": (str, None),
+               "replicas": (_parse_list, ()),
+               "echo": (_parse_bool, False),
+               "pool_size": (int, 5),
+               "max_overflow": (int, 10),
+               "pool_timeout": (float, 30),
+               "pool_recycle": (int, 3600),
+               "pool_pre_ping": (_parse_bool, True)}
+
+    def __init__(self, **settings):
+        """Create the settings, unknown names are rejected.
+
+        :param settings: The values for the settings, missing ones get the defaults.
+        """
+        unknown = set(settings).difference(self.options)
+        if len(unknown):
+            raise ValueError("Unknown database settings: %s" % ", ".join(sorted(unknown)))
+
+        for name, (converter, default) in self.options.items():
+            value = settings.get(name)
+            setattr(self, name, default if value is None else converter(value))
+
+    @classmethod
+    def load(cls, filename=None, environ=None):
+        """Load the settings from the config file and the environment.
+
+        :type filename: str
+        :param filename: The ini file to read, defaults to EXMA_DB_CONFIG or exma_db.ini.
+        :type environ: dict
+        :param environ: The environment to read, defaults to os.environ.
+        :rtype: DatabaseSettings
+        :return: The loaded settings.
+        """
+        if environ is None:
+            environ = os.environ
+        if filename is None:
+            filename = environ.get("EXMA_DB_CONFIG", _default_config_file)
+
+        settings = {}
+        parser = ConfigParser()
+        if len(parser.read(filename)) and parser.has_section(cls.section):
+            for name in cls.options:
+                if parser.has_option(cls.section, name):
+                    settings[name] = parser.get(cls.section, name)
+
+        for name in cls.options:
+            env_name = cls.env_prefix + name.upper()
+            if env_name in environ:
+                settings[name] = environ[env_name]
+
+        return cls(**settings)
+
+    @staticmethod
+    def is_pooled(url):
+        """Tells if connections to the given database url are pooled.
+
+        SQLite connections are cheap and are not shared across threads,
+        so the pool settings only apply to server databases.
+
+        :type url: str or None
+        :param url: The database url, None for the default database.
+        :rtype: bool
+        """
+        return url is None or not url.startswith("sqlite")
+
+    @property
+    def pooled(self):
+        """Tells if the primary database uses a connection pool.
+
+        :rtype: bool
+        """
+        return self.is_pooled(self.url)
+
+    def engine_options(self, url=None):
+        """Get the keyword arguments for create_engine.
+
+        :type url: str
+        :param url: The url the engine is created for, defaults to the primary url.
+        :rtype: dict
+        """
+        if url is None:
+            url = self.url
+        engine_options = {"echo": self.echo}
+        if self.is_pooled(url):
+            engine_options.update(pool_size=self.pool_size,
+                                  max_overflow=self.max_overflow,
+                                  pool_timeout=self.pool_timeout,
+                                  pool_recycle=self.pool_recycle,
+                                  pool_pre_ping=self.pool_pre_ping)
+        return engine_options
@@ -0,0 +1,216 @@
+import hashlib
+import os
+import pickle
+import time
+
+import sqlalchemy
+from sqlalchemy import MetaData, bindparam, text
+
+
+SNAPSHOT_VERSION = 1
+
+
+def default_snapshot_file():
+    """Get the file of the schema snapshot.
+
+    The location can be changed with the EXMA_SCHEMA_SNAPSHOT environment
+    variable. Setting it to an empty value disables the snapshot.
+
+    :rtype: str or None
+    :return: The filename or None if disabled.
+    """
+    filename = os.environ.get("EXMA_SCHEMA_SNAPSHOT",
+                              os.path.join(os.path.dirname(__file__), "..", "exma_schema.snapshot"))
+    if not len(filename):
+        return None
+    return filename
+
+
+def source_identity(url):
+    """Build a password-free identity string for a database url.
+
+    The identity is stored within a snapshot to detect snapshots that
+    were taken from another database than the configured one.
+
+    :type url: sqlalchemy.engine.url.URL
+    :param url: The url of the engine.
+    :rtype: str
+    :return: The identity string.
+    """
+    return "%s://%s:%s/%s" % (url.drivername, url.host or "", url.port or "", url.database or "")
+
+
+def schema_fingerprint(metadata):
+    """Calculate a checksum over the structure of the given tables.
+
+    Only the column names, types and nullability are taken into account.
+    This is the part of the schema that the database can change under
+    our feet, so the fingerprint of a fresh reflection can be compared
+    to the one recorded while the snapshot was taken.
+
+    :type metadata: sqlalchemy.MetaData
+    :param metadata: The metadata to fingerprint.
+    :rtype: str
+    :return: The hex digest of the fingerprint.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(metadata.tables):
+        table = metadata.tables[name]
+        digest.update(name.encode("utf8"))
+        for column in sorted(table.columns, key=lambda c: c.name):
+            digest.update(("|%s:%r:%s" % (column.name, column.type, column.nullable)).encode("utf8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def reflect_fingerprint(engine, table_names):
+    """Reflect the given tables from the database and fingerprint them.
+
+    :type engine: sqlalchemy.engine.Engine
+    :param engine: The engine to reflect with.
+    :type table_names: list of str
+    :param table_names: The tables to reflect.
+    :rtype: str
+    :return: The fingerprint of the live schema.
+    """
+    live = MetaData()
+    live.reflect(bind=engine, only=list(table_names))
+    return schema_fingerprint(live)
+
+
+def schema_marker(engine, table_names):
+    """Get a cheap marker of the schema version of the given tables.
+
+    Unlike the fingerprint this needs no reflection, so it is checked
+    every time a snapshot is loaded. SQLite gives its schema_version
+    counter (it also changes if other tables change), MySQL a digest of
+    the column definitions from the information_schema.
+
+    :type engine: sqlalchemy.engine.Engine
+    :param engine: The engine of the database.
+    :type table_names: list of str
+    :param table_names: The tables of the snapshot.
+    :rtype: int or str or None
+    :return: The marker or None if the database has no cheap marker.
+    """
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            return conn.execute(text("PRAGMA schema_version")).scalar()
+        if engine.dialect.name == "mysql":
+            qry = text("SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE "
+                       "FROM information_schema.COLUMNS "
+                       "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :names "
+                       "ORDER BY TABLE_NAME, ORDINAL_POSITION").bindparams(bindparam("names", expanding=True))
+            rows = conn.execute(qry, names=sorted(table_names))
+            return hashlib.sha256(repr([tuple(row) for row in rows]).encode("utf8")).hexdigest()
+    return None
+
+
+def write_snapshot(filename, metadata, engine):
+    """Write the (reflected) metadata to a snapshot file.
+
+    The file holds a pickled header with the snapshot format version,
+    the SQLAlchemy version, the database identity, the live schema
+    fingerprint and marker and a checksum of the pickled metadata.
+
+    :type filename: str
+    :param filename: The file to write.
+    :type metadata: sqlalchemy.MetaData
+    :param metadata: The metadata to store.
+    :type engine: sqlalchemy.engine.Engine
+    :param engine: The engine the metadata was reflected from.
+    :rtype: dict
+    :return: The header written to the file (without the payload).
+    """
+    payload = pickle.dumps(metadata, pickle.HIGHEST_PROTOCOL)
+    header = {"version": SNAPSHOT_VERSION,
+              "sqlalchemy": sqlalchemy.__version__,
+              "source": source_identity(engine.url),
+              "fingerprint": reflect_fingerprint(engine, metadata.tables.keys()),
+              "marker": schema_marker(engine, metadata.tables.keys()),
+              "tables": sorted(metadata.tables.keys()),
+              "created": int(time.time()),
+              "checksum": hashlib.sha256(payload).hexdigest()}
+    snapshot = dict(header, payload=payload)
+
+    with open(filename, "wb") as f:
+        pickle.dump(snapshot, f, pickle.HIGHEST_PROTOCOL)
+    return header
+
+
+def read_snapshot(filename):
+    """Read a snapshot file without unpickling the metadata.
+
+    :type filename: str
+    :param filename: The snapshot file.
+    :rtype: dict or None
+    :return: The snapshot dict or None if it cannot be read.
+    """
+    try:
+        with open(filename, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+    if not isinstance(snapshot, dict):
+        return None
+    return snapshot
+
+
+def snapshot_problem(snapshot, engine):
+    """Tells why a snapshot cannot be used for the given engine.
+
+    If the snapshot recorded a schema marker, the marker of the database
+    is queried and compared to detect migrations.
+
+    :type snapshot: dict
+    :param snapshot: The snapshot as returned by read_snapshot.
+    :type engine: sqlalchemy.engine.Engine
+    :param engine: The engine the metadata will be bound to.
+    :rtype: str or None
+    :return: A description of the problem or None if the snapshot is usable.
+    """
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return "snapshot format version changed"
+    if snapshot.get("sqlalchemy") != sqlalchemy.__version__:
+        return "snapshot taken with SQLAlchemy %s" % snapshot.get("sqlalchemy")
+    if snapshot.get("source") != source_identity(engine.url):
+        return "snapshot taken from %s" % snapshot.get("source")
+    payload = snapshot.get("payload")
+    if not isinstance(payload, bytes) or hashlib.sha256(payload).hexdigest() != snapshot.get("checksum"):
+        return "snapshot checksum mismatch"
+    marker = snapshot.get("marker")
+    if marker is not None and marker != schema_marker(engine, snapshot.get("tables", ())):
+        return "the database schema changed since the snapshot was taken"
+    return None
+
+
+def load_snapshot(filename, engine):
+    """Load the metadata from a snapshot file.
+
+    Missing, damaged or stale snapshots are ignored, the caller has to
+    fall back to live reflection in this case. A snapshot is stale if it
+    was taken with another SQLAlchemy version, from another database or
+    before the schema of the database changed (if the database has a
+    schema marker, see schema_marker).
+
+    :type filename: str
+    :param filename: The snapshot file.
+    :type engine: sqlalchemy.engine.Engine
+    :param engine: The engine the metadata will be bound to.
+    :rtype: sqlalchemy.MetaData or None
+    :return: The loaded metadata or None if the snapshot is not usable.
+    """
+    snapshot = read_snapshot(filename)
+    if snapshot is None:
+        return None
+
+    problem = snapshot_problem(snapshot, engine)
+    if problem is not None:
+        print("Ignoring schema snapshot %s: %s" % (filename, problem))
+        return None
+
+    metadata = pickle.loads(snapshot["payload"])
+    metadata.bind = engine
+    print("Loaded schema snapshot %s of %d tables, run \"python schema_snapshot.py refresh\" after migrations"
+          % (filename, len(metadata.tables)))
+    return metadata
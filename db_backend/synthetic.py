@@ -0,0 +1,541 @@
+"""A generator for synthetic ipb-shaped databases.
+
+The generated tables only carry the columns the api works with (plus a
+few common ones) but have the same names and formats as the ones of the
+real board, so the mapping can reflect them like the real thing. This
+gives a database to run the tests and benchmarks offline at any scale.
+
+All members have the password "password".
+"""
+import os
+import random
+import string
+import tempfile
+import time
+
+import phpserialize
+from sqlalchemy import create_engine, select, func, MetaData, Table, Column, Index, Integer, SmallInteger, String, Text
+
+from db_backend.connection import connection
+from db_backend.forum_perms import forum_perms_table, sync_forum_perms
+from db_backend.indexes import api_indexes
+from db_backend.settings import DatabaseSettings
+from db_backend.utils.user import exma_passhash
+
+
+PASSWORD = "password"
+
+GROUP_VALIDATING = 1
+GROUP_GUEST = 2
+GROUP_MEMBER = 3
+GROUP_ADMIN = 4
+GROUP_MODERATOR = 5
+
+schema = MetaData()
+
+Table("ipb_groups", schema,
+      Column("g_id", Integer, primary_key=True),
+      Column("g_title", String(32), nullable=False),
+      Column("g_perm_id", String(255), nullable=False))
+
+Table("ipb_members", schema,
+      Column("id", Integer, primary_key=True),
+      Column("name", String(255), nullable=False, index=True),
+      Column("mgroup", SmallInteger, nullable=False),
+      Column("mgroup_others", String(255), nullable=False, default=""),
+      Column("email", String(150), nullable=False),
+      Column("joined", Integer, nullable=False),
+      Column("posts", Integer, default=0),
+      Column("last_visit", Integer),
+      Column("temp_ban", String(100)))
+
+Table("ipb_members_converge", schema,
+      Column("converge_id", Integer, primary_key=True),
+      Column("converge_email", String(250), nullable=False),
+      Column("converge_joined", Integer, nullable=False),
+      Column("converge_pass_hash", String(32), nullable=False),
+      Column("converge_pass_salt", String(5), nullable=False))
+
+Table("ipb_member_extra", schema,
+      Column("id", Integer, primary_key=True),
+      Column("vdirs", Text))
+
+Table("ipb_forums", schema,
+      Column("id", SmallInteger, primary_key=True),
+      Column("name", String(128), nullable=False),
+      Column("description", Text),
+      Column("parent_id", SmallInteger, default=-1),
+      Column("position", Integer),
+      Column("topics", Integer),
+      Column("posts", Integer),
+      Column("last_post", Integer),
+      Column("permission_array", Text))
+
+Table("ipb_topics", schema,
+      Column("tid", Integer, primary_key=True),
+      Column("title", String(250), nullable=False),
+      Column("description", String(70)),
+      Column("state", String(8)),
+      Column("posts", Integer),
+      Column("starter_id", Integer, nullable=False),
+      Column("start_date", Integer),
+      Column("last_poster_id", Integer, nullable=False),
+      Column("last_post", Integer),
+      Column("starter_name", String(255)),
+      Column("last_poster_name", String(255)),
+      Column("views", Integer),
+      Column("forum_id", SmallInteger, nullable=False, index=True),
+      Column("approved", SmallInteger, nullable=False))
+
+Table("ipb_posts", schema,
+      Column("pid", Integer, primary_key=True),
+      Column("author_id", Integer, nullable=False),
+      Column("author_name", String(32)),
+      Column("post_date", Integer),
+      Column("post", Text),
+      Column("topic_id", Integer, nullable=False, index=True),
+      Column("new_topic", SmallInteger, default=0),
+      Column("queued", SmallInteger, nullable=False, default=0))
+
+Table("ipb_message_text", schema,
+      Column("msg_id", Integer, primary_key=True),
+      Column("msg_date", Integer),
+      Column("msg_post", Text),
+      Column("msg_sent_to_count", SmallInteger, nullable=False, default=0),
+      Column("msg_author_id", Integer, nullable=False, default=0))
+
+Table("ipb_message_topics", schema,
+      Column("mt_id", Integer, primary_key=True),
+      Column("mt_msg_id", Integer, nullable=False),
+      Column("mt_date", Integer, nullable=False),
+      Column("mt_title", String(255), nullable=False),
+      Column("mt_from_id", Integer, nullable=False),
+      Column("mt_to_id", Integer, nullable=False),
+      Column("mt_owner_id", Integer, nullable=False, index=True),
+      Column("mt_vid_folder", String(32), nullable=False),
+      Column("mt_read", SmallInteger, nullable=False, default=0))
+
+Table("exma_locations", schema,
+      Column("lid", Integer, primary_key=True),
+      Column("location", String(100), nullable=False),
+      Column("url", String(255)),
+      Column("location_url", String(100)),
+      Column("strasse", String(100)),
+      Column("plz", String(5)),
+      Column("stadt", String(50)))
+
+Table("exma_veranstalter", schema,
+      Column("vid", Integer, primary_key=True),
+      Column("mid", Integer, nullable=False),
+      Column("location_id", Integer, nullable=False),
+      Column("approved", SmallInteger, nullable=False, default=0))
+
+Table("exma_events", schema,
+      Column("event_id", Integer, primary_key=True),
+      Column("start", Integer, nullable=False),
+      Column("end", Integer, nullable=False),
+      Column("type", SmallInteger, nullable=False),
+      Column("category", SmallInteger, nullable=False),
+      Column("location_id", Integer, nullable=False))
+
+Table("pixma_album", schema,
+      Column("a_id", Integer, primary_key=True),
+      Column("title", String(255), nullable=False),
+      Column("a_date", String(20)),
+      Column("a_location", String(100)),
+      Column("a_desc", Text),
+      Column("time", Integer, nullable=False),
+      Column("l_id", Integer, nullable=False, default=0),
+      Column("thumb_id", Integer))
+
+Table("pixma_pics", schema,
+      Column("pid", Integer, primary_key=True),
+      Column("aid", Integer, nullable=False, index=True),
+      Column("hits", Integer, nullable=False, default=0))
+
+Table("pixma_comments", schema,
+      Column("msg_id", Integer, primary_key=True),
+      Column("picture_id", Integer, nullable=False, index=True),
+      Column("user_id", Integer, nullable=False),
+      Column("msg", Text),
+      Column("date", Integer))
+
+Table("pixma_people", schema,
+      Column("user", Integer, primary_key=True),
+      Column("picture_id", Integer, primary_key=True),
+      Column("album_id", Integer, nullable=False))
+
+Index("posts_date", schema.tables["ipb_posts"].c.post_date)
+api_indexes(schema)
+
+forum_perms_table(schema)
+
+
+class Scale(object):
+    """The amount of rows to generate.
+    """
+    presets = {"tiny": dict(groups=8, members=50, forums=12, topics=200, posts=1000, events=40,
+                            locations=10, organizers=5, albums=10, pictures=200, messages=300),
+               "small": dict(groups=10, members=1000, forums=40, topics=5000, posts=50000, events=400,
+                             locations=50, organizers=30, albums=200, pictures=10000, messages=10000),
+               "large": dict(groups=16, members=100000, forums=200, topics=100000, posts=1000000, events=5000,
+                             locations=500, organizers=300, albums=5000, pictures=250000, messages=200000)}
+
+    def __init__(self, groups, members, forums, topics, posts, events,
+                 locations, organizers, albums, pictures, messages):
+        self.groups = max(groups, GROUP_MODERATOR)
+        self.members = members
+        self.forums = forums
+        self.topics = topics
+        self.posts = posts
+        self.events = min(events, topics)
+        self.locations = locations
+        self.organizers = organizers
+        self.albums = albums
+        self.pictures = max(pictures, albums)
+        self.messages = messages
+
+    @classmethod
+    def preset(cls, name, **overrides):
+        """Get a preset scale, optionally with some counts changed.
+
+        :type name: str
+        :param name: The name of the preset (tiny, small or large).
+        :rtype: Scale
+        """
+        counts = dict(cls.presets[name])
+        counts.update((key, value) for key, value in overrides.items() if value is not None)
+        return cls(**counts)
+
+
+_words = ("party", "mensa", "vorlesung", "klausur", "bier", "club", "konzert", "campus", "dresden",
+          "neustadt", "elbe", "fahrrad", "wohnung", "semester", "bibliothek", "kaffee", "musik",
+          "film", "sport", "reise")
+
+
+def _permission_array(perms):
+    """Serialize the permission masks like the ipb does.
+
+    :type perms: dict[str, list of int]
+    :rtype: str
+    """
+    serialized = dict((perm_type, ",".join(str(mask) for mask in masks)) for perm_type, masks in perms.items())
+    return phpserialize.dumps(serialized).decode("utf8")
+
+
+class Generator(object):
+    def __init__(self, scale, seed=0, reference=None):
+        """
+        :type scale: Scale
+        :param scale: The amount of rows to generate.
+        :type seed: int
+        :param seed: The seed of the random numbers.
+        :type reference: int
+        :param reference: The timestamp "now" of the generated data (default: now).
+        """
+        self.scale = scale
+        self.random = random.Random(seed)
+        self.reference = int(reference if reference is not None else time.time())
+        self._texts = [self._text(self.random.randint(3, 60)) for _ in range(200)]
+        self._message_counts = {}
+
+    def _text(self, sentences):
+        parts = []
+        for _ in range(sentences):
+            sentence = " ".join(self.random.choice(_words) for _ in range(self.random.randint(4, 14)))
+            parts.append(sentence.capitalize() + self.random.choice((".", "!", "?", ".<br />")))
+        return " ".join(parts)
+
+    def _timestamp(self, days_back, days_ahead=0):
+        return self.reference + self.random.randint(-days_back * 86400, days_ahead * 86400)
+
+    def _member_name(self, member_id):
+        return "user%d" % member_id
+
+    def _member(self):
+        return self.random.randint(1, self.scale.members)
+
+    def groups(self):
+        names = {GROUP_VALIDATING: "Validating", GROUP_GUEST: "Guests", GROUP_MEMBER: "Members",
+                 GROUP_ADMIN: "Admins", GROUP_MODERATOR: "Moderators"}
+        for g_id in range(1, self.scale.groups + 1):
+            perm_id = "4,3" if g_id == GROUP_ADMIN else str(g_id)
+            yield {"g_id": g_id, "g_title": names.get(g_id, "Group %d" % g_id), "g_perm_id": perm_id}
+
+    def forums(self):
+        special = list(range(GROUP_MODERATOR + 1, self.scale.groups + 1))
+        for forum_id in range(1, self.scale.forums + 1):
+            read = [GROUP_ADMIN, GROUP_MODERATOR]
+            write = [GROUP_ADMIN, GROUP_MODERATOR]
+            chance = self.random.random()
+            if chance < 0.8:
+                read.append(GROUP_MEMBER)
+                write.append(GROUP_MEMBER)
+            if chance < 0.4:
+                read.append(GROUP_GUEST)
+            if len(special) and self.random.random() < 0.3:
+                mask = self.random.choice(special)
+                read.append(mask)
+                write.append(mask)
+            perms = {"start_perms": write, "reply_perms": write, "read_perms": read,
+                     "upload_perms": write, "show_perms": read}
+            yield {"id": forum_id, "name": "Forum %d" % forum_id, "description": self.random.choice(self._texts),
+                   "parent_id": -1, "position": forum_id, "topics": 0, "posts": 0,
+                   "last_post": self.reference, "permission_array": _permission_array(perms)}
+
+    def members(self):
+        special = list(range(GROUP_MODERATOR + 1, self.scale.groups + 1))
+        for member_id in range(1, self.scale.members + 1):
+            chance = self.random.random()
+            if chance < 0.01:
+                mgroup = GROUP_ADMIN
+            elif chance < 0.03:
+                mgroup = GROUP_MODERATOR
+            elif chance < 0.05:
+                mgroup = GROUP_VALIDATING
+            else:
+                mgroup = GROUP_MEMBER
+            others = ""
+            if len(special) and self.random.random() < 0.1:
+                others = ",%s," % ",".join(str(g) for g in self.random.sample(special, min(2, len(special))))
+            temp_ban = "0"
+            if self.random.random() < 0.01:
+                start = self._timestamp(10)
+                temp_ban = "%d:%d:%d:d" % (start, start + 30 * 86400, 30)
+            yield {"id": member_id, "name": self._member_name(member_id), "mgroup": mgroup,
+                   "mgroup_others": others, "email": "user%d@example.org" % member_id,
+                   "joined": self._timestamp(3650), "posts": self.random.randint(0, 5000),
+                   "last_visit": self._timestamp(30), "temp_ban": temp_ban}
+
+    def converge(self):
+        for member_id in range(1, self.scale.members + 1):
+            salt = "".join(self.random.choice(string.ascii_letters) for _ in range(5))
+            yield {"converge_id": member_id, "converge_email": "user%d@example.org" % member_id,
+                   "converge_joined": self.reference, "converge_pass_salt": salt,
+                   "converge_pass_hash": exma_passhash(PASSWORD, salt)}
+
+    def member_extra(self):
+        for member_id in range(1, self.scale.members + 1):
+            counts = self._message_counts.get(member_id, {})
+            vdirs = "in:Inbox;%d|sent:Sent Items;%d" % (counts.get("in", 0), counts.get("sent", 0))
+            if self.random.random() < 0.05:
+                vdirs += "|dir_3:Archiv;0"
+            yield {"id": member_id, "vdirs": vdirs}
+
+    def topics(self):
+        for tid in range(1, self.scale.topics + 1):
+            start = self._timestamp(5 * 365)
+            starter = self._member()
+            last_poster = self._member()
+            yield {"tid": tid, "title": " ".join(self.random.sample(_words, 4)).capitalize(),
+                   "description": "", "state": "open", "posts": 0, "starter_id": starter,
+                   "start_date": start, "last_poster_id": last_poster,
+                   "last_post": self.random.randint(start, max(start, self.reference)),
+                   "starter_name": self._member_name(starter), "last_poster_name": self._member_name(last_poster),
+                   "views": self.random.randint(0, 10000), "forum_id": self.random.randint(1, self.scale.forums),
+                   "approved": 0 if self.random.random() < 0.02 else 1}
+
+    def posts(self):
+        for pid in range(1, self.scale.posts + 1):
+            author = self._member()
+            yield {"pid": pid, "author_id": author, "author_name": self._member_name(author),
+                   "post_date": self._timestamp(5 * 365), "post": self.random.choice(self._texts),
+                   "topic_id": self.random.randint(1, self.scale.topics), "new_topic": 0,
+                   "queued": 1 if self.random.random() < 0.01 else 0}
+
+    def locations(self):
+        for lid in range(1, self.scale.locations + 1):
+            yield {"lid": lid, "location": "Location %d" % lid, "url": "http://location%d.example.org/" % lid,
+                   "location_url": "location-%d" % lid, "strasse": "Strasse %d" % lid,
+                   "plz": "01%03d" % (lid % 1000), "stadt": "Dresden"}
+
+    def organizers(self):
+        for vid in range(1, self.scale.organizers + 1):
+            yield {"vid": vid, "mid": self._member(), "location_id": self.random.randint(1, self.scale.locations),
+                   "approved": 1 if self.random.random() < 0.9 else 0}
+
+    def events(self):
+        for event_id in self.random.sample(range(1, self.scale.topics + 1), self.scale.events):
+            # full hours around now, like the events entered in the board
+            start = self._timestamp(60, 60) // 3600 * 3600
+            if self.random.random() < 0.3:
+                event_type = 1
+                end = start + self.random.randint(4, 20) * 7 * 86400
+            else:
+                event_type = 0
+                if self.random.random() < 0.7:
+                    end = start + self.random.randint(2, 8) * 3600
+                else:
+                    end = start + self.random.randint(1, 5) * 86400
+            yield {"event_id": event_id, "start": start, "end": end, "type": event_type,
+                   "category": self.random.randint(0, 7), "location_id": self.random.randint(1, self.scale.locations)}
+
+    def albums(self):
+        for a_id in range(1, self.scale.albums + 1):
+            created = self._timestamp(3 * 365)
+            yield {"a_id": a_id, "title": "Album %d" % a_id, "a_date": time.strftime("%d.%m.%Y", time.gmtime(created)),
+                   "a_location": "Location %d" % self.random.randint(1, self.scale.locations),
+                   "a_desc": self.random.choice(self._texts)[:200], "time": created,
+                   "l_id": self.random.randint(1, self.scale.locations), "thumb_id": a_id}
+
+    def pictures(self):
+        # every album gets at least one picture, its first one is the thumbnail
+        for pid in range(1, self.scale.pictures + 1):
+            aid = pid if pid <= self.scale.albums else self.random.randint(1, self.scale.albums)
+            yield {"pid": pid, "aid": aid, "hits": self.random.randint(0, 3000)}
+
+    def picture_comments(self):
+        for msg_id in range(1, self.scale.pictures // 5 + 1):
+            yield {"msg_id": msg_id, "picture_id": self.random.randint(1, self.scale.pictures),
+                   "user_id": self._member(), "msg": self.random.choice(self._texts)[:300],
+                   "date": self._timestamp(3 * 365)}
+
+    def picture_people(self):
+        seen = set()
+        for _ in range(self.scale.pictures // 10):
+            key = (self._member(), self.random.randint(1, self.scale.pictures))
+            if key in seen:
+                continue
+            seen.add(key)
+            yield {"user": key[0], "picture_id": key[1], "album_id": self.random.randint(1, self.scale.albums)}
+
+    def message_texts(self):
+        for msg_id in range(1, self.scale.messages + 1):
+            yield {"msg_id": msg_id, "msg_date": self._timestamp(2 * 365), "msg_post": self.random.choice(self._texts),
+                   "msg_sent_to_count": 1, "msg_author_id": self._member()}
+
+    def message_topics(self):
+        """Create a "sent" and an "in" topic for each message text.
+        """
+        mt_id = 0
+        for msg_id in range(1, self.scale.messages + 1):
+            sender = self._member()
+            recipient = self._member()
+            date = self._timestamp(2 * 365)
+            title = " ".join(self.random.sample(_words, 3)).capitalize()
+            for owner, folder in ((sender, "sent"), (recipient, "in")):
+                mt_id += 1
+                counts = self._message_counts.setdefault(owner, {})
+                counts[folder] = counts.get(folder, 0) + 1
+                yield {"mt_id": mt_id, "mt_msg_id": msg_id, "mt_date": date, "mt_title": title,
+                       "mt_from_id": sender, "mt_to_id": recipient, "mt_owner_id": owner,
+                       "mt_vid_folder": folder, "mt_read": 1 if self.random.random() < 0.8 else 0}
+
+    def tables(self):
+        """Get the row generators in the order they have to be inserted.
+
+        :rtype: list of (str, generator)
+        """
+        return [("ipb_groups", self.groups()),
+                ("ipb_forums", self.forums()),
+                ("ipb_members", self.members()),
+                ("ipb_members_converge", self.converge()),
+                ("ipb_topics", self.topics()),
+                ("ipb_posts", self.posts()),
+                ("exma_locations", self.locations()),
+                ("exma_veranstalter", self.organizers()),
+                ("exma_events", self.events()),
+                ("pixma_album", self.albums()),
+                ("pixma_pics", self.pictures()),
+                ("pixma_comments", self.picture_comments()),
+                ("pixma_people", self.picture_people()),
+                ("ipb_message_text", self.message_texts()),
+                ("ipb_message_topics", self.message_topics()),
+                ("ipb_member_extra", self.member_extra())]
+
+
+def _insert(conn, table, rows, batch_size=10000):
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if len(batch):
+        conn.execute(table.insert(), batch)
+        count += len(batch)
+    return count
+
+
+def _update_counters(conn):
+    """Set the topic/post counters of the forums and topics like the board maintains them.
+    """
+    forums = schema.tables["ipb_forums"]
+    topics = schema.tables["ipb_topics"]
+    posts = schema.tables["ipb_posts"]
+
+    conn.execute(topics.update().values(
+        posts=select([func.count()]).where(posts.c.topic_id == topics.c.tid).where(posts.c.queued == 0).as_scalar()))
+    conn.execute(forums.update().values(
+        topics=select([func.count()]).where(topics.c.forum_id == forums.c.id).where(topics.c.approved == 1).as_scalar(),
+        posts=select([func.coalesce(func.sum(topics.c.posts), 0)]).where(topics.c.forum_id == forums.c.id).as_scalar()))
+
+
+def generate(engine, scale, seed=0, reference=None, verbose=False):
+    """Create the ipb tables in the given database and fill them.
+
+    Existing tables are dropped before.
+
+    :type engine: sqlalchemy.engine.Engine
+    :param engine: The database to fill.
+    :type scale: Scale
+    :param scale: The amount of rows to generate.
+    :type seed: int
+    :param seed: The seed for the random data.
+    :type reference: int
+    :param reference: The timestamp "now" of the generated data (default: now).
+    :type verbose: bool
+    :param verbose: Print the progress.
+    """
+    generator = Generator(scale, seed, reference)
+    schema.drop_all(engine)
+    schema.create_all(engine)
+    for name, rows in generator.tables():
+        with engine.begin() as conn:
+            count = _insert(conn, schema.tables[name], rows)
+        if verbose:
+            print("%-22s %8d rows" % (name, count))
+    with engine.begin() as conn:
+        _update_counters(conn)
+    sync_forum_perms(engine)
+    if verbose:
+        print("%-22s %8d rows" % ("exma_forum_perms", engine.execute(
+            select([func.count()]).select_from(schema.tables["exma_forum_perms"])).scalar()))
+
+
+_installed = {}
+
+
+def use_synthetic_database(scale="tiny", seed=0, filename=None):
+    """Point the global connection to a generated SQLite database.
+
+    The database is generated once per process (and scale/seed). This has
+    to be called before the mapping is imported.
+
+    :type scale: str
+    :param scale: The name of the Scale preset.
+    :type seed: int
+    :param seed: The seed for the random data.
+    :type filename: str
+    :param filename: The database file, a temporary file if not given.
+    :rtype: str
+    :return: The filename of the database.
+    """
+    key = (scale, seed, filename)
+    if key in _installed:
+        return _installed[key]
+
+    if filename is None:
+        handle, filename = tempfile.mkstemp(prefix="exma_%s_" % scale, suffix=".sqlite")
+        os.close(handle)
+    url = "sqlite:///%s" % filename
+
+    engine = create_engine(url)
+    generate(engine, Scale.preset(scale), seed)
+    engine.dispose()
+
+    connection.configure(DatabaseSettings(url=url), snapshot_file="")
+    _installed[key] = filename
+    return filename
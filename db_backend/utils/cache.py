@@ -0,0 +1,169 @@
+import threading
+import time
+
+
+class CachedTable(object):
+    """A process wide, compiled copy of a rarely changing table.
+
+    The rows are loaded and compiled once and then held in memory. After
+    the ttl expired the table gets reloaded, or - if a change stamp
+    callable is given - the stamp is checked and the table only gets
+    reloaded if the stamp changed. Subclasses set compile_rows to the
+    callable that builds the compiled object from the rows.
+    """
+    compile_rows = None
+
+    def __init__(self, loader, ttl=300, change_stamp=None):
+        """
+        :type loader: callable
+        :param loader: Returns the rows of the table.
+        :type ttl: float
+        :param ttl: The seconds after which the table is reloaded (or the stamp is checked).
+        :type change_stamp: callable
+        :param change_stamp: Returns a cheap value that changes with the table.
+        """
+        self._loader = loader
+        self._change_stamp = change_stamp
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._stamp = None
+        self._checked = 0
+
+    def invalidate(self):
+        """Drop the compiled table, it is reloaded on the next lookup.
+        """
+        self._compiled = None
+
+    def _expired(self):
+        return time.monotonic() - self._checked >= self.ttl
+
+    def _current(self):
+        """Get the current compiled table, reload it if needed.
+        """
+        compiled = self._compiled
+        if compiled is not None and not self._expired():
+            return compiled
+
+        with self._lock:
+            if self._compiled is not None and not self._expired():
+                return self._compiled
+            stamp = None
+            if self._change_stamp is not None:
+                stamp = self._change_stamp()
+                if self._compiled is not None and stamp == self._stamp:
+                    self._checked = time.monotonic()
+                    return self._compiled
+            self._compiled = self.compile_rows(self._loader())
+            self._stamp = stamp
+            self._checked = time.monotonic()
+            return self._compiled
+
+
+class CompiledCounters(object):
+    """Counters by key, e.g. the topics per forum.
+    """
+
+    def __init__(self, rows):
+        """
+        :type rows: list of (object, int)
+        :param rows: The keys and their counts.
+        """
+        self.counts = dict((key, count or 0) for key, count in rows)
+        self.total = sum(self.counts.values())
+
+
+class CachedCounters(CachedTable):
+    """A process wide copy of counters, reloaded after the ttl.
+
+    The loader returns the (key, count) rows. The counts are not exact,
+    they may be outdated by up to the ttl.
+    """
+    compile_rows = CompiledCounters
+
+    def count(self, keys=None):
+        """Get the sum of the counters of the given keys.
+
+        :type keys: collections.Iterable
+        :param keys: The keys to sum, None for all.
+        :rtype: int
+        """
+        compiled = self._current()
+        if keys is None:
+            return compiled.total
+        return sum(compiled.counts.get(key, 0) for key in keys)
+
+
+class IncrementalCounters(object):
+    """A process wide copy of the counters of a table that mostly grows.
+
+    After the ttl only the rows added since the last load (with a greater
+    id) are counted and added to the counters, a range query on the
+    primary key. Deleted or changed rows are only noticed when the
+    counters are rebuilt completely after rebuild_ttl.
+    """
+
+    def __init__(self, loader, ttl=60, rebuild_ttl=900):
+        """
+        :type loader: callable
+        :param loader: Returns the maximum id and the (key, count) rows of the rows
+            with an id greater than the given one (all rows for None).
+        :type ttl: float
+        :param ttl: The seconds after which the added rows are counted.
+        :type rebuild_ttl: float
+        :param rebuild_ttl: The seconds after which the counters are rebuilt.
+        """
+        self._loader = loader
+        self.ttl = ttl
+        self.rebuild_ttl = rebuild_ttl
+        self._lock = threading.Lock()
+        self._counts = None
+        self._max_id = None
+        self._checked = 0
+        self._built = 0
+        self.full_loads = 0
+        self.incremental_loads = 0
+
+    def invalidate(self):
+        """Drop the counters, they are rebuilt on the next lookup.
+        """
+        self._counts = None
+
+    def _current(self):
+        counts = self._counts
+        if counts is not None and time.monotonic() - self._checked < self.ttl:
+            return counts
+
+        with self._lock:
+            now = time.monotonic()
+            if self._counts is not None and now - self._checked < self.ttl:
+                return self._counts
+            if self._counts is None or now - self._built >= self.rebuild_ttl:
+                max_id, rows = self._loader(None)
+                counts = CompiledCounters(rows)
+                self._built = now
+                self.full_loads += 1
+            else:
+                max_id, rows = self._loader(self._max_id)
+                counts = CompiledCounters(list(self._counts.counts.items()))
+                for key, count in rows:
+                    counts.counts[key] = counts.counts.get(key, 0) + (count or 0)
+                    counts.total += count or 0
+                self.incremental_loads += 1
+            if max_id is not None:
+                self._max_id = max_id
+            self._counts = counts
+            self._checked = now
+            return counts
+
+    def count(self, keys=None):
+        """Get the sum of the counters of the given keys.
+
+        :type keys: collections.Iterable
+        :param keys: The keys to sum, None for all.
+        :rtype: int
+        """
+        counts = self._current()
+        if keys is None:
+            return counts.total
+        return sum(counts.counts.get(key, 0) for key in keys)
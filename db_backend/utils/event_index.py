@@ -0,0 +1,204 @@
+from bisect import bisect_left
+import threading
+import time
+
+
+class EventSpan(object):
+    """The indexed data of an event.
+    """
+    __slots__ = ("event_id", "start", "end", "category", "forum_id")
+
+    def __init__(self, event_id, start, end, category, forum_id):
+        self.event_id = event_id
+        self.start = start
+        self.end = end
+        self.category = category
+        self.forum_id = forum_id
+
+
+# The modulus and the base of the row digest. All intermediate values stay
+# below 2**62, so the digest is computed exactly with 64 bit integers.
+_DIGEST_MODULUS = 2147483647
+_DIGEST_BASE = 1000003
+
+
+def row_digest(*values):
+    """Compute the digest of the values of a row, e.g. the indexed values of an event.
+
+    Only integer arithmetic is used, so the same function builds the
+    SQL expression of an aggregate from the columns. The digest is
+    squared at the end: the sum of the digests of all rows changes as
+    well if two rows swap a value, e.g. their forums. The values have to
+    be integers below 2**32, text columns can be folded in with
+    db_backend.functions.text_digest.
+
+    :type values: list of int
+    :rtype: int
+    """
+    digest = values[0] % _DIGEST_MODULUS
+    for value in values[1:]:
+        digest = (digest * _DIGEST_BASE + value) % _DIGEST_MODULUS
+    return (digest * digest) % _DIGEST_MODULUS
+
+
+def span_stamp(spans):
+    """Compute the change stamp of the given spans.
+
+    This has to match the aggregates of the stamp loader of the index:
+    the count and the sum of the row digests.
+
+    :type spans: collections.Iterable[EventSpan]
+    :rtype: tuple of int
+    """
+    count = digests = 0
+    for span in spans:
+        count += 1
+        digests += row_digest(span.event_id, span.start, span.end, span.category, span.forum_id)
+    return count, digests
+
+
+class CompiledSpans(object):
+    """The spans of all events sorted by start.
+
+    Besides the starts a running maximum of the ends is kept, so the
+    first span that can reach into a window is found with a bisect, too.
+    Instances are never changed after creation.
+    """
+
+    def __init__(self, spans):
+        """
+        :type spans: collections.Iterable[EventSpan]
+        """
+        self.spans = sorted(spans, key=lambda span: (span.start, span.event_id))
+        self.starts = [span.start for span in self.spans]
+        self.max_ends = []
+        max_end = None
+        for span in self.spans:
+            span_end = max(span.start, span.end)
+            max_end = span_end if max_end is None else max(max_end, span_end)
+            self.max_ends.append(max_end)
+        self.max_id = max([span.event_id for span in self.spans] or [0])
+        self.stamp = span_stamp(self.spans)
+
+    def between(self, start, end):
+        """Get the spans that overlap the interval like DbEvents.query_between selects them.
+
+        :type start: int
+        :param start: The start timestamp (inclusive)
+        :type end: int
+        :param end: The end timestamp (exclusive)
+        :rtype: list of EventSpan
+        """
+        # Every selected span starts or ends at or after the start of the
+        # interval, and starts before its end.
+        first = bisect_left(self.max_ends, start)
+        last = bisect_left(self.starts, end)
+        selected = []
+        for span in self.spans[first:last]:
+            if start <= span.start < end or start <= span.end < end or (span.start < start and span.end > end):
+                selected.append(span)
+        return selected
+
+    def merged(self, spans):
+        """Create a new instance with the given spans added or replaced.
+
+        :type spans: list of EventSpan
+        :rtype: CompiledSpans
+        """
+        replaced = set(span.event_id for span in spans)
+        return CompiledSpans([span for span in self.spans if span.event_id not in replaced] + spans)
+
+
+class EventIntervalIndex(object):
+    """A process wide index of the time spans of all events.
+
+    The index answers which events overlap a time window (in a category
+    and in a set of forums) without a query. It polls the database for
+    changes at most every poll_interval seconds: if only events were
+    added, only these are loaded, otherwise the index is rebuilt.
+    """
+
+    def __init__(self, row_loader, stamp_loader, poll_interval=30):
+        """
+        :type row_loader: callable
+        :param row_loader: Returns the (event_id, start, end, category, forum_id) of all
+            events with an id greater than the given one (all for None).
+        :type stamp_loader: callable
+        :param stamp_loader: Returns the maximum event id and the stamp (see span_stamp)
+            of the events with an id up to the given one.
+        :type poll_interval: float
+        :param poll_interval: The seconds between the checks for changes.
+        """
+        self._row_loader = row_loader
+        self._stamp_loader = stamp_loader
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._checked = 0
+        self.full_loads = 0
+        self.incremental_loads = 0
+
+    def invalidate(self):
+        """Drop the index, it is rebuilt on the next lookup.
+        """
+        self._compiled = None
+
+    def _load(self, after_id=None):
+        return [EventSpan(*row) for row in self._row_loader(after_id)]
+
+    def _current(self):
+        compiled = self._compiled
+        if compiled is not None and time.monotonic() - self._checked < self.poll_interval:
+            return compiled
+
+        with self._lock:
+            compiled = self._compiled
+            if compiled is not None and time.monotonic() - self._checked < self.poll_interval:
+                return compiled
+            if compiled is not None:
+                max_id, stamp = self._stamp_loader(compiled.max_id)
+                if tuple(stamp) != compiled.stamp:
+                    compiled = None
+                elif max_id is not None and max_id > compiled.max_id:
+                    compiled = compiled.merged(self._load(compiled.max_id))
+                    self.incremental_loads += 1
+            if compiled is None:
+                compiled = CompiledSpans(self._load())
+                self.full_loads += 1
+            self._compiled = compiled
+            self._checked = time.monotonic()
+            return compiled
+
+    def revision(self):
+        """Get the revision of the index: the maximum event id and the stamp of all spans.
+
+        The revision follows the changes of the database with a delay of
+        up to poll_interval seconds.
+
+        :rtype: tuple
+        """
+        compiled = self._current()
+        return compiled.max_id, compiled.stamp
+
+    def event_ids_between(self, start, end, category=None, forum_ids=None):
+        """Get the ids of the events overlapping the interval.
+
+        :type start: int
+        :param start: The start timestamp (inclusive)
+        :type end: int
+        :param end: The end timestamp (exclusive)
+        :type category: int
+        :param category: Only select events of this category.
+        :type forum_ids: set of int
+        :param forum_ids: Only select events in these forums.
+        :rtype: list of int
+        :return: The event ids ordered by the start of the events.
+        """
+        selected = []
+        for span in self._current().between(start, end):
+            if category is not None and span.category != category:
+                continue
+            if forum_ids is not None and span.forum_id not in forum_ids:
+                continue
+            selected.append(span.event_id)
+        return selected
@@ -1,8 +1,206 @@
+from bisect import bisect_left
+from collections import OrderedDict
 import datetime
+import heapq
+import threading
+
+from dateutil import rrule
+
+from db_backend.utils import timestamps
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 _event_duration = datetime.timedelta(hours=6)
 
+# The seconds between the occurrences for the rules that are expanded arithmetically.
+_recurrence_steps = {rrule.DAILY: 24 * 60 * 60,
+                     rrule.WEEKLY: 7 * 24 * 60 * 60}
+
+
+def recurrence_step(db_event):
+    """Get the seconds between the occurrences of an event.
+
+    :param db_event: The database event
+    :type db_event: DbEvents
+    :rtype: int or None
+    :return: The step, None if the recurrence has to be expanded by the rrule.
+    """
+    return _recurrence_steps.get(db_event.recurrence_interval)
+
+
+def expand_occurrences(db_event):
+    """Get the start timestamps of all occurrences of an event.
+
+    Daily and weekly events (all events of the board, the timestamps are
+    UTC) are expanded arithmetically to a range from the start until
+    the end (inclusive, like the rrule). Other rules are expanded with
+    the rrule.
+
+    :param db_event: The database event
+    :type db_event: DbEvents
+    :rtype: range or tuple of int
+    :return: The sorted start timestamps.
+    """
+    step = recurrence_step(db_event)
+    if step is None:
+        return tuple(timestamps.to_db(date_instance) for date_instance in db_event.recurrence_rule)
+    start = int(db_event.start)
+    return range(start, max(start, int(db_event.end) + 1), step)
+
+
+def expand_between(spans, start, end):
+    """Expand the occurrences of many events within an interval at once.
+
+    With numpy the occurrences of all events are computed in one
+    vectorized pass, without it with a range per event. All occurrences
+    of the interval are computed before they are returned, so this is
+    meant for bulk expansions of whole windows. The paged event list
+    merges the lazy ranges of the occurrence cache instead, see
+    merge_event_instances.
+
+    :param spans: The (start, end, step) timestamps of the events.
+    :type spans: list of (int, int, int)
+    :param start: The start timestamp (including)
+    :type start: int
+    :param end: The end timestamp (including)
+    :type end: int
+    :rtype: (list of int, list of int)
+    :return: The start timestamps of the occurrences and the positions of their
+        events in spans, ordered by start and position.
+    """
+    if numpy is None:
+        occurrences = []
+        for position, (event_start, event_end, step) in enumerate(spans):
+            first = event_start + max(0, -(-(start - event_start) // step)) * step
+            for occurrence in range(first, min(event_end, end) + 1, step):
+                occurrences.append((occurrence, position))
+        occurrences.sort()
+        return [occurrence for occurrence, _ in occurrences], [position for _, position in occurrences]
+
+    if not len(spans):
+        return [], []
+    event_starts, event_ends, steps = (numpy.array(column, dtype=numpy.int64) for column in zip(*spans))
+    firsts = numpy.maximum(0, -((event_starts - start) // steps))
+    lasts = (numpy.minimum(event_ends, end) - event_starts) // steps
+    counts = numpy.maximum(0, lasts - firsts + 1)
+    positions = numpy.repeat(numpy.arange(len(spans)), counts)
+    index_in_event = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    occurrences = event_starts[positions] + (firsts[positions] + index_in_event) * steps[positions]
+    order = numpy.lexsort((positions, occurrences))
+    return occurrences[order].tolist(), positions[order].tolist()
+
+
+class OccurrenceCache(object):
+    """A LRU cache of the expanded occurrences of the events.
+
+    The occurrences are keyed by the event id together with the start,
+    end and type of the event, so an edited event gets a new entry and
+    the old one is evicted eventually. The event list takes the
+    occurrences of all events from here (see merge_event_instances),
+    repeated calendar views skip the expansion.
+    """
+
+    def __init__(self, max_size=4096):
+        """
+        :type max_size: int
+        :param max_size: The maximum number of cached events.
+        """
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._occurrences = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(db_event):
+        return db_event.event_id, db_event.start, db_event.end, db_event.type
+
+    def occurrences(self, db_event):
+        """Get the start timestamps of all occurrences of an event.
+
+        :param db_event: The database event
+        :type db_event: DbEvents
+        :rtype: range or tuple of int
+        :return: The sorted start timestamps, see expand_occurrences.
+        """
+        key = self.key(db_event)
+        with self._lock:
+            occurrences = self._occurrences.get(key)
+            if occurrences is not None:
+                self._occurrences.move_to_end(key)
+                self.hits += 1
+                return occurrences
+            self.misses += 1
+
+        occurrences = expand_occurrences(db_event)
+        with self._lock:
+            self._occurrences[key] = occurrences
+            while len(self._occurrences) > self.max_size:
+                self._occurrences.popitem(last=False)
+        return occurrences
+
+    def clear(self):
+        """Drop all cached occurrences and reset the counters.
+        """
+        with self._lock:
+            self._occurrences.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Get the hit/miss counters and the size of the cache.
+
+        :rtype: dict
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._occurrences)}
+
+
+occurrence_cache = OccurrenceCache()
+
+
+def _iter_occurrences(db_event, start, end):
+    """Generate the start timestamps of the occurrences of an event within an interval.
+
+    The occurrences are taken from the occurrence cache. They are a range
+    for daily and weekly events, so the first occurrence is found by a
+    bisection without iterating over the ones before.
+
+    :type start: int
+    :type end: int
+    :rtype: collections.Iterable[int]
+    """
+    occurrences = occurrence_cache.occurrences(db_event)
+    for position in range(bisect_left(occurrences, start), len(occurrences)):
+        if occurrences[position] > end:
+            break
+        yield occurrences[position]
+
+
+def iter_event_instances(db_event, start, end):
+    """Generate the event instances within the given interval lazily in start order.
+
+    The occurrences are taken from the occurrence cache, the instances
+    share one EventRecord of the event.
+
+    :param db_event: The database event
+    :type db_event: DbEvents
+    :param start: The start date (including)
+    :type start: datetime.datetime
+    :param end: The end date (including)
+    :type end: datetime.datetime
+    :return A generator of the instances for the event.
+    :rtype: collections.Iterable[EventInstance]
+    """
+    record = None
+    for occurrence in _iter_occurrences(db_event, timestamps.to_db(start), timestamps.to_db(end)):
+        if record is None:
+            record = EventRecord(db_event)
+        yield EventInstance(timestamps.from_db(occurrence), db_event, record)
+
 
 def make_event_instances(db_event, start, end):
     """Create all event instances between the given interval
@@ -16,11 +214,50 @@ def make_event_instances(db_event, start, end):
     :return The list if instances for the event.
     :rtype: list of EventInstance
     """
-    instances = []
-    for date_instance in db_event.recurrence_rule.between(start, end, True):
-        instances.append(EventInstance(date_instance, db_event))
+    return list(iter_event_instances(db_event, start, end))
+
+
+def merge_event_instances(db_events, start, end):
+    """Generate the instances of all given events in chronological order.
+
+    The occurrence streams of the events (from the occurrence cache) are
+    merged with a heap on their start timestamps. Only the occurrences
+    up to the last consumed instance are computed and only the consumed
+    instances are created, so a paged view stops after offset + limit
+    instances. Instances with the same start are ordered by the event id
+    (and by the position of the event in db_events for duplicates).
+
+    :param db_events: The database events
+    :type db_events: collections.Iterable[DbEvents]
+    :param start: The start date (including)
+    :type start: datetime.datetime
+    :param end: The end date (including)
+    :type end: datetime.datetime
+    :return A generator of the instances of all events.
+    :rtype: collections.Iterable[EventInstance]
+    """
+    db_events = list(db_events)
+    start, end = timestamps.to_db(start), timestamps.to_db(end)
+    heap = []
+    for position, db_event in enumerate(db_events):
+        occurrences = _iter_occurrences(db_event, start, end)
+        occurrence = next(occurrences, None)
+        if occurrence is not None:
+            heap.append((occurrence, db_event.event_id, position, occurrences))
+    heapq.heapify(heap)
 
-    return instances
+    records = {}
+    while len(heap):
+        occurrence, event_id, position, occurrences = heap[0]
+        record = records.get(position)
+        if record is None:
+            record = records[position] = EventRecord(db_events[position])
+        yield EventInstance(timestamps.from_db(occurrence), db_events[position], record)
+        following = next(occurrences, None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (following, event_id, position, occurrences))
 
 
 class EventCategory(object):
@@ -80,23 +317,72 @@ EventCategory.make(6, "studentday", "Dresdner Studententage", )
 EventCategory.make(7, "science", "Forschung und Wissen")
 
 
+class EventRecord(object):
+    """The values of a DbEvents shared by all of its instances.
+
+    The values the instances are serialized from are computed once per
+    event instead of once per instance.
+    """
+    __slots__ = ("db_instance", "event_id", "title", "start_date", "end_date", "type_name",
+                 "category_instance", "location_id")
+
+    def __init__(self, db_instance):
+        """Precompute the values of an event.
+
+        :type db_instance: db_backend.DbEvents
+        :param db_instance: The real instance of the event
+        """
+        self.db_instance = db_instance
+        self.event_id = db_instance.event_id
+        self.title = db_instance.topic.title
+        self.start_date = db_instance.start_date
+        self.end_date = db_instance.end_date
+        if db_instance.type != 0:
+            self.type_name = "WEEKLY"
+        elif self.end_date - self.start_date < datetime.timedelta(days=1):
+            self.type_name = "SINGLE"
+        else:
+            self.type_name = "DAYLY"
+        self.category_instance = EventCategory.by_id(db_instance.category)
+        self.location_id = db_instance.location_id
+
+    @property
+    def location(self):
+        """Get the location of the event, only loaded if it is used.
+
+        :rtype: db_backend.DbLocations
+        """
+        return self.db_instance.location
+
+
 class EventInstance(object):
     """This is a wrapper of the DbEvents for a specific recurred
     instance of the event.
+
+    The values of the event are taken from an EventRecord shared by all
+    instances of the event, other attributes are delegated to the DbEvents.
     """
+    __slots__ = ("date_instance", "record")
+
+    editable = False
+    allDay = False
 
-    def __init__(self, date_instance, db_instance):
+    def __init__(self, date_instance, db_instance, record=None):
         """Create the specific event instance
 
         :type date_instance: datetime.datetime
         :param date_instance: The start date of this specific instance
         :type db_instance: db_backend.DbEvents
         :param db_instance: The real instance of the event
+        :type record: EventRecord
+        :param record: The shared record of the event, created if not given.
         """
         self.date_instance = date_instance
-        self.db_instance = db_instance
-        self.editable = False
-        self.allDay = False
+        self.record = record if record is not None else EventRecord(db_instance)
+
+    @property
+    def db_instance(self):
+        return self.record.db_instance
 
     @property
     def start(self):
@@ -118,11 +404,33 @@ class EventInstance(object):
 
     @property
     def overall_end(self):
-        return self.db_instance.end_date
+        return self.record.end_date
+
+    @property
+    def event_id(self):
+        return self.record.event_id
 
     @property
     def title(self):
-        return self.db_instance.topic.title
+        return self.record.title
+
+    @property
+    def type_name(self):
+        return self.record.type_name
+
+    @property
+    def category_instance(self):
+        return self.record.category_instance
+
+    @property
+    def location_id(self):
+        return self.record.location_id
+
+    @property
+    def location(self):
+        return self.record.location
 
     def __getattr__(self, item):
-        return getattr(self.db_instance, item)
+        if item.startswith("_") or item == "record":
+            raise AttributeError(item)
+        return getattr(self.record.db_instance, item)
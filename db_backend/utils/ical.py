@@ -0,0 +1,209 @@
+"""Render the events as iCalendar (RFC 5545) feed.
+
+Every event becomes a single VEVENT with a RRULE for its recurrence, so
+a feed over a whole year stays as small as the number of events. The
+rendered VEVENT blocks are cached by the revision of the event: the
+values they are rendered from.
+"""
+from collections import OrderedDict
+import threading
+
+from dateutil import rrule
+
+from db_backend.utils import timestamps
+from db_backend.utils.events import EventCategory, _event_duration
+
+
+CRLF = "\r\n"
+PRODID = "-//eXma//exma-api//DE"
+UID_DOMAIN = "exma.de"
+
+_frequencies = {rrule.DAILY: "DAILY",
+                rrule.WEEKLY: "WEEKLY"}
+
+
+def escape_text(value):
+    """Escape a TEXT value.
+
+    :type value: str
+    :rtype: str
+    """
+    value = value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+    return value.replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n")
+
+
+def fold_line(line):
+    """Fold a content line to lines of at most 75 octets.
+
+    The line is only split between characters, the continuation lines
+    start with a space.
+
+    :type line: str
+    :rtype: str
+    :return: The folded line including the trailing CRLF.
+    """
+    if len(line.encode("utf-8")) <= 75:
+        return line + CRLF
+    parts = []
+    current = ""
+    current_size = 0
+    limit = 75
+    for char in line:
+        char_size = len(char.encode("utf-8"))
+        if current_size + char_size > limit:
+            parts.append(current)
+            current = " "
+            current_size = 1
+            limit = 75
+        current += char
+        current_size += char_size
+    parts.append(current)
+    return CRLF.join(parts) + CRLF
+
+
+def format_timestamp(timestamp):
+    """Format a timestamp as UTC DATE-TIME.
+
+    :type timestamp: int
+    :rtype: str
+    """
+    return timestamps.from_db(timestamp).strftime("%Y%m%dT%H%M%SZ")
+
+
+def location_text(db_location):
+    """Get the text of the LOCATION property.
+
+    :type db_location: db_backend.mapping.DbLocations
+    :rtype: str or None
+    """
+    if db_location is None:
+        return None
+    town = " ".join(part for part in (db_location.plz, db_location.stadt) if part)
+    return ", ".join(part for part in (db_location.location, db_location.strasse, town) if part)
+
+
+def event_revision(db_event):
+    """Get the revision of an event: all values its VEVENT is rendered from.
+
+    :type db_event: db_backend.mapping.DbEvents
+    :rtype: tuple
+    """
+    topic = db_event.topic
+    return (db_event.event_id, db_event.start, db_event.end, db_event.type, db_event.category,
+            topic.title if topic is not None else None, topic.start_date if topic is not None else None,
+            location_text(db_event.location))
+
+
+def render_vevent(revision, recurrence_interval):
+    """Render the VEVENT block of an event.
+
+    :type revision: tuple
+    :param revision: The revision of the event, see event_revision.
+    :type recurrence_interval: int
+    :param recurrence_interval: The rrule frequency of the event.
+    :rtype: str
+    :return: The block, empty for an event without occurrences.
+    """
+    event_id, start, end, _, category, title, created, location = revision
+    start, end = int(start), int(end)
+    if end < start:
+        return ""
+    lines = ["BEGIN:VEVENT",
+             "UID:event-%d@%s" % (event_id, UID_DOMAIN),
+             "DTSTAMP:%s" % format_timestamp(created if created else start),
+             "DTSTART:%s" % format_timestamp(start),
+             "DTEND:%s" % format_timestamp(start + int(_event_duration.total_seconds()))]
+    if end > start:
+        lines.append("RRULE:FREQ=%s;UNTIL=%s" % (_frequencies[recurrence_interval], format_timestamp(end)))
+    lines.append("SUMMARY:%s" % escape_text(title or ""))
+    lines.append("CATEGORIES:%s" % escape_text(EventCategory.by_id(category).name))
+    if location:
+        lines.append("LOCATION:%s" % escape_text(location))
+    lines.append("END:VEVENT")
+    return "".join(fold_line(line) for line in lines)
+
+
+class VEventCache(object):
+    """A LRU cache of the rendered VEVENT blocks.
+
+    The blocks are keyed by the revision of the event, so an edited event
+    gets a new entry and the old one is evicted eventually.
+    """
+
+    def __init__(self, max_size=4096):
+        """
+        :type max_size: int
+        :param max_size: The maximum number of cached events.
+        """
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def vevent(self, db_event):
+        """Get the VEVENT block of an event.
+
+        :type db_event: db_backend.mapping.DbEvents
+        :rtype: str
+        """
+        revision = event_revision(db_event)
+        with self._lock:
+            block = self._blocks.get(revision)
+            if block is not None:
+                self._blocks.move_to_end(revision)
+                self.hits += 1
+                return block
+            self.misses += 1
+
+        block = render_vevent(revision, db_event.recurrence_interval)
+        with self._lock:
+            self._blocks[revision] = block
+            while len(self._blocks) > self.max_size:
+                self._blocks.popitem(last=False)
+        return block
+
+    def clear(self):
+        """Drop all cached blocks and reset the counters.
+        """
+        with self._lock:
+            self._blocks.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Get the hit/miss counters and the size of the cache.
+
+        :rtype: dict
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._blocks)}
+
+
+vevent_cache = VEventCache()
+
+
+def iter_calendar(db_events, name=None, chunk_size=64, cache=vevent_cache):
+    """Generate the iCalendar feed of the given events in chunks.
+
+    :type db_events: collections.Iterable[db_backend.mapping.DbEvents]
+    :type name: str
+    :param name: The name of the calendar.
+    :type chunk_size: int
+    :param chunk_size: The number of events per generated chunk.
+    :type cache: VEventCache
+    :rtype: collections.Iterable[str]
+    """
+    header = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:%s" % PRODID, "CALSCALE:GREGORIAN", "METHOD:PUBLISH"]
+    if name is not None:
+        header.append("X-WR-CALNAME:%s" % escape_text(name))
+    yield "".join(fold_line(line) for line in header)
+
+    chunk = []
+    for db_event in db_events:
+        chunk.append(cache.vevent(db_event))
+        if len(chunk) >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+    if len(chunk):
+        yield "".join(chunk)
+    yield fold_line("END:VCALENDAR")
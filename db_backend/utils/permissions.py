@@ -0,0 +1,183 @@
+from db_backend.utils.cache import CachedTable
+from db_backend.utils.user import parse_permission_bits, mask_bits, ForumPermissions
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ForumBitsets(object):
+    """The permission bitsets of all forums for one permission type.
+
+    Filtering the forums for a user is one AND over all bitsets. With
+    numpy installed (and all mask ids below 64) this is a single
+    vectorized pass, otherwise a loop over the integers.
+    """
+
+    def __init__(self, forum_bits):
+        """
+        :type forum_bits: dict[int, int]
+        :param forum_bits: The bitset of the permitted masks per forum id.
+        """
+        self.forum_bits = forum_bits
+        self._forum_ids = list(forum_bits)
+        self._bits = [forum_bits[forum_id] for forum_id in self._forum_ids]
+        self._arrays = None
+        if numpy is not None and len(self._bits) and max(self._bits) < (1 << 64):
+            self._arrays = (numpy.array(self._forum_ids, dtype=numpy.int64),
+                            numpy.array(self._bits, dtype=numpy.uint64))
+
+    def matching(self, user_bits):
+        """Get the ids of all forums that share a bit with the given bitset.
+
+        :type user_bits: int
+        :rtype: frozenset of int
+        """
+        if self._arrays is not None and user_bits < (1 << 64):
+            forum_ids, bits = self._arrays
+            return frozenset(forum_ids[(bits & numpy.uint64(user_bits)) != 0].tolist())
+        return frozenset(forum_id for forum_id, bits in zip(self._forum_ids, self._bits) if bits & user_bits)
+
+
+class CompiledForumPermissions(object):
+    """The parsed permissions of all forums as bitsets per permission type.
+
+    Instances are never changed after creation. A refresh builds a new one,
+    so readers don't need any locking.
+    """
+
+    def __init__(self, rows):
+        """Parse the permission arrays of the forums.
+
+        :type rows: list of (int, str)
+        :param rows: The forum ids and their permission arrays.
+        """
+        by_type = {}
+        for forum_id, permission_array in rows:
+            for perm_type, bits in parse_permission_bits(permission_array or "").items():
+                by_type.setdefault(perm_type, {})[forum_id] = bits
+        self.by_type = dict((perm_type, ForumBitsets(forum_bits)) for perm_type, forum_bits in by_type.items())
+        self._lookups = {}
+
+    def forums_with(self, mask_set, permission_type):
+        """Get the ids of all forums where one of the masks has the permission.
+
+        The results are memoized per mask set.
+
+        :type mask_set: frozenset of int
+        :type permission_type: str
+        :rtype: frozenset of int
+        """
+        key = (permission_type, mask_set)
+        forum_ids = self._lookups.get(key)
+        if forum_ids is None:
+            bitsets = self.by_type.get(permission_type)
+            forum_ids = frozenset() if bitsets is None else bitsets.matching(mask_bits(mask_set))
+            self._lookups[key] = forum_ids
+        return forum_ids
+
+    def is_permitted(self, forum_id, user_bits, permission_type):
+        """Checks a single forum with one AND.
+
+        :type forum_id: int
+        :type user_bits: int
+        :type permission_type: str
+        :rtype: bool
+        """
+        bitsets = self.by_type.get(permission_type)
+        return bitsets is not None and bool(bitsets.forum_bits.get(forum_id, 0) & user_bits)
+
+
+def parse_id_list(raw_value):
+    """Parse a comma separated list of ids like the ipb stores them.
+
+    :type raw_value: str or None
+    :rtype: frozenset of int
+    """
+    if raw_value is None:
+        return frozenset()
+    return frozenset(int(item) for item in str(raw_value).split(",") if len(item.strip()))
+
+
+class ForumPermissionIndex(CachedTable):
+    """A process wide index of the permissions of all forums.
+
+    The loader returns the (forum_id, permission_array) of all forums.
+    """
+    compile_rows = CompiledForumPermissions
+
+    def forums_with(self, user_mask_tuple, permission_type=ForumPermissions.PERM_READ):
+        """Get the ids of all forums where one of the masks has the given permission.
+
+        :type user_mask_tuple: list or tuple or set
+        :param user_mask_tuple: The permission masks of the user.
+        :type permission_type: str
+        :param permission_type: The permission type to check.
+        :rtype: frozenset of int
+        :return: The forum ids.
+        """
+        return self._current().forums_with(frozenset(user_mask_tuple), permission_type)
+
+    def is_permitted(self, forum_id, user_mask_tuple, permission_type=ForumPermissions.PERM_READ):
+        """Checks if one of the masks has the given permission in a forum.
+
+        :type forum_id: int
+        :param forum_id: The forum to check.
+        :type user_mask_tuple: list or tuple or set
+        :param user_mask_tuple: The permission masks of the user.
+        :type permission_type: str
+        :param permission_type: The permission type to check.
+        :rtype: bool
+        """
+        return self._current().is_permitted(forum_id, mask_bits(user_mask_tuple), permission_type)
+
+
+class CompiledGroupMasks(object):
+    """The permission masks of all groups.
+    """
+
+    def __init__(self, rows):
+        """
+        :type rows: list of (int, str)
+        :param rows: The group ids and their permission mask lists.
+        """
+        self.group_masks = dict((group_id, parse_id_list(perm_ids)) for group_id, perm_ids in rows)
+        self._lookups = {}
+
+    def masks_for(self, mgroup, mgroup_others):
+        """Get the masks of a primary group and the secondary groups.
+
+        The results are memoized per combination.
+
+        :type mgroup: int
+        :type mgroup_others: str
+        :rtype: frozenset of int
+        """
+        key = (mgroup, mgroup_others)
+        masks = self._lookups.get(key)
+        if masks is None:
+            group_ids = parse_id_list(mgroup_others).union((mgroup,))
+            masks = frozenset().union(*[self.group_masks.get(group_id, ()) for group_id in group_ids])
+            self._lookups[key] = masks
+        return masks
+
+
+class GroupMaskCache(CachedTable):
+    """A process wide table of the permission masks per member group.
+
+    The loader returns the (g_id, g_perm_id) of all groups.
+    """
+    compile_rows = CompiledGroupMasks
+
+    def masks_for(self, mgroup, mgroup_others=""):
+        """Get all permission masks a member has from its groups.
+
+        :type mgroup: int
+        :param mgroup: The id of the primary group.
+        :type mgroup_others: str
+        :param mgroup_others: The comma separated ids of the secondary groups.
+        :rtype: frozenset of int
+        :return: The permission masks.
+        """
+        return self._current().masks_for(mgroup, mgroup_others)
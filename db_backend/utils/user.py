@@ -7,7 +7,7 @@ import phpserialize
 from db_backend.utils import timestamps
 
 
-__all__ = ["ForumPermissions", "UserBan", "ApiUser", "exma_passhash"]
+__all__ = ["ForumPermissions", "UserBan", "ApiUser", "exma_passhash", "mask_bits"]
 
 GUEST_MASK = [2]
 
@@ -28,24 +28,52 @@ class ForumPermissions(object):
         :type permission_array: str or unicode
         :param permission_array: The phpserializes crippled arraystring
         """
-        self._permissions = parse_permissions(permission_array)
+        self._permissions = parse_permission_bits(permission_array)
 
     def is_fulfilled(self, mask_tuple, permission_type):
         """This checks if one of the given masks are contained in the perms.
 
-        :type mask_tuple: tuple or list
-        :param mask_tuple: The set of the permissions to check
+        :type mask_tuple: tuple or list or int
+        :param mask_tuple: The set of the permissions to check, or its bitset (see mask_bits).
         :type permission_type: str
         :param permission_type: The permission type to check
         :rtype: bool
         :return: True if one of the permission matches, False otherwise.
         """
-        perms = self._permissions.get(permission_type)
-        if perms is not None:
-            for mask in mask_tuple:
-                if mask in perms:
-                    return True
-        return False
+        if not isinstance(mask_tuple, int):
+            mask_tuple = mask_bits(mask_tuple)
+        return bool(self._permissions.get(permission_type, 0) & mask_tuple)
+
+
+def mask_bits(mask_tuple):
+    """Fold a collection of permission mask ids into an integer bitset.
+
+    The mask ids are small integers, so bit n of the result is set if the
+    mask with the id n is in the collection. Negative ids are ignored.
+
+    :type mask_tuple: tuple or list or set
+    :param mask_tuple: The permission mask ids.
+    :rtype: int
+    :return: The bitset.
+    """
+    bits = 0
+    for mask in mask_tuple:
+        if mask >= 0:
+            bits |= 1 << mask
+    return bits
+
+
+def parse_permission_bits(permission_array):
+    """Parses the forum permission array to a bitset per permission type.
+
+    See parse_permissions and mask_bits.
+
+    :type permission_array: str or bytes
+    :param permission_array: The phpserializes crippled arraystring
+    :rtype: dict[str, int]
+    :return: The bitset of the mask ids for every permission type.
+    """
+    return dict((perm_type, mask_bits(masks)) for perm_type, masks in parse_permissions(permission_array).items())
 
 
 def parse_permissions(permission_array):
@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from db_backend.utils.user import ApiUser
+
+
+class UserSnapshot(namedtuple("UserSnapshot", ["id", "name", "perm_masks", "ban"])):
+    """The immutable data of a member that is needed on every request.
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def from_member(member):
+        """Create the snapshot of a loaded member.
+
+        :type member: db_backend.mapping.DbMembers
+        :rtype: UserSnapshot
+        """
+        return UserSnapshot(member.id, member.name, frozenset(member.perm_masks), member.ban)
+
+    def is_banned(self):
+        """Tells if the user is currently banned.
+
+        :rtype: bool
+        """
+        return self.ban is not None and self.ban.is_active()
+
+
+class CachedUser(ApiUser):
+    """The user of a request, backed by a shared UserSnapshot.
+
+    The snapshot answers the id, name, masks and ban. All other
+    attributes are taken from the member, which is loaded on first
+    access with the given loader.
+    """
+
+    def __init__(self, snapshot, member_loader):
+        """
+        :type snapshot: UserSnapshot
+        :param snapshot: The cached snapshot of the user.
+        :type member_loader: callable
+        :param member_loader: Loads the member by its id.
+        """
+        self.snapshot = snapshot
+        self._member_loader = member_loader
+        self._member = None
+
+    @property
+    def id(self):
+        return self.snapshot.id
+
+    @property
+    def name(self):
+        return self.snapshot.name
+
+    @property
+    def perm_masks(self):
+        return self.snapshot.perm_masks
+
+    @property
+    def ban(self):
+        return self.snapshot.ban
+
+    def is_banned(self):
+        return self.snapshot.is_banned()
+
+    def authenticated(self):
+        return not self.is_banned()
+
+    @property
+    def member(self):
+        """Get the member of this user from the database.
+
+        :rtype: db_backend.mapping.DbMembers
+        """
+        if self._member is None:
+            self._member = self._member_loader(self.snapshot.id)
+        return self._member
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.member, name)
+
+
+class UserCache(object):
+    """A ttl bounded LRU cache of the user snapshots.
+
+    Users missing in the cache are loaded with the loader and their
+    snapshot is stored for ttl seconds. When more than max_size users are
+    cached the least recently used ones are dropped. After a ban or group
+    change the user has to be invalidated to see the change before the
+    ttl expires.
+    """
+
+    def __init__(self, loader, ttl=60, max_size=1024):
+        """
+        :type loader: callable
+        :param loader: Loads the member by its id, returns None for unknown ids.
+        :type ttl: float
+        :param ttl: The seconds a snapshot is used.
+        :type max_size: int
+        :param max_size: The maximum number of cached snapshots.
+        """
+        self._loader = loader
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def snapshot(self, user_id):
+        """Get the snapshot of a user, load it if it is not cached.
+
+        :type user_id: int
+        :param user_id: The id of the user.
+        :rtype: UserSnapshot or None
+        :return: The snapshot or None if there is no such user.
+        """
+        with self._lock:
+            entry = self._snapshots.get(user_id)
+            if entry is not None:
+                snapshot, loaded = entry
+                if time.monotonic() - loaded < self.ttl:
+                    self._snapshots.move_to_end(user_id)
+                    self.hits += 1
+                    return snapshot
+                del self._snapshots[user_id]
+            self.misses += 1
+
+        member = self._loader(user_id)
+        if member is None:
+            return None
+        snapshot = UserSnapshot.from_member(member)
+
+        with self._lock:
+            self._snapshots[user_id] = (snapshot, time.monotonic())
+            while len(self._snapshots) > self.max_size:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def get(self, user_id):
+        """Get the user for a request.
+
+        :type user_id: int
+        :param user_id: The id of the user.
+        :rtype: CachedUser or None
+        :return: The user or None if there is no such user.
+        """
+        snapshot = self.snapshot(user_id)
+        if snapshot is None:
+            return None
+        return CachedUser(snapshot, self._loader)
+
+    def invalidate(self, user_id=None):
+        """Drop the snapshot of a user, or of all users.
+
+        :type user_id: int
+        :param user_id: The user to drop, None to drop all.
+        """
+        with self._lock:
+            if user_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._snapshots)
@@ -0,0 +1,31 @@
+"""Create the indexes the api needs besides the ones of the ipb.
+
+    python ensure_indexes.py          # create the missing indexes
+    python ensure_indexes.py --check  # only list them
+"""
+import argparse
+import sys
+
+from db_backend.connection import connection
+from db_backend.indexes import ensure_indexes, missing_indexes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the indexes of the api.")
+    parser.add_argument("--check", action="store_true", help="Only list the missing indexes")
+    args = parser.parse_args()
+
+    if args.check:
+        missing = missing_indexes(connection.engine)
+        for index in missing:
+            print("Missing index %s on %s (%s)" % (index.name, index.table.name,
+                                                   ", ".join(column.name for column in index.columns)))
+        return 1 if len(missing) else 0
+
+    for name in ensure_indexes(connection.engine):
+        print("Created index %s" % name)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from api import users, messages, albums, topics, representation, events
+from api import users, messages, albums, topics, representation, events, compression
 from api.users import authorization
 from flask import Flask, request
 
@@ -30,6 +30,7 @@ def add_cors_header(resp):
 
 authorization.setup_auth(app, db_backend.mapping.DbMembers.by_id)
 representation.configure_default_json()
+compression.setup_compression(app)
 
 @app.route('/')
 def start():
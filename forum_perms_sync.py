@@ -0,0 +1,35 @@
+"""Rebuild the materialized forum permissions (exma_forum_perms).
+
+Run it after the forum permissions were changed in the board, or
+periodically from cron or as daemon:
+
+    python forum_perms_sync.py                # sync once
+    python forum_perms_sync.py --interval 60  # sync every minute
+"""
+import argparse
+import sys
+import time
+
+from db_backend.connection import connection
+from db_backend.forum_perms import sync_forum_perms
+
+
+def sync():
+    if sync_forum_perms(connection.engine):
+        print("%s: forum permissions changed, table rebuilt" % time.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the materialized forum permissions.")
+    parser.add_argument("--interval", type=float, help="Keep running and sync every INTERVAL seconds")
+    args = parser.parse_args()
+
+    sync()
+    while args.interval is not None:
+        time.sleep(args.interval)
+        sync()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,7 +5,6 @@ from flask.ext.restful import abort
 
 import os
 from pixma_images import thumbnailer
-from db_backend.mapping.config import connection
 
 _pixma_bp = Blueprint("pixma", __name__)
 
@@ -36,8 +35,7 @@ def send_picture(pic_id, type_string):
         else:
             filename = "%d_%s.jpg" % (pic_id, type_string)
     else:
-        pic.hits += 1
-        connection.session.commit()
+        mapping.DbPixPics.count_hit(pic_id)
 
     filepath = os.path.join("/mnt/tmp", filename)
     if not os.path.isfile(filepath):
@@ -0,0 +1,63 @@
+"""Manage the schema snapshot that spares the table reflection on startup.
+
+    python schema_snapshot.py refresh   # reflect the tables and write the snapshot
+    python schema_snapshot.py check     # compare the snapshot with the live database
+"""
+import argparse
+import os
+import sys
+
+from db_backend import snapshot
+
+
+def refresh(filename):
+    # Importing the connection maps all tables, so disable the snapshot
+    # before to force a live reflection.
+    os.environ["EXMA_SCHEMA_SNAPSHOT"] = ""
+    from db_backend.mapping.config import connection
+
+    header = connection.save_snapshot(filename)
+    print("Wrote snapshot of %d tables to %s (checksum %s)" % (len(header["tables"]), filename,
+                                                             header["checksum"]))
+    return 0
+
+
+def check(filename):
+    stored = snapshot.read_snapshot(filename)
+    if stored is None:
+        print("No readable snapshot at %s" % filename)
+        return 1
+
+    from db_backend.mapping.config import connection
+
+    problem = snapshot.snapshot_problem(stored, connection.engine)
+    if problem is not None:
+        print("Snapshot is not usable: %s" % problem)
+        return 1
+
+    fingerprint = snapshot.reflect_fingerprint(connection.engine, stored["tables"])
+    if fingerprint != stored["fingerprint"]:
+        print("Snapshot is stale, the database schema changed. Run a refresh.")
+        return 1
+
+    print("Snapshot is up to date (%d tables, checksum %s)" % (len(stored["tables"]), stored["checksum"]))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the schema reflection snapshot.")
+    parser.add_argument("command", choices=("refresh", "check"))
+    parser.add_argument("--file", default=snapshot.default_snapshot_file(),
+                        help="The snapshot file (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.file is None:
+        parser.error("No snapshot file configured")
+
+    if args.command == "refresh":
+        return refresh(args.file)
+    return check(args.file)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
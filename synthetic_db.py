@@ -0,0 +1,31 @@
+"""Generate a synthetic ipb database to run the api offline.
+
+    python synthetic_db.py exma_fake.sqlite --scale small
+    EXMA_DB_URL=sqlite:///exma_fake.sqlite python exma-api.py
+"""
+import argparse
+import sys
+
+from sqlalchemy import create_engine
+from db_backend import synthetic
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic ipb database.")
+    parser.add_argument("database", help="A SQLite file or a SQLAlchemy url of the database to fill")
+    parser.add_argument("--scale", choices=sorted(synthetic.Scale.presets), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    for count in ("members", "forums", "topics", "posts", "events", "albums", "pictures", "messages"):
+        parser.add_argument("--%s" % count, type=int, help="Override the number of %s" % count)
+    args = parser.parse_args()
+
+    url = args.database if "://" in args.database else "sqlite:///%s" % args.database
+    scale = synthetic.Scale.preset(args.scale, members=args.members, forums=args.forums, topics=args.topics,
+                                   posts=args.posts, events=args.events, albums=args.albums,
+                                   pictures=args.pictures, messages=args.messages)
+    synthetic.generate(create_engine(url), scale, args.seed, verbose=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import gzip
+import threading
+import unittest
+import zlib
+from flask import Flask, Response, stream_with_context
+from werkzeug.datastructures import Accept
+
+from api import compression
+from api.compression import negotiate_encoding, iter_compressed, setup_compression, precompressed, CompressedCache
+
+
+BODY = ('{"title": "%s"}' % ("Party " * 200)).encode("utf-8")
+
+
+def make_app():
+    app = Flask(__name__)
+    setup_compression(app, min_size=100)
+
+    @app.route("/large")
+    def large():
+        return Response(BODY, mimetype="application/json")
+
+    @app.route("/small")
+    def small():
+        return Response(b"{}", mimetype="application/json")
+
+    @app.route("/image")
+    def image():
+        return Response(BODY, mimetype="image/jpeg")
+
+    @app.route("/kept")
+    @precompressed
+    def kept():
+        return Response(BODY, mimetype="application/json")
+
+    @app.route("/kept_streamed")
+    @precompressed
+    def kept_streamed():
+        return Response(stream_with_context(iter([BODY, BODY])), mimetype="application/json")
+
+    @app.route("/streamed")
+    def streamed():
+        return Response(stream_with_context(iter([BODY, "ä".encode("utf-8"), BODY])), mimetype="text/calendar")
+
+    return app
+
+
+class TestNegotiation(unittest.TestCase):
+    def test_0010_preferred(self):
+        self.assertEqual(negotiate_encoding(Accept([("gzip", 1), ("deflate", 1)])), "gzip")
+        self.assertEqual(negotiate_encoding(Accept([("gzip", 0.5), ("deflate", 1)])), "deflate")
+        self.assertEqual(negotiate_encoding(Accept([("*", 1)])), "gzip")
+        self.assertEqual(negotiate_encoding(Accept([("gzip", 0), ("br", 1)])), None)
+        self.assertEqual(negotiate_encoding(Accept()), None)
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.app = make_app()
+        self.client = self.app.test_client()
+
+    def test_0010_gzip(self):
+        resp = self.client.get("/large", headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", resp.headers["Vary"])
+        self.assertEqual(int(resp.headers["Content-Length"]), len(resp.data))
+        self.assertEqual(gzip.decompress(resp.data), BODY)
+
+    def test_0020_deflate(self):
+        resp = self.client.get("/large", headers={"Accept-Encoding": "deflate"})
+        self.assertEqual(resp.headers["Content-Encoding"], "deflate")
+        self.assertEqual(zlib.decompress(resp.data), BODY)
+
+    def test_0030_not_compressed(self):
+        resp = self.client.get("/large")
+        self.assertNotIn("Content-Encoding", resp.headers)
+        self.assertIn("Accept-Encoding", resp.headers["Vary"])
+        self.assertEqual(resp.data, BODY)
+        for url in ("/small", "/image"):
+            resp = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+            self.assertNotIn("Content-Encoding", resp.headers)
+
+        self.app.config["COMPRESS_LEVEL"] = 0
+        resp = self.client.get("/large", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.data, BODY)
+
+    def test_0040_streamed(self):
+        resp = self.client.get("/streamed", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        self.assertNotIn("Content-Length", resp.headers)
+        self.assertEqual(gzip.decompress(resp.data), BODY + "ä".encode("utf-8") + BODY)
+
+    def test_0050_kept(self):
+        for number in range(3):
+            resp = self.client.get("/kept", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(gzip.decompress(resp.data), BODY)
+        self.client.get("/large", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(compression.compressed_cache.stats(), {"size": 1, "hits": 2, "misses": 1})
+
+        for number in range(2):
+            resp = self.client.get("/kept_streamed", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(gzip.decompress(resp.data), BODY + BODY)
+        self.assertEqual(compression.compressed_cache.stats(), {"size": 2, "hits": 3, "misses": 2})
+
+
+class TestCompressedCache(unittest.TestCase):
+    def test_0010_threads(self):
+        cache = CompressedCache(size=2)
+        bodies = [("body %d " % number * 50).encode("utf-8") for number in range(5)]
+        errors = []
+
+        def work():
+            try:
+                for number in range(200):
+                    body = bodies[number % len(bodies)]
+                    self.assertEqual(zlib.decompress(cache.get(body, "deflate", 1)), body)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.hits + cache.misses, 1600)
+        self.assertEqual(cache.stats()["size"], 2)
+
+
+class TestIterCompressed(unittest.TestCase):
+    def test_0010_flushed_chunks(self):
+        decompressor = zlib.decompressobj()
+        chunks = iter_compressed([b"abc", "def", b"ghi"], "deflate")
+        self.assertEqual(decompressor.decompress(next(chunks)), b"abc")
+        self.assertEqual(decompressor.decompress(next(chunks)), b"def")
+
+    def test_0020_closes_chunks(self):
+        closed = []
+
+        def chunks():
+            try:
+                yield b"abc"
+                yield b"def"
+            finally:
+                closed.append(True)
+
+        compressed = iter_compressed(chunks(), "gzip")
+        next(compressed)
+        compressed.close()
+        self.assertEqual(closed, [True])
@@ -0,0 +1,115 @@
+import unittest
+from flask import Flask, Response, _request_ctx_stack
+from flask.ext import restful
+
+from api.conditional import conditional
+from db_backend.utils.user import ApiUser
+
+
+class FakeUser(ApiUser):
+    def __init__(self, user_id, masks):
+        self.id = user_id
+        self.masks = masks
+
+    def authenticated(self):
+        return True
+
+    @property
+    def perm_masks(self):
+        return self.masks
+
+
+class Data(object):
+    version = 1
+    last_modified = 1400000000
+    calls = 0
+    validations = 0
+
+
+def _version(resource, item_id=None):
+    Data.validations += 1
+    return Data.version, Data.last_modified
+
+
+class Items(restful.Resource):
+    @conditional(_version)
+    def get(self, item_id=None):
+        Data.calls += 1
+        if item_id == 404:
+            return {"message": "not found"}, 404
+        return {"version": Data.version}
+
+
+class Feed(restful.Resource):
+    @conditional(_version)
+    def get(self):
+        Data.calls += 1
+        return Response("feed", mimetype="text/calendar")
+
+
+def make_app():
+    app = Flask(__name__)
+    api = restful.Api(app)
+    api.add_resource(Items, "/items", "/items/<int:item_id>")
+    api.add_resource(Feed, "/feed")
+
+    @app.before_request
+    def load_user():
+        ctx = _request_ctx_stack.top
+        ctx.user = app.config.get("TEST_USER") or ApiUser()
+
+    return app
+
+
+class TestConditional(unittest.TestCase):
+    def setUp(self):
+        self.app = make_app()
+        self.client = self.app.test_client()
+        Data.version = 1
+        Data.calls = Data.validations = 0
+
+    def test_0010_if_none_match(self):
+        resp = self.client.get("/items")
+        etag = resp.headers["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(resp.headers["Last-Modified"], "Tue, 13 May 2014 16:53:20 GMT")
+
+        resp = self.client.get("/items", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.headers["ETag"], etag)
+        self.assertEqual((Data.calls, Data.validations), (1, 2))
+
+        Data.version = 2
+        resp = self.client.get("/items", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers["ETag"], etag)
+
+    def test_0020_if_modified_since(self):
+        resp = self.client.get("/items", headers={"If-Modified-Since": "Tue, 13 May 2014 16:53:20 GMT"})
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get("/items", headers={"If-Modified-Since": "Tue, 13 May 2014 16:53:19 GMT"})
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.get("/items", headers={"If-Modified-Since": "Tue, 13 May 2014 16:53:20 GMT",
+                                                  "If-None-Match": '"other"'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Data.calls, 2)
+
+    def test_0030_etag_per_url_and_user(self):
+        etags = set()
+        etags.add(self.client.get("/items").headers["ETag"])
+        etags.add(self.client.get("/items?limit=1").headers["ETag"])
+        self.app.config["TEST_USER"] = FakeUser(1, [3])
+        etags.add(self.client.get("/items").headers["ETag"])
+        self.app.config["TEST_USER"] = FakeUser(2, [3])
+        etags.add(self.client.get("/items").headers["ETag"])
+        self.assertEqual(len(etags), 4)
+
+    def test_0040_responses(self):
+        resp = self.client.get("/feed")
+        self.assertEqual(resp.data, b"feed")
+        resp = self.client.get("/feed", headers={"If-None-Match": resp.headers["ETag"]})
+        self.assertEqual(resp.status_code, 304)
+
+        resp = self.client.get("/items/404")
+        self.assertEqual(resp.status_code, 404)
+        self.assertNotIn("ETag", resp.headers)
@@ -5,7 +5,7 @@ from flask import Flask
 from sqlalchemy.testing import mock
 from werkzeug.exceptions import BadRequest
 
-from api.events.request_parsing import _resolve_category, EventInterval
+from api.events.request_parsing import _resolve_category, EventInterval, FeedInterval
 from db_backend.utils.events import EventCategory
 
 
@@ -109,3 +109,14 @@ class TestDateIntervalParsing(unittest.TestCase):
             with app.test_request_context('/bubble', query_string='end=1010617200&start=1015714800', method="GET"):
                 interval = EventInterval()
                 self.assertRaises(BadRequest, interval._parse)
+
+    def test_0060_feed_interval(self):
+        app = Flask(__name__)
+        with self.mocked_date(datetime.date(2000, 1, 10)):
+            with app.test_request_context('/bubble', query_string='', method="GET"):
+                interval = FeedInterval()
+                self.assertEqual(interval.start, datetime.datetime(2000, 1, 1, 0, 0, tzinfo=datetime.timezone.utc))
+                self.assertEqual(interval.end, datetime.datetime(2001, 1, 1, 0, 0, tzinfo=datetime.timezone.utc))
+            with app.test_request_context('/bubble', query_string='start=1010617200&end=1019343600', method="GET"):
+                interval = FeedInterval()
+                self.assertEqual(interval.end, datetime.datetime(2002, 4, 20, 0, 0, tzinfo=datetime.timezone.utc))
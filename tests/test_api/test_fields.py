@@ -0,0 +1,57 @@
+import unittest
+from flask import Flask, Blueprint, g, url_for, request
+
+from api.fields import PixmaUrl
+
+
+def make_app():
+    app = Flask(__name__)
+    pixma_bp = Blueprint("pixma", __name__)
+
+    @pixma_bp.route("/<int:pic_id>.jpg", defaults={"type_string": None})
+    @pixma_bp.route("/<int:pic_id>_<string:type_string>.jpg")
+    def send_picture(pic_id, type_string):
+        return ""
+
+    app.register_blueprint(pixma_bp, url_prefix="/piXma")
+    return app
+
+
+def former_url(pic_id, format_type):
+    # The url PixmaUrl built with url_for for every picture.
+    if format_type is None:
+        path = url_for("pixma.send_picture", pic_id=pic_id).lstrip("/")
+    else:
+        path = url_for("pixma.send_picture", pic_id=pic_id, type_string=format_type).lstrip("/")
+    return "/".join((request.url_root.rstrip("/"), path))
+
+
+class TestPixmaUrl(unittest.TestCase):
+    formats = (None, PixmaUrl.thumb, PixmaUrl.thumb_small, PixmaUrl.thumb_square)
+
+    def setUp(self):
+        self.app = make_app()
+
+    def test_0010_same_as_url_for(self):
+        with self.app.test_request_context("/pixma/1", base_url="http://api.example.org/"):
+            for format_type in self.formats:
+                for pic_id in (1, 42, 1234567890):
+                    self.assertEqual(PixmaUrl(format_type).format(pic_id), former_url(pic_id, format_type))
+            self.assertEqual(len(g.pixma_url_templates[1]), 4)
+
+    def test_0020_resolved_per_request(self):
+        with self.app.test_request_context("/", base_url="http://one.example.org/"):
+            self.assertEqual(PixmaUrl().format(5), "http://one.example.org/piXma/5.jpg")
+        with self.app.test_request_context("/", base_url="http://two.example.org/"):
+            self.assertEqual(PixmaUrl().format(5), "http://two.example.org/piXma/5.jpg")
+
+    def test_0030_base_url(self):
+        self.app.config["PIXMA_URL_BASE"] = "https://cdn.example.org/"
+        with self.app.test_request_context("/"):
+            self.assertEqual(PixmaUrl(PixmaUrl.thumb).format(7), "https://cdn.example.org/piXma/7_bt.jpg")
+        self.assertIn(PixmaUrl.thumb, self.app.extensions["pixma_url_templates"])
+
+    def test_0040_relative(self):
+        self.app.config["PIXMA_URL_RELATIVE"] = True
+        with self.app.test_request_context("/", base_url="http://api.example.org/"):
+            self.assertEqual(PixmaUrl(PixmaUrl.thumb_square).format(7), "/piXma/7_sq.jpg")
@@ -0,0 +1,60 @@
+import json
+import unittest
+from collections import OrderedDict
+from flask import Flask
+
+from api import representation
+from api.representation import configure_default_json, iter_json_array, output_json, StreamedList
+
+
+class TestEncoders(unittest.TestCase):
+    def tearDown(self):
+        configure_default_json()
+
+    def test_0010_fallback(self):
+        self.assertEqual(configure_default_json("json"), "json")
+        self.assertEqual(representation.dumps(OrderedDict([("b", "ä"), ("a", 1)])),
+                         '{"b": "ä", "a": 1}'.encode("utf-8"))
+
+    def test_0020_unknown(self):
+        self.assertRaises(ValueError, configure_default_json, "nojson")
+
+    def test_0030_fastest(self):
+        name = configure_default_json()
+        self.assertIn(name, ("orjson", "ujson", "simplejson", "json"))
+        self.assertEqual(json.loads(representation.dumps({"url": "a/b", "name": "ä"}).decode("utf-8")),
+                         {"url": "a/b", "name": "ä"})
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def test_0010_chunks(self):
+        items = [{"id": number} for number in range(5)]
+        chunks = list(iter_json_array(items, chunk_items=2))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(json.loads(b"".join(chunks).decode("utf-8")), items)
+        self.assertEqual(b"".join(iter_json_array([])), b"[]")
+
+    def test_0020_streamed_response(self):
+        serialized = []
+
+        def serialize(item):
+            serialized.append(item)
+            return OrderedDict([("id", item)])
+
+        with self.app.test_request_context("/"):
+            resp = output_json(StreamedList(list(range(100)), serialize), 200, {"X-Test": "1"})
+            self.assertTrue(resp.is_streamed)
+            self.assertEqual(serialized, [])
+            self.assertEqual(resp.headers["X-Test"], "1")
+            body = b"".join(resp.response)
+        self.assertEqual(json.loads(body.decode("utf-8")), [{"id": number} for number in range(100)])
+
+    def test_0030_plain_response(self):
+        with self.app.test_request_context("/"):
+            resp = output_json({"id": 1}, 201)
+            self.assertFalse(resp.is_streamed)
+            self.assertEqual(resp.status_code, 201)
+            self.assertEqual(json.loads(resp.get_data(as_text=True)), {"id": 1})
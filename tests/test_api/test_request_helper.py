@@ -0,0 +1,177 @@
+import unittest
+from flask import Flask
+from sqlalchemy import create_engine, Column, Integer
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from werkzeug.exceptions import HTTPException
+
+from api.request_helper import limit_query, limit_list, limit_iterable, paginate_query, total_count_headers, encode_cursor, decode_cursor, \
+    CURSOR_NEXT, CURSOR_PREV
+
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    date = Column(Integer)
+
+
+class FakeQuery(object):
+    def __init__(self):
+        self.applied = {}
+
+    def limit(self, limit):
+        self.applied["limit"] = limit
+        return self
+
+    def offset(self, offset):
+        self.applied["offset"] = offset
+        return self
+
+
+class TestLimits(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def test_0010_limit_query(self):
+        with self.app.test_request_context("/?limit=5&offset=10"):
+            self.assertEqual(limit_query(FakeQuery()).applied, {"limit": 5, "offset": 10})
+
+    def test_0020_default_limit(self):
+        with self.app.test_request_context("/"):
+            self.assertEqual(limit_query(FakeQuery()).applied, {})
+            self.assertEqual(limit_query(FakeQuery(), default_limit=100).applied, {"limit": 100})
+        with self.app.test_request_context("/?limit=20"):
+            self.assertEqual(limit_query(FakeQuery(), default_limit=100).applied, {"limit": 20})
+
+    def test_0030_limit_list(self):
+        with self.app.test_request_context("/?limit=2&offset=1"):
+            self.assertEqual(limit_list([1, 2, 3, 4]), [2, 3])
+
+    def test_0040_limit_iterable(self):
+        consumed = []
+
+        def numbers():
+            for number in range(100):
+                consumed.append(number)
+                yield number
+
+        with self.app.test_request_context("/?limit=2&offset=3"):
+            self.assertEqual(limit_iterable(numbers()), [3, 4])
+        self.assertEqual(consumed, [0, 1, 2, 3, 4])
+        with self.app.test_request_context("/"):
+            self.assertEqual(limit_iterable(iter(range(5))), [0, 1, 2, 3, 4])
+            self.assertEqual(limit_iterable(iter(range(5)), default_limit=2), [0, 1])
+
+
+class TestTotalCount(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.counted = 0
+
+    def counter(self):
+        self.counted += 1
+        return 42
+
+    def test_0010_not_requested(self):
+        with self.app.test_request_context("/"):
+            self.assertEqual(total_count_headers(self.counter, True), {})
+        with self.app.test_request_context("/?count=0"):
+            self.assertEqual(total_count_headers(self.counter, True), {})
+        self.assertEqual(self.counted, 0)
+
+    def test_0020_requested(self):
+        with self.app.test_request_context("/?count=1"):
+            self.assertEqual(total_count_headers(self.counter, True),
+                             {"X-Total-Count": "42", "X-Total-Count-Type": "exact"})
+        with self.app.test_request_context("/?count=true"):
+            self.assertEqual(total_count_headers(self.counter, False)["X-Total-Count-Type"], "approximate")
+
+
+class TestCursors(unittest.TestCase):
+    def test_0010_roundtrip(self):
+        cursor = encode_cursor(CURSOR_NEXT, [1400000000, 17])
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor, 2), (CURSOR_NEXT, [1400000000, 17]))
+
+    def test_0020_invalid(self):
+        app = Flask(__name__)
+        with app.test_request_context("/"):
+            for cursor in ("garbage!", encode_cursor(CURSOR_PREV, [1]), encode_cursor("x", [1, 2])):
+                self.assertRaises(HTTPException, decode_cursor, cursor, 2)
+
+
+class TestPaginateQuery(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.session = sessionmaker(bind=engine)()
+        # ten items with dates 0, 0, 1, 1, ... to have ties on the sort column
+        self.session.add_all([Item(id=item_id, date=item_id // 2) for item_id in range(10)])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def page(self, url, descending=True):
+        with self.app.test_request_context(url):
+            items, headers = paginate_query(self.session.query(Item), (Item.date, Item.id), descending,
+                                            default_limit=4)
+            return [item.id for item in items], headers
+
+    def walk(self, descending):
+        ids, headers = self.page("/", descending)
+        pages = [ids]
+        while "X-Next-Cursor" in headers:
+            ids, headers = self.page("/?cursor=%s" % headers["X-Next-Cursor"], descending)
+            pages.append(ids)
+        return pages
+
+    def test_0010_forward(self):
+        self.assertEqual(self.walk(True), [[9, 8, 7, 6], [5, 4, 3, 2], [1, 0]])
+        self.assertEqual(self.walk(False), [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+
+    def test_0020_backward(self):
+        first, headers = self.page("/")
+        self.assertNotIn("X-Prev-Cursor", headers)
+        second, headers = self.page("/?cursor=%s" % headers["X-Next-Cursor"])
+        self.assertIn('rel="next"', headers["Link"])
+        back, headers = self.page("/?cursor=%s" % headers["X-Prev-Cursor"])
+        self.assertEqual(back, first)
+        self.assertNotIn("X-Prev-Cursor", headers)
+        self.assertIn("X-Next-Cursor", headers)
+
+    def test_0030_limit_and_offset(self):
+        self.assertEqual(self.page("/?limit=3")[0], [9, 8, 7])
+        ids, headers = self.page("/?limit=3&offset=2")
+        self.assertEqual((ids, headers), ([7, 6, 5], {}))
+
+    def test_0040_unlimited_by_default(self):
+        with self.app.test_request_context("/"):
+            items, headers = paginate_query(self.session.query(Item), (Item.date, Item.id))
+        self.assertEqual(([item.id for item in items], headers), (list(range(9, -1, -1)), {}))
+        with self.app.test_request_context("/?limit=4"):
+            items, headers = paginate_query(self.session.query(Item), (Item.date, Item.id))
+        self.assertEqual([item.id for item in items], [9, 8, 7, 6])
+        with self.app.test_request_context("/?cursor=%s" % headers["X-Next-Cursor"]):
+            items, headers = paginate_query(self.session.query(Item), (Item.date, Item.id))
+        self.assertEqual([item.id for item in items], [5, 4, 3, 2, 1, 0])
+
+    def test_0050_null_keys(self):
+        self.session.query(Item).filter(Item.id.in_([2, 3, 4])).update({"date": None}, synchronize_session=False)
+        self.session.commit()
+        for descending in (True, False):
+            ordered = self.session.query(Item.id).order_by(*[column.desc() if descending else column
+                                                             for column in (Item.date, Item.id)])
+            pages = self.walk(descending)
+            self.assertEqual(sum(pages, []), [row.id for row in ordered])
+
+            ids, headers = self.page("/", descending)
+            for _ in range(len(pages) - 1):
+                ids, headers = self.page("/?cursor=%s" % headers["X-Next-Cursor"], descending)
+            for expected in reversed(pages[:-1]):
+                ids, headers = self.page("/?cursor=%s" % headers["X-Prev-Cursor"], descending)
+                self.assertEqual(ids, expected)
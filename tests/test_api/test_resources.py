@@ -0,0 +1,178 @@
+import gzip
+import importlib.util
+import json
+import os
+import unittest
+
+try:
+    import flask_restful_fieldsets
+except ImportError:
+    raise unittest.SkipTest("The api resources need the restful-fieldsets package")
+
+from db_backend import synthetic
+
+synthetic.use_synthetic_database()
+
+from db_backend import mapping
+from db_backend.mapping.config import connection
+from db_backend.utils import user
+
+
+def load_app():
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    spec = importlib.util.spec_from_file_location("exma_api", os.path.join(root, "exma-api.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+app = load_app()
+
+
+def topic_ids(forum_ids):
+    qry = connection.session.query(mapping.DbTopics.tid).filter_by(approved=1) \
+        .filter(mapping.DbTopics.forum_id.in_(list(forum_ids)))
+    return set(row.tid for row in qry)
+
+
+class ResourceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+    def tearDown(self):
+        connection.session.remove()
+
+    def assertStatus(self, url, status):
+        self.assertEqual(self.client.get(url, buffered=True).status_code, status)
+
+    def get_json(self, url, **kwargs):
+        resp = self.client.get(url, buffered=True, **kwargs)
+        self.assertEqual(resp.status_code, 200)
+        return json.loads(resp.get_data(as_text=True))
+
+    def login(self, name="user1"):
+        resp = self.client.post("/login", data={"login": name, "password": synthetic.PASSWORD})
+        self.assertEqual(resp.status_code, 200)
+
+
+class TestTopics(ResourceTestCase):
+    def test_0010_forum_topics(self):
+        guest_forums = mapping.DbForums.readable_ids(user.GUEST_MASK)
+        for forum_id in guest_forums:
+            tids = set(topic["tid"] for topic in self.get_json("/topics/forum/%d?limit=1000" % forum_id))
+            self.assertEqual(tids, topic_ids([forum_id]))
+
+        hidden = set(range(1, synthetic.Scale.preset("tiny").forums + 1)) - set(guest_forums)
+        self.assertTrue(hidden)
+        for forum_id in hidden:
+            self.assertStatus("/topics/forum/%d" % forum_id, 404)
+
+    def test_0020_merged_list(self):
+        tids = set(topic["tid"] for topic in self.get_json("/topics/?limit=1000"))
+        self.assertEqual(tids, topic_ids(mapping.DbForums.readable_ids(user.GUEST_MASK)))
+
+        self.login()
+        member = mapping.DbMembers.by_name("user1")
+        tids = set(topic["tid"] for topic in self.get_json("/topics/?limit=1000"))
+        self.assertEqual(tids, topic_ids(mapping.DbForums.readable_ids(member.perm_masks)))
+
+    def test_0030_same_permissions_without_synced_table(self):
+        self.assertTrue(mapping.forum_perms_state.synced())
+        self.login()
+        expected = self.get_json("/topics/?limit=1000")
+        expected_events = self.get_json("/events/")
+        try:
+            for url, result in (("/topics/?limit=1000", expected), ("/events/", expected_events)):
+                connection.session.execute(mapping.DbForumPerms.__table__.delete())
+                mapping.forum_perms_state.invalidate()
+                self.assertFalse(mapping.forum_perms_state.synced())
+                self.assertEqual(self.get_json(url), result)
+        finally:
+            mapping.forum_perms_state.invalidate()
+
+    def test_0040_conditional(self):
+        resp = self.client.get("/topics/")
+        self.assertNotIn("Last-Modified", resp.headers)
+        etag = resp.headers["ETag"]
+        resp = self.client.get("/topics/", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get("/topics/?limit=3", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+
+    def test_0050_changes_change_etag(self):
+        tid = self.get_json("/topics/?limit=10")[3]["tid"]
+        for values in ({"title": "Changed title"}, {"approved": 0}):
+            etag = self.client.get("/topics/?limit=10", buffered=True).headers["ETag"]
+            connection.session.query(mapping.DbTopics).filter_by(tid=tid).update(values, synchronize_session=False)
+            resp = self.client.get("/topics/?limit=10", headers={"If-None-Match": etag}, buffered=True)
+            self.assertEqual(resp.status_code, 200)
+
+
+class TestEvents(ResourceTestCase):
+    def test_0010_feed(self):
+        resp = self.client.get("/events/feed.ics", buffered=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, "text/calendar")
+        body = resp.get_data(as_text=True)
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertTrue(body.endswith("END:VCALENDAR\r\n"))
+
+        resp = self.client.get("/events/feed.ics", headers={"If-None-Match": resp.headers["ETag"]})
+        self.assertEqual(resp.status_code, 304)
+
+    def test_0015_rendered_values_change_etag(self):
+        changes = ((mapping.DbTopics, mapping.DbTopics.tid.in_(connection.session.query(mapping.DbEvents.event_id)),
+                    {"title": "Changed title"}),
+                   (mapping.DbLocations, None, {"stadt": "Changed town"}))
+        for url in ("/events/feed.ics", "/events/?embed=location"):
+            for mapped, criterion, values in changes:
+                etag = self.client.get(url, buffered=True).headers["ETag"]
+                qry = connection.session.query(mapped)
+                if criterion is not None:
+                    qry = qry.filter(criterion)
+                self.assertTrue(qry.update(values, synchronize_session=False))
+                resp = self.client.get(url, headers={"If-None-Match": etag}, buffered=True)
+                self.assertEqual(resp.status_code, 200)
+                self.assertNotEqual(resp.headers["ETag"], etag)
+
+    def test_0020_compressed(self):
+        for url in ("/events/locations", "/events/feed.ics", "/topics/?limit=100"):
+            plain = self.client.get(url, buffered=True)
+            resp = self.client.get(url, headers={"Accept-Encoding": "gzip"}, buffered=True)
+            self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+            self.assertIn("Accept-Encoding", resp.headers["Vary"])
+            self.assertEqual(gzip.decompress(resp.data), plain.data)
+
+
+class TestMessages(ResourceTestCase):
+    def test_0010_conditional(self):
+        self.assertStatus("/messages/", 401)
+        self.login()
+        resp = self.client.get("/messages/", buffered=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("Last-Modified", resp.headers)
+        etag = resp.headers["ETag"]
+        resp = self.client.get("/messages/", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 304)
+
+    def test_0020_folder_move_changes_etag(self):
+        self.login()
+        member = mapping.DbMembers.by_name("user1")
+        message_id, folder = connection.session.query(mapping.DbMessageTopics.mt_id,
+                                                      mapping.DbMessageTopics.mt_vid_folder) \
+            .filter_by(mt_owner_id=member.id).order_by(mapping.DbMessageTopics.mt_id).first()
+        for url in ("/messages/", "/messages/folder/%s" % folder):
+            etag = self.client.get(url, buffered=True).headers["ETag"]
+            connection.session.query(mapping.DbMessageTopics).filter_by(mt_id=message_id) \
+                .update({"mt_vid_folder": "sent" if folder != "sent" else "in"}, synchronize_session=False)
+            resp = self.client.get(url, headers={"If-None-Match": etag}, buffered=True)
+            self.assertEqual(resp.status_code, 200)
+
+
+class TestAlbums(ResourceTestCase):
+    def test_0010_total_count(self):
+        self.login()
+        resp = self.client.get("/pixma/?count=1&limit=2", buffered=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(int(resp.headers["X-Total-Count"]), connection.session.query(mapping.DbPixAlbums).count())
+        self.assertEqual(resp.headers["X-Total-Count-Type"], "approximate")
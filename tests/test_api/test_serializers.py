@@ -0,0 +1,223 @@
+import unittest
+from collections import OrderedDict
+from flask import Flask
+from flask.ext.restful import fields, marshal
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, ForeignKey
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker, relationship
+
+from api.fields import LazyNestedField
+from api.representation import StreamedList, STREAM_MIN_ITEMS
+from api import serializers
+from api.serializers import compile_fields, CompiledFieldset, relationship_paths, loader_option, eager_load
+
+
+class Location(object):
+    def __init__(self, lid, name):
+        self.lid = lid
+        self.location = name
+
+
+class Event(object):
+    def __init__(self, event_id, title, location=None, count=None):
+        self.event_id = event_id
+        self.title = title
+        self.location = location
+        self.count = count
+
+
+class Upper(fields.Raw):
+    def format(self, value):
+        return value.upper()
+
+
+LOCATION_FIELDS = {"id": fields.Integer(attribute="lid"),
+                   "name": fields.String(attribute="location")}
+
+EVENT_FIELDS = OrderedDict([("id", fields.Integer(attribute="event_id")),
+                            ("title", fields.String),
+                            ("shout", Upper(attribute="title")),
+                            ("count", fields.Integer(default=7)),
+                            ("location_name", fields.String(attribute="location.location")),
+                            ("location", fields.Nested(LOCATION_FIELDS, allow_null=True)),
+                            ("location_always", fields.Nested(LOCATION_FIELDS, attribute="location")),
+                            ("plain", {"title": fields.String}),
+                            ("raw_title", fields.Raw(attribute="title"))])
+
+
+class TestCompileFields(unittest.TestCase):
+    def assertSameAsMarshal(self, data, fields_dict):
+        expected = marshal(data, fields_dict)
+        self.assertEqual(compile_fields(fields_dict)(data), expected)
+        if isinstance(expected, OrderedDict):
+            self.assertEqual(list(compile_fields(fields_dict)(data).keys()), list(expected.keys()))
+
+    def test_0010_objects(self):
+        self.assertSameAsMarshal(Event(1, "Party", Location(3, "Club"), 12), EVENT_FIELDS)
+        self.assertSameAsMarshal(Event(2, "Kino"), EVENT_FIELDS)
+
+    def test_0020_lists(self):
+        events = [Event(event_id, "Event %d" % event_id, Location(event_id, "Loc")) for event_id in range(5)]
+        self.assertSameAsMarshal(events, EVENT_FIELDS)
+        self.assertSameAsMarshal(tuple(events), EVENT_FIELDS)
+        self.assertSameAsMarshal([], EVENT_FIELDS)
+
+    def test_0030_dicts(self):
+        self.assertSameAsMarshal({"event_id": 4, "title": "Dict", "location": {"lid": 5, "location": "Bar"}},
+                                 EVENT_FIELDS)
+
+    def test_0040_generic_fields(self):
+        lazy_fields = {"id": fields.Integer(attribute="event_id"),
+                       "location": LazyNestedField(LOCATION_FIELDS)}
+        self.assertSameAsMarshal({"event_id": 4}, lazy_fields)
+        self.assertSameAsMarshal({"event_id": 4, "location": {"lid": 1, "location": "A"}}, lazy_fields)
+
+    def test_0050_fast_paths(self):
+        self.assertEqual(serializers._compile_field("title", fields.String)[0], serializers._FORMAT)
+        self.assertEqual(serializers._compile_field("title", Upper())[0], serializers._FORMAT)
+        self.assertEqual(serializers._compile_field("location", fields.Nested(LOCATION_FIELDS))[0],
+                         serializers._NESTED)
+        self.assertEqual(serializers._compile_field("location", LazyNestedField(LOCATION_FIELDS))[0],
+                         serializers._GENERIC)
+
+
+class FakeFieldset(object):
+    compiled = 0
+
+    def __init__(self):
+        self.selection = (None, None)
+
+    def _parse_request_overrides(self):
+        return self.selection
+
+    def marshall_dict(self, selected_fields=None, selected_embed=None):
+        FakeFieldset.compiled += 1
+        if selected_fields:
+            return OrderedDict((name, EVENT_FIELDS[name]) for name in sorted(selected_fields))
+        return EVENT_FIELDS
+
+
+class TestCompiledFieldset(unittest.TestCase):
+    def test_0010_decorator(self):
+        decorator = CompiledFieldset(FakeFieldset)
+        FakeFieldset.compiled = 0
+
+        @decorator
+        def get():
+            return [Event(1, "Party")], 201, {"X-Test": "1"}
+
+        data, code, headers = get()
+        self.assertEqual((data, code, headers), (marshal([Event(1, "Party")], EVENT_FIELDS), 201, {"X-Test": "1"}))
+        get()
+        decorator.fieldset.selection = ({"id"}, None)
+        self.assertEqual(get()[0], [OrderedDict([("id", 1)])])
+        self.assertEqual(FakeFieldset.compiled, 2)
+
+    def test_0020_streamed_lists(self):
+        decorator = CompiledFieldset(FakeFieldset)
+
+        @decorator
+        def get():
+            return [Event(event_id, "Event") for event_id in range(STREAM_MIN_ITEMS)]
+
+        data = get()
+        self.assertIsInstance(data, StreamedList)
+        self.assertEqual(list(data), marshal(data.items, EVENT_FIELDS))
+
+    def test_0030_cache_size(self):
+        decorator = CompiledFieldset(FakeFieldset, cache_size=2)
+        for name in ("id", "title", "count"):
+            decorator.serializer({name})
+        self.assertEqual(len(decorator._serializers), 1)
+
+
+Base = declarative_base()
+
+
+class DbTown(Base):
+    __tablename__ = "towns"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class DbPlace(Base):
+    __tablename__ = "places"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    town_id = Column(Integer, ForeignKey("towns.id"))
+    town = relationship("DbTown")
+
+
+class DbHost(Base):
+    __tablename__ = "hosts"
+    id = Column(Integer, primary_key=True)
+    place_id = Column(Integer, ForeignKey("places.id"))
+    place = relationship("DbPlace")
+    guests = relationship("DbGuest")
+
+
+class DbGuest(Base):
+    __tablename__ = "guests"
+    id = Column(Integer, primary_key=True)
+    host_id = Column(Integer, ForeignKey("hosts.id"))
+
+
+class PlaceName(fields.Raw):
+    def format(self, value):
+        return value.name
+
+
+TOWN_FIELDS = {"name": fields.String}
+PLACE_FIELDS = {"name": fields.String, "town": fields.Nested(TOWN_FIELDS)}
+HOST_FIELDS = OrderedDict([("id", fields.Integer),
+                           ("place", fields.Nested(PLACE_FIELDS)),
+                           ("guests", fields.List(fields.Integer(attribute="id"))),
+                           ("place_id", fields.Integer)])
+
+
+class HostFieldset(object):
+    def _parse_request_overrides(self):
+        return None, None
+
+    def marshall_dict(self, selected_fields=None, selected_embed=None):
+        return HOST_FIELDS
+
+
+class TestEagerLoad(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        for number in range(10):
+            town = DbTown(id=number, name="Town %d" % number)
+            place = DbPlace(id=number, name="Place %d" % number, town=town)
+            self.session.add(DbHost(id=number, place=place, guests=[DbGuest(id=number * 10 + guest)
+                                                                     for guest in range(3)]))
+        self.session.commit()
+        self.session.expunge_all()
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: self.statements.append(args[2]))
+
+    def test_0010_paths(self):
+        self.assertEqual(relationship_paths(HOST_FIELDS, inspect(DbHost)),
+                         [("place",), ("place", "town"), ("guests",)])
+        self.assertEqual(relationship_paths({"place": PlaceName}, inspect(DbHost)), [])
+        self.assertEqual(relationship_paths({"name": PlaceName(attribute="place")}, inspect(DbHost)), [("place",)])
+
+    def test_0020_constant_queries(self):
+        lazy = marshal(self.session.query(DbHost).all(), HOST_FIELDS)
+        self.assertEqual(len(self.statements), 31)
+        self.session.expunge_all()
+        del self.statements[:]
+
+        options = [loader_option(DbHost, path) for path in relationship_paths(HOST_FIELDS, inspect(DbHost))]
+        eager = marshal(self.session.query(DbHost).options(*options).all(), HOST_FIELDS)
+        self.assertEqual(eager, lazy)
+        self.assertEqual(len(self.statements), 2)
+
+    def test_0030_eager_load(self):
+        with Flask(__name__).test_request_context("/"):
+            query = eager_load(self.session.query(DbHost), HostFieldset)
+        hosts = query.all()
+        marshal(hosts, HOST_FIELDS)
+        self.assertEqual(len(self.statements), 2)
@@ -0,0 +1,63 @@
+import unittest
+from db_backend.utils.cache import CachedCounters, IncrementalCounters
+
+
+class TestCachedCounters(unittest.TestCase):
+    def setUp(self):
+        self.rows = [(1, 10), (2, 5), (3, None)]
+        self.loads = 0
+
+    def loader(self):
+        self.loads += 1
+        return list(self.rows)
+
+    def test_0010_count(self):
+        counters = CachedCounters(self.loader)
+        self.assertEqual(counters.count(), 15)
+        self.assertEqual(counters.count([1, 3]), 10)
+        self.assertEqual(counters.count({2, 99}), 5)
+        self.assertEqual(counters.count([]), 0)
+        self.assertEqual(self.loads, 1)
+
+    def test_0020_reload(self):
+        counters = CachedCounters(self.loader, ttl=0)
+        counters.count()
+        self.rows = [(1, 11)]
+        self.assertEqual(counters.count(), 11)
+        self.assertEqual(self.loads, 2)
+
+
+class TestIncrementalCounters(unittest.TestCase):
+    def setUp(self):
+        # (id, key) rows of a table
+        self.rows = [(1, "a"), (2, "a"), (3, "b")]
+        self.loads = []
+
+    def loader(self, after_id=None):
+        self.loads.append(after_id)
+        added = [(row_id, key) for row_id, key in self.rows if after_id is None or row_id > after_id]
+        counts = {}
+        for row_id, key in added:
+            counts[key] = counts.get(key, 0) + 1
+        return max([row_id for row_id, key in added] or [None]), list(counts.items())
+
+    def test_0010_count(self):
+        counters = IncrementalCounters(self.loader)
+        self.assertEqual((counters.count(), counters.count(["a"]), counters.count(["c"])), (3, 2, 0))
+        self.assertEqual(self.loads, [None])
+
+    def test_0020_added_rows(self):
+        counters = IncrementalCounters(self.loader, ttl=0)
+        counters.count()
+        self.rows.extend([(4, "b"), (5, "c")])
+        self.assertEqual(counters.count(["b", "c"]), 3)
+        self.assertEqual(counters.count(), 5)
+        self.assertEqual(self.loads, [None, 3, 5])
+        self.assertEqual((counters.full_loads, counters.incremental_loads), (1, 2))
+
+    def test_0030_rebuild(self):
+        counters = IncrementalCounters(self.loader, ttl=0, rebuild_ttl=0)
+        counters.count()
+        del self.rows[0]
+        self.assertEqual(counters.count(), 2)
+        self.assertEqual(self.loads, [None, None])
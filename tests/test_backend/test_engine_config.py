@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, exc
+from db_backend.pool import MeteredQueuePool
+from db_backend.settings import DatabaseSettings
+
+
+class TestDatabaseSettings(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.tempdir, "exma_db.ini")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_0010_defaults(self):
+        settings = DatabaseSettings.load(self.config_file, environ={})
+        self.assertIsNone(settings.url)
+        self.assertFalse(settings.echo)
+        self.assertEqual(settings.pool_size, 5)
+        self.assertTrue(settings.pool_pre_ping)
+
+    def test_0020_config_file(self):
+        with open(self.config_file, "w") as f:
+            f.write("[database]\npool_size = 20\nmax_overflow = 0\npool_pre_ping = no\n")
+        settings = DatabaseSettings.load(self.config_file, environ={})
+        self.assertEqual(settings.pool_size, 20)
+        self.assertEqual(settings.max_overflow, 0)
+        self.assertFalse(settings.pool_pre_ping)
+
+    def test_0030_environment_overrides_file(self):
+        with open(self.config_file, "w") as f:
+            f.write("[database]\npool_size = 20\npool_recycle = 600\n")
+        settings = DatabaseSettings.load(self.config_file, environ={"EXMA_DB_POOL_SIZE": "7",
+                                                                    "EXMA_DB_ECHO": "true"})
+        self.assertEqual(settings.pool_size, 7)
+        self.assertEqual(settings.pool_recycle, 600)
+        self.assertTrue(settings.echo)
+
+    def test_0040_unknown_setting(self):
+        self.assertRaises(ValueError, DatabaseSettings, pool_sice=3)
+
+    def test_0050_sqlite_without_pool_options(self):
+        settings = DatabaseSettings(url="sqlite://")
+        self.assertFalse(settings.pooled)
+        self.assertEqual(settings.engine_options(), {"echo": False})
+
+
+class TestPoolMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.engine = create_engine("sqlite:///%s" % os.path.join(self.tempdir, "db.sqlite"),
+                                    poolclass=MeteredQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.01)
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.tempdir)
+
+    def test_0010_checkouts(self):
+        with self.engine.connect() as conn:
+            conn.execute("SELECT 1")
+            status = self.engine.pool.metrics.status(self.engine.pool)
+            self.assertEqual(status["checked_out"], 1)
+        status = self.engine.pool.metrics.status(self.engine.pool)
+        self.assertEqual(status["checkouts"], 1)
+        self.assertEqual(status["checked_out"], 0)
+
+    def test_0020_timeout(self):
+        with self.engine.connect():
+            self.assertRaises(exc.TimeoutError, self.engine.connect)
+        status = self.engine.pool.metrics.status()
+        self.assertEqual(status["timeouts"], 1)
+        self.assertGreaterEqual(status["wait_max"], 0.01)
+
+    def test_0030_metrics_survive_dispose(self):
+        self.engine.connect().close()
+        metrics = self.engine.pool.metrics
+        self.engine.dispose()
+        self.assertIs(self.engine.pool.metrics, metrics)
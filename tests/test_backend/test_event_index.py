@@ -0,0 +1,114 @@
+import random
+import unittest
+from db_backend.utils.event_index import EventIntervalIndex, CompiledSpans, EventSpan, span_stamp, row_digest
+from sqlalchemy import create_engine, select, func, Table, Column, Integer, MetaData
+
+
+def _selected(span, start, end):
+    # The condition of DbEvents.query_between
+    return (start <= span.start < end or start <= span.end < end or
+            (span.start < start and span.end > end))
+
+
+class FakeEvents(object):
+    def __init__(self, rows):
+        self.rows = rows
+        self.loads = []
+
+    def load(self, after_id=None):
+        self.loads.append(after_id)
+        return [row for row in self.rows if after_id is None or row[0] > after_id]
+
+    def stamp(self, max_id):
+        return (max(row[0] for row in self.rows),
+                span_stamp(EventSpan(*row) for row in self.rows if row[0] <= max_id))
+
+
+class TestCompiledSpans(unittest.TestCase):
+    def test_0010_matches_query(self):
+        rand = random.Random(0)
+        spans = []
+        for event_id in range(300):
+            start = rand.randint(0, 1000)
+            spans.append(EventSpan(event_id, start, start + rand.choice([0, 5, 50, 400]), 0, 1))
+        compiled = CompiledSpans(spans)
+        for _ in range(200):
+            start = rand.randint(-50, 1050)
+            end = start + rand.randint(0, 100)
+            expected = sorted((span.start, span.event_id) for span in spans if _selected(span, start, end))
+            self.assertEqual([(span.start, span.event_id) for span in compiled.between(start, end)], expected)
+
+    def test_0020_empty(self):
+        self.assertEqual(CompiledSpans([]).between(0, 10), [])
+
+
+class TestEventIntervalIndex(unittest.TestCase):
+    def setUp(self):
+        self.events = FakeEvents([(1, 10, 20, 1, 5), (2, 15, 16, 2, 5), (3, 30, 40, 1, 6)])
+
+    def index(self, poll_interval=0):
+        return EventIntervalIndex(self.events.load, self.events.stamp, poll_interval)
+
+    def test_0010_filters(self):
+        index = self.index(poll_interval=60)
+        self.assertEqual(index.event_ids_between(0, 100), [1, 2, 3])
+        self.assertEqual(index.event_ids_between(12, 25), [1, 2])
+        self.assertEqual(index.event_ids_between(0, 100, category=1), [1, 3])
+        self.assertEqual(index.event_ids_between(0, 100, forum_ids={6}), [3])
+        self.assertEqual(self.events.loads, [None])
+
+    def test_0020_incremental(self):
+        index = self.index()
+        index.event_ids_between(0, 100)
+        self.events.rows.append((4, 35, 36, 1, 5))
+        self.assertEqual(index.event_ids_between(0, 100), [1, 2, 3, 4])
+        self.assertEqual(self.events.loads, [None, 3])
+        self.assertEqual((index.full_loads, index.incremental_loads), (1, 1))
+
+    def test_0030_changed_rows_rebuild(self):
+        index = self.index()
+        index.event_ids_between(0, 100)
+        self.events.rows[0] = (1, 50, 60, 1, 5)
+        self.assertEqual(index.event_ids_between(0, 45), [2, 3])
+        del self.events.rows[1]
+        self.assertEqual(index.event_ids_between(0, 45), [3])
+        self.assertEqual(self.events.loads, [None, None, None])
+
+    def test_0035_swapped_values_rebuild(self):
+        index = self.index()
+        self.assertEqual(index.event_ids_between(0, 100, forum_ids={5}), [1, 2])
+        # events 2 and 3 swap their forums, categories and dates: no sum changes
+        self.events.rows[1:3] = [(2, 30, 40, 1, 6), (3, 15, 16, 2, 5)]
+        self.assertEqual(index.event_ids_between(0, 100, forum_ids={5}), [1, 3])
+        self.assertEqual(index.event_ids_between(12, 25, category=1), [1])
+        self.assertEqual(self.events.loads, [None, None])
+
+    def test_0040_revision(self):
+        index = self.index()
+        revision = index.revision()
+        self.assertEqual(index.revision(), revision)
+        self.events.rows[0] = (1, 10, 25, 1, 5)
+        self.assertNotEqual(index.revision(), revision)
+        revision = index.revision()
+        self.events.rows.append((4, 35, 36, 1, 5))
+        self.assertNotEqual(index.revision(), revision)
+
+
+class TestRowDigest(unittest.TestCase):
+    def test_0010_sql_matches_python(self):
+        engine = create_engine("sqlite://")
+        metadata = MetaData()
+        table = Table("spans", metadata, *[Column(name, Integer) for name in EventSpan.__slots__])
+        metadata.create_all(engine)
+        rows = [(1, 1425211200, 1427803200, 3, 12), (2147483646, 2147483647, 2147483647, 99, 65535), (7, 0, 0, 0, 0)]
+        engine.execute(table.insert(), [dict(zip(EventSpan.__slots__, row)) for row in rows])
+
+        digest = row_digest(*[table.c[name] for name in EventSpan.__slots__])
+        queried = engine.execute(select([func.count(), func.sum(digest)]).select_from(table)).first()
+        self.assertEqual(tuple(queried), span_stamp(EventSpan(*row) for row in rows))
+
+    def test_0020_swaps_change_the_stamp(self):
+        stamp = span_stamp([EventSpan(1, 10, 20, 1, 5), EventSpan(2, 15, 16, 2, 6)])
+        self.assertNotEqual(span_stamp([EventSpan(1, 10, 20, 1, 6), EventSpan(2, 15, 16, 2, 5)]), stamp)
+        self.assertNotEqual(span_stamp([EventSpan(1, 15, 16, 1, 5), EventSpan(2, 10, 20, 2, 6)]), stamp)
+        self.assertNotEqual(span_stamp([EventSpan(1, 10, 20, 2, 5), EventSpan(2, 15, 16, 1, 6)]), stamp)
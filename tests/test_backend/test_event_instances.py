@@ -0,0 +1,219 @@
+import datetime
+import unittest
+from dateutil import rrule
+from db_backend.utils import timestamps, events
+from db_backend.utils.events import iter_event_instances, make_event_instances, merge_event_instances, \
+    OccurrenceCache, occurrence_cache, expand_occurrences, expand_between, EventInstance, EventCategory
+
+
+class FakeTopic(object):
+    def __init__(self, title):
+        self.title = title
+
+
+class FakeEvent(object):
+    def __init__(self, event_id, frequency, start, until):
+        self.event_id = event_id
+        self.start = timestamps.to_db(start)
+        self.end = timestamps.to_db(until)
+        self.type = 0 if frequency == rrule.DAILY else 1
+        self.frequency = frequency
+        self.rules_built = 0
+        self.category = 1
+        self.location_id = 3
+        self.location = None
+        self.topic = FakeTopic("Event %d" % event_id)
+
+    @property
+    def start_date(self):
+        return timestamps.from_db(self.start)
+
+    @property
+    def end_date(self):
+        return timestamps.from_db(self.end)
+
+    @property
+    def recurrence_interval(self):
+        return self.frequency
+
+    @property
+    def recurrence_rule(self):
+        self.rules_built += 1
+        return rrule.rrule(self.frequency, dtstart=timestamps.from_db(self.start),
+                           until=timestamps.from_db(self.end))
+
+
+def day(number, hour=12):
+    return timestamps.new_datetime(2015, 3, number, hour)
+
+
+class TestEventInstances(unittest.TestCase):
+    def test_0010_inclusive_interval(self):
+        event = FakeEvent(1, rrule.DAILY, day(1), day(20))
+        starts = [instance.start for instance in iter_event_instances(event, day(3), day(6))]
+        self.assertEqual(starts, [day(3), day(4), day(5), day(6)])
+        self.assertEqual([instance.start for instance in make_event_instances(event, day(3), day(6))], starts)
+
+    def test_0020_lazy(self):
+        event = FakeEvent(1, rrule.DAILY, day(1), day(20))
+        instances = iter_event_instances(event, day(1), day(20))
+        self.assertEqual(next(instances).start, day(1))
+        self.assertEqual(next(instances).start, day(2))
+
+    def test_0030_merged_order(self):
+        weekly = FakeEvent(7, rrule.WEEKLY, day(2), day(30))
+        daily = FakeEvent(3, rrule.DAILY, day(8), day(10))
+        single = FakeEvent(5, rrule.DAILY, day(9), day(9))
+        merged = [(instance.start, instance.db_instance.event_id)
+                  for instance in merge_event_instances([weekly, daily, single], day(1), day(17))]
+        self.assertEqual(merged, [(day(2), 7), (day(8), 3), (day(9), 3), (day(9), 5), (day(9), 7),
+                                  (day(10), 3), (day(16), 7)])
+
+    def test_0040_merged_stops_early(self):
+        created = []
+
+        class CountingInstance(EventInstance):
+            __slots__ = ()
+
+            def __init__(self, *args):
+                super().__init__(*args)
+                created.append(self)
+
+        saved, events.EventInstance = events.EventInstance, CountingInstance
+        try:
+            db_events = [FakeEvent(event_id, rrule.DAILY, day(1), day(28)) for event_id in range(10)]
+            merged = merge_event_instances(db_events, day(1), day(28))
+            first = [next(merged) for _ in range(5)]
+        finally:
+            events.EventInstance = saved
+        self.assertEqual([instance.db_instance.event_id for instance in first], [0, 1, 2, 3, 4])
+        # the full expansion has 280 instances, only the consumed ones are created
+        self.assertEqual(len(created), 5)
+
+    def test_0050_merged_rule_fallback(self):
+        db_events = [FakeEvent(7, rrule.WEEKLY, day(2), day(30)), FakeEvent(3, rrule.DAILY, day(8), day(10)),
+                     FakeEvent(5, rrule.DAILY, day(9), day(8)), FakeEvent(3, rrule.DAILY, day(9), day(11)),
+                     FakeEvent(9, rrule.MONTHLY, day(9), day(9))]
+        expected = sorted(((instance.start, instance.db_instance.event_id, position), instance.db_instance)
+                          for position, db_event in enumerate(db_events)
+                          for instance in iter_event_instances(db_event, day(1), day(17)))
+        merged = list(merge_event_instances(iter(db_events), day(1), day(17)))
+        self.assertEqual([(instance.start, instance.db_instance) for instance in merged],
+                         [(key[0], db_event) for key, db_event in expected])
+        self.assertIs(merged[0].record, merged[4].record)
+
+
+class TestEventRecord(unittest.TestCase):
+    def test_0010_shared_record(self):
+        event = FakeEvent(4, rrule.DAILY, day(1), day(20))
+        instances = make_event_instances(event, day(3), day(6))
+        self.assertTrue(all(instance.record is instances[0].record for instance in instances))
+        instance = instances[1]
+        self.assertEqual((instance.event_id, instance.title, instance.type_name, instance.location_id),
+                         (4, "Event 4", "DAYLY", 3))
+        self.assertEqual(instance.overall_end, day(20))
+        self.assertEqual(instance.end - instance.start, datetime.timedelta(hours=6))
+        self.assertIs(instance.category_instance, EventCategory.by_id(1))
+        self.assertIs(instance.db_instance, event)
+        self.assertEqual(instance.frequency, rrule.DAILY)
+        self.assertFalse(hasattr(instance, "__dict__"))
+
+    def test_0015_location_loaded_on_use(self):
+        loaded = []
+
+        class LocatedEvent(FakeEvent):
+            @property
+            def location(self):
+                loaded.append(self.event_id)
+                return "Club"
+
+            @location.setter
+            def location(self, value):
+                pass
+
+        instances = make_event_instances(LocatedEvent(4, rrule.DAILY, day(1), day(20)), day(3), day(6))
+        self.assertEqual([instance.location_id for instance in instances], [3, 3, 3, 3])
+        self.assertEqual(loaded, [])
+        self.assertEqual(instances[0].location, "Club")
+        self.assertEqual(loaded, [4])
+
+    def test_0020_type_names(self):
+        self.assertEqual(EventInstance(day(1), FakeEvent(1, rrule.DAILY, day(1), day(1))).type_name, "SINGLE")
+        self.assertEqual(EventInstance(day(1), FakeEvent(1, rrule.WEEKLY, day(1), day(1))).type_name, "WEEKLY")
+
+
+class TestOccurrenceCache(unittest.TestCase):
+    def setUp(self):
+        occurrence_cache.clear()
+
+    def test_0010_hits(self):
+        event = FakeEvent(1, rrule.DAILY, day(1), day(20))
+        make_event_instances(event, day(3), day(6))
+        instances = make_event_instances(event, day(10), day(12))
+        self.assertEqual([instance.start for instance in instances], [day(10), day(11), day(12)])
+        self.assertEqual(occurrence_cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    def test_0020_edit_changes_key(self):
+        event = FakeEvent(1, rrule.DAILY, day(1), day(20))
+        make_event_instances(event, day(1), day(20))
+        event.end = timestamps.to_db(day(5))
+        self.assertEqual(len(make_event_instances(event, day(1), day(20))), 5)
+        self.assertEqual(occurrence_cache.stats()["misses"], 2)
+
+    def test_0025_merged_from_cache(self):
+        db_events = [FakeEvent(event_id, rrule.DAILY, day(1), day(28)) for event_id in range(3)]
+        first = list(merge_event_instances(db_events, day(1), day(10)))
+        self.assertEqual(occurrence_cache.stats(), {"hits": 0, "misses": 3, "size": 3})
+        second = list(merge_event_instances(db_events, day(1), day(10)))
+        self.assertEqual(occurrence_cache.stats(), {"hits": 3, "misses": 3, "size": 3})
+        self.assertEqual([instance.start for instance in second], [instance.start for instance in first])
+
+    def test_0030_eviction(self):
+        cache = OccurrenceCache(max_size=2)
+        events = [FakeEvent(event_id, rrule.WEEKLY, day(1), day(28)) for event_id in range(3)]
+        for event in events + events[2:]:
+            self.assertEqual(len(cache.occurrences(event)), 4)
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 3, "size": 2})
+        cache.occurrences(events[0])
+        self.assertEqual(cache.misses, 4)
+
+
+class TestExpansion(unittest.TestCase):
+    def assertMatchesRule(self, event):
+        expected = [timestamps.to_db(date_instance) for date_instance in event.recurrence_rule]
+        self.assertEqual(list(expand_occurrences(event)), expected)
+
+    def test_0010_arithmetic(self):
+        self.assertMatchesRule(FakeEvent(1, rrule.DAILY, day(1), day(20)))
+        self.assertMatchesRule(FakeEvent(1, rrule.WEEKLY, day(1), day(29)))
+        self.assertMatchesRule(FakeEvent(1, rrule.WEEKLY, day(1), day(29, hour=11)))
+        self.assertMatchesRule(FakeEvent(1, rrule.DAILY, day(5), day(5)))
+        self.assertMatchesRule(FakeEvent(1, rrule.DAILY, day(5), day(4)))
+        self.assertIsInstance(expand_occurrences(FakeEvent(1, rrule.DAILY, day(1), day(20))), range)
+
+    def test_0020_rule_fallback(self):
+        event = FakeEvent(1, rrule.MONTHLY, day(1), timestamps.new_datetime(2015, 7, 1, 12))
+        self.assertEqual(len(expand_occurrences(event)), 5)
+        self.assertEqual(event.rules_built, 1)
+        self.assertEqual([instance.start for instance in make_event_instances(event, day(2), day(31))], [])
+
+    def test_0030_between(self):
+        day_seconds = 24 * 60 * 60
+        start = timestamps.to_db(day(3))
+        spans = [(start - 3 * day_seconds, start + 5 * day_seconds, day_seconds),
+                 (start + 100, start + 20 * day_seconds, 7 * day_seconds),
+                 (start + 9 * day_seconds, start + 20 * day_seconds, day_seconds),
+                 (start - 10 * day_seconds, start - day_seconds, day_seconds)]
+        occurrences, positions = expand_between(spans, start, start + 8 * day_seconds)
+        expected = sorted((occurrence, position)
+                          for position, (span_start, span_end, step) in enumerate(spans)
+                          for occurrence in range(span_start, span_end + 1, step)
+                          if start <= occurrence <= start + 8 * day_seconds)
+        self.assertEqual(list(zip(occurrences, positions)), expected)
+        self.assertEqual(expand_between([], start, start), ([], []))
+
+        saved, events.numpy = events.numpy, None
+        try:
+            self.assertEqual(expand_between(spans, start, start + 8 * day_seconds), (occurrences, positions))
+        finally:
+            events.numpy = saved
@@ -0,0 +1,60 @@
+import unittest
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, Text, select
+from db_backend.forum_perms import permission_rows, sync_forum_perms, forum_perms_table, ForumPermsState
+
+
+READ_2_3 = 'a:2:{s:10:"read_perms";s:3:"2,3";s:11:"reply_perms";s:1:"3";}'
+READ_4 = 'a:1:{s:10:"read_perms";s:1:"4";}'
+
+
+class TestPermissionRows(unittest.TestCase):
+    def test_0010_expand(self):
+        rows = permission_rows([(1, READ_2_3), (2, READ_4), (3, ""), (4, None)])
+        self.assertEqual(rows, [{"forum_id": 1, "mask_id": 2, "perm_type": "read_perms"},
+                                {"forum_id": 1, "mask_id": 3, "perm_type": "read_perms"},
+                                {"forum_id": 1, "mask_id": 3, "perm_type": "reply_perms"},
+                                {"forum_id": 2, "mask_id": 4, "perm_type": "read_perms"}])
+
+
+class TestSyncForumPerms(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        metadata = MetaData()
+        self.forums = Table("ipb_forums", metadata,
+                            Column("id", Integer, primary_key=True),
+                            Column("permission_array", Text))
+        metadata.create_all(self.engine)
+        self.engine.execute(self.forums.insert(), [{"id": 1, "permission_array": READ_2_3},
+                                                   {"id": 2, "permission_array": READ_4}])
+        self.table = forum_perms_table(MetaData())
+
+    def stored(self):
+        return sorted(tuple(row) for row in self.engine.execute(select([self.table])))
+
+    def test_0010_initial_sync(self):
+        self.assertTrue(sync_forum_perms(self.engine))
+        self.assertEqual(self.stored(), [(1, 2, "read_perms"), (1, 3, "read_perms"),
+                                         (1, 3, "reply_perms"), (2, 4, "read_perms")])
+
+    def test_0020_unchanged(self):
+        sync_forum_perms(self.engine)
+        self.assertFalse(sync_forum_perms(self.engine))
+
+    def test_0030_changed(self):
+        sync_forum_perms(self.engine)
+        self.engine.execute(self.forums.update().where(self.forums.c.id == 1).values(permission_array=READ_4))
+        self.assertTrue(sync_forum_perms(self.engine))
+        self.assertEqual(self.stored(), [(1, 4, "read_perms"), (2, 4, "read_perms")])
+
+
+class TestForumPermsState(unittest.TestCase):
+    def test_0010_synced(self):
+        loaded = [[(1, 2, "read_perms"), (1, 3, "read_perms"), (1, 3, "reply_perms")], [(1, READ_2_3)]]
+        state = ForumPermsState(lambda: loaded, ttl=0)
+        self.assertTrue(state.synced())
+
+        loaded[1] = [(1, READ_4)]
+        self.assertFalse(state.synced())
+
+    def test_0020_missing_table(self):
+        self.assertFalse(ForumPermsState(lambda: (None, [(1, READ_4)]), ttl=0).synced())
@@ -0,0 +1,18 @@
+import unittest
+import zlib
+from sqlalchemy import create_engine, select, literal
+
+from db_backend import functions
+
+
+class TestFunctions(unittest.TestCase):
+    def test_0010_crc32(self):
+        self.assertEqual(functions.crc32("Party"), zlib.crc32(b"Party"))
+        self.assertEqual(functions.crc32(12), zlib.crc32(b"12"))
+        self.assertIsNone(functions.crc32(None))
+
+    def test_0020_sqlite_text_digest(self):
+        engine = create_engine("sqlite://")
+        self.assertEqual(engine.execute(select([functions.text_digest(literal("Kneipe oder Club"))])).scalar(),
+                         zlib.crc32("Kneipe oder Club".encode("utf-8")))
+        self.assertEqual(engine.execute(select([functions.text_digest(literal(None))])).scalar(), 0)
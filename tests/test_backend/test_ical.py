@@ -0,0 +1,95 @@
+import unittest
+from dateutil import rrule
+from db_backend.utils import timestamps
+from db_backend.utils.ical import escape_text, fold_line, render_vevent, event_revision, iter_calendar, VEventCache
+
+
+class FakeTopic(object):
+    def __init__(self, title, start_date):
+        self.title = title
+        self.start_date = start_date
+
+
+class FakeLocation(object):
+    def __init__(self, location, strasse=None, plz=None, stadt=None):
+        self.location = location
+        self.strasse = strasse
+        self.plz = plz
+        self.stadt = stadt
+
+
+class FakeEvent(object):
+    def __init__(self, event_id, start, end, event_type=0, category=1, title="Party", location=None):
+        self.event_id = event_id
+        self.start = timestamps.to_db(start)
+        self.end = timestamps.to_db(end)
+        self.type = event_type
+        self.category = category
+        self.topic = FakeTopic(title, self.start - 3600)
+        self.location = location
+
+    @property
+    def recurrence_interval(self):
+        return rrule.DAILY if self.type == 0 else rrule.WEEKLY
+
+
+def day(number, hour=20):
+    return timestamps.new_datetime(2015, 3, number, hour)
+
+
+class TestFormatting(unittest.TestCase):
+    def test_0010_escape(self):
+        self.assertEqual(escape_text("a,b;c\\d\ne"), "a\\,b\\;c\\\\d\\ne")
+
+    def test_0020_fold(self):
+        self.assertEqual(fold_line("SUMMARY:x"), "SUMMARY:x\r\n")
+        folded = fold_line("SUMMARY:" + "ä" * 100)
+        lines = folded[:-2].split("\r\n")
+        self.assertTrue(all(len(line.encode("utf-8")) <= 75 for line in lines))
+        self.assertTrue(all(line.startswith(" ") for line in lines[1:]))
+        self.assertEqual("".join(line[1:] if position else line for position, line in enumerate(lines)),
+                         "SUMMARY:" + "ä" * 100)
+
+
+class TestVEvent(unittest.TestCase):
+    def test_0010_weekly(self):
+        event = FakeEvent(5, day(2), day(30), event_type=1, title="Kino, Film",
+                          location=FakeLocation("Club", "Strasse 1", "01069", "Dresden"))
+        block = render_vevent(event_revision(event), event.recurrence_interval)
+        self.assertEqual(block.split("\r\n"), ["BEGIN:VEVENT",
+                                               "UID:event-5@exma.de",
+                                               "DTSTAMP:20150302T190000Z",
+                                               "DTSTART:20150302T200000Z",
+                                               "DTEND:20150303T020000Z",
+                                               "RRULE:FREQ=WEEKLY;UNTIL=20150330T200000Z",
+                                               "SUMMARY:Kino\\, Film",
+                                               "CATEGORIES:Party",
+                                               "LOCATION:Club\\, Strasse 1\\, 01069 Dresden",
+                                               "END:VEVENT",
+                                               ""])
+
+    def test_0020_single(self):
+        event = FakeEvent(5, day(2), day(2))
+        block = render_vevent(event_revision(event), event.recurrence_interval)
+        self.assertNotIn("RRULE", block)
+        self.assertNotIn("LOCATION", block)
+        self.assertEqual(render_vevent(event_revision(FakeEvent(5, day(2), day(1))), rrule.DAILY), "")
+
+    def test_0030_cache_revisions(self):
+        cache = VEventCache()
+        event = FakeEvent(5, day(2), day(9))
+        first = cache.vevent(event)
+        self.assertIs(cache.vevent(event), first)
+        event.topic.title = "Edited"
+        self.assertIn("SUMMARY:Edited", cache.vevent(event))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 2, "size": 2})
+
+    def test_0040_calendar_chunks(self):
+        cache = VEventCache()
+        events = [FakeEvent(event_id, day(2), day(9)) for event_id in range(5)]
+        chunks = list(iter_calendar(events, "Events", chunk_size=2, cache=cache))
+        self.assertEqual(len(chunks), 5)
+        self.assertTrue(chunks[0].startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertIn("X-WR-CALNAME:Events\r\n", chunks[0])
+        self.assertEqual(chunks[-1], "END:VCALENDAR\r\n")
+        self.assertEqual("".join(chunks).count("BEGIN:VEVENT"), 5)
@@ -0,0 +1,41 @@
+import unittest
+from sqlalchemy import create_engine, inspect, MetaData, Table, Column, Index, Integer, SmallInteger
+from db_backend.indexes import api_indexes, missing_indexes, ensure_indexes
+
+
+def _topics_table(metadata):
+    return Table("ipb_topics", metadata,
+                 Column("tid", Integer, primary_key=True),
+                 Column("forum_id", SmallInteger),
+                 Column("approved", SmallInteger),
+                 Column("last_post", Integer))
+
+
+class TestIndexes(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        self.metadata = MetaData()
+        self.topics = _topics_table(self.metadata)
+
+    def index_names(self):
+        return set(index["name"] for index in inspect(self.engine).get_indexes("ipb_topics"))
+
+    def test_0010_declare(self):
+        indexes = api_indexes(self.metadata)
+        self.assertEqual(set(index.name for index in indexes), {"exma_topics_forum_feed", "exma_topics_feed"})
+        self.assertEqual(api_indexes(self.metadata), [])
+
+    def test_0020_ensure(self):
+        self.metadata.create_all(self.engine)
+        self.assertEqual(len(missing_indexes(self.engine)), 2)
+        self.assertEqual(sorted(ensure_indexes(self.engine)), ["exma_topics_feed", "exma_topics_forum_feed"])
+        self.assertEqual(self.index_names(), {"exma_topics_feed", "exma_topics_forum_feed"})
+        self.assertEqual(ensure_indexes(self.engine), [])
+
+    def test_0030_same_columns_exist(self):
+        Index("other_name", self.topics.c.approved, self.topics.c.last_post)
+        self.metadata.create_all(self.engine)
+        self.assertEqual(ensure_indexes(self.engine), ["exma_topics_forum_feed"])
+
+    def test_0040_missing_table(self):
+        self.assertEqual(ensure_indexes(self.engine), [])
@@ -0,0 +1,129 @@
+import unittest
+from db_backend.utils.permissions import ForumPermissionIndex, ForumBitsets, GroupMaskCache, parse_id_list
+from db_backend.utils.user import ForumPermissions
+
+
+PUBLIC_FORUM = (b'a:2:{s:10:"read_perms";s:5:"2,3,4";s:11:"reply_perms";s:3:"3,4";}')
+MEMBER_FORUM = (b'a:2:{s:10:"read_perms";s:3:"3,4";s:11:"reply_perms";s:1:"4";}')
+ADMIN_FORUM = (b'a:2:{s:10:"read_perms";s:1:"4";s:11:"reply_perms";s:1:"4";}')
+
+
+class CountingLoader(object):
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return list(self.rows)
+
+
+class TestForumPermissionIndex(unittest.TestCase):
+    def setUp(self):
+        self.loader = CountingLoader([(1, PUBLIC_FORUM), (2, MEMBER_FORUM), (3, ADMIN_FORUM), (4, "")])
+
+    def test_0010_forums_with_read(self):
+        index = ForumPermissionIndex(self.loader)
+        self.assertEqual(index.forums_with([2]), {1})
+        self.assertEqual(index.forums_with({3}), {1, 2})
+        self.assertEqual(index.forums_with((2, 4)), {1, 2, 3})
+        self.assertEqual(index.forums_with([7]), frozenset())
+
+    def test_0020_forums_with_other_type(self):
+        index = ForumPermissionIndex(self.loader)
+        self.assertEqual(index.forums_with([3], ForumPermissions.PERM_REPLY), {1})
+        self.assertEqual(index.forums_with([4], ForumPermissions.PERM_START), frozenset())
+
+    def test_0030_is_permitted(self):
+        index = ForumPermissionIndex(self.loader)
+        self.assertTrue(index.is_permitted(2, [3]))
+        self.assertFalse(index.is_permitted(3, [3]))
+        self.assertFalse(index.is_permitted(4, [2, 3, 4]))
+        self.assertFalse(index.is_permitted(99, [4]))
+
+    def test_0040_loaded_once(self):
+        index = ForumPermissionIndex(self.loader)
+        first = index.forums_with([3])
+        self.assertIs(index.forums_with({3}), first)
+        index.is_permitted(1, [2])
+        self.assertEqual(self.loader.calls, 1)
+
+    def test_0050_reload_after_ttl(self):
+        index = ForumPermissionIndex(self.loader, ttl=0)
+        index.forums_with([3])
+        self.loader.rows = [(1, ADMIN_FORUM)]
+        self.assertEqual(index.forums_with([3]), frozenset())
+        self.assertEqual(self.loader.calls, 2)
+
+    def test_0060_reload_on_changed_stamp(self):
+        stamp = [1]
+        index = ForumPermissionIndex(self.loader, ttl=0, change_stamp=lambda: stamp[0])
+        index.forums_with([3])
+        index.forums_with([3])
+        self.assertEqual(self.loader.calls, 1)
+
+        stamp[0] = 2
+        self.loader.rows = [(1, ADMIN_FORUM)]
+        self.assertEqual(index.forums_with([3]), frozenset())
+        self.assertEqual(self.loader.calls, 2)
+
+    def test_0070_invalidate(self):
+        index = ForumPermissionIndex(self.loader)
+        index.forums_with([3])
+        index.invalidate()
+        index.forums_with([3])
+        self.assertEqual(self.loader.calls, 2)
+
+
+class TestForumBitsets(unittest.TestCase):
+    def test_0010_matching(self):
+        bitsets = ForumBitsets({1: 0b0110, 2: 0b1000, 3: 0})
+        self.assertEqual(bitsets.matching(0b0100), {1})
+        self.assertEqual(bitsets.matching(0b1010), {1, 2})
+        self.assertEqual(bitsets.matching(0), frozenset())
+
+    def test_0020_python_fallback(self):
+        bitsets = ForumBitsets({1: 0b0110, 2: 0b1000, 3: 1 << 63})
+        vectorized = bitsets.matching(0b1100 | 1 << 63)
+        bitsets._arrays = None
+        self.assertEqual(bitsets.matching(0b1100 | 1 << 63), vectorized)
+        self.assertEqual(vectorized, {1, 2, 3})
+
+    def test_0030_large_mask_ids(self):
+        bitsets = ForumBitsets({1: 1 << 80, 2: 1 << 3})
+        self.assertEqual(bitsets.matching(1 << 80), {1})
+        self.assertEqual(bitsets.matching(1 << 3), {2})
+
+
+class TestGroupMaskCache(unittest.TestCase):
+    def setUp(self):
+        self.loader = CountingLoader([(2, "2"), (3, "3"), (4, "4,3"), (5, "5,")])
+
+    def test_0010_parse_id_list(self):
+        self.assertEqual(parse_id_list("4,3,"), {3, 4})
+        self.assertEqual(parse_id_list(""), frozenset())
+        self.assertEqual(parse_id_list(None), frozenset())
+
+    def test_0020_primary_group(self):
+        cache = GroupMaskCache(self.loader)
+        self.assertEqual(cache.masks_for(3), {3})
+        self.assertEqual(cache.masks_for(4, ""), {3, 4})
+
+    def test_0030_secondary_groups(self):
+        cache = GroupMaskCache(self.loader)
+        self.assertEqual(cache.masks_for(3, "5,2"), {2, 3, 5})
+        self.assertEqual(cache.masks_for(3, "99"), {3})
+        self.assertEqual(cache.masks_for(99, ""), frozenset())
+
+    def test_0040_memoized(self):
+        cache = GroupMaskCache(self.loader)
+        first = cache.masks_for(3, "5")
+        self.assertIs(cache.masks_for(3, "5"), first)
+        cache.masks_for(2, "")
+        self.assertEqual(self.loader.calls, 1)
+
+    def test_0050_reload_after_ttl(self):
+        cache = GroupMaskCache(self.loader, ttl=0)
+        cache.masks_for(3)
+        self.loader.rows = [(3, "3,7")]
+        self.assertEqual(cache.masks_for(3), {3, 7})
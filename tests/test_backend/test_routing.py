@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from db_backend.routing import RoutingSession, RoutingQuery
+
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    origin = Column(String(20))
+    hits = Column(Integer, default=0)
+
+
+class TestRoutingSession(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.primary = self._make_engine("primary")
+        self.replica = self._make_engine("replica")
+        self.make_session = sessionmaker(bind=self.primary, replicas=[self.replica],
+                                         class_=RoutingSession, query_cls=RoutingQuery)
+
+    def _make_engine(self, origin):
+        engine = create_engine("sqlite:///%s" % os.path.join(self.tempdir, "%s.sqlite" % origin))
+        Base.metadata.create_all(engine)
+        engine.execute(Item.__table__.insert(), id=1, origin=origin, hits=0)
+        return engine
+
+    def tearDown(self):
+        self.primary.dispose()
+        self.replica.dispose()
+        shutil.rmtree(self.tempdir)
+
+    def _hits(self, engine):
+        return engine.execute("SELECT hits FROM items WHERE id = 1").scalar()
+
+    def test_0010_reads_from_replica(self):
+        session = self.make_session()
+        self.assertEqual(session.query(Item).get(1).origin, "replica")
+        session.close()
+
+    def test_0020_query_pinned_to_primary(self):
+        session = self.make_session()
+        self.assertEqual(session.query(Item.origin).from_primary().scalar(), "primary")
+        self.assertEqual(session.query(Item.origin).scalar(), "replica")
+        session.close()
+
+    def test_0030_writes_to_primary(self):
+        session = self.make_session()
+        item = session.query(Item).get(1)
+        item.hits += 1
+        session.commit()
+
+        self.assertEqual(self._hits(self.primary), 1)
+        self.assertEqual(self._hits(self.replica), 0)
+        session.close()
+
+    def test_0040_reads_own_writes(self):
+        session = self.make_session()
+        session.add(Item(id=2, origin="new"))
+        session.flush()
+
+        self.assertEqual(session.query(Item.origin).filter_by(id=2).scalar(), "new")
+        self.assertEqual(session.query(Item.origin).filter_by(id=1).from_replica().scalar(), "replica")
+
+        session.close()
+        self.assertEqual(session.query(Item.origin).filter_by(id=1).scalar(), "replica")
+        session.close()
+
+    def test_0050_session_routed_to_primary(self):
+        session = self.make_session()
+        session.route_to_primary()
+        self.assertEqual(session.query(Item).get(1).origin, "primary")
+        session.close()
+
+    def test_0055_increment_on_primary(self):
+        self.primary.execute("UPDATE items SET hits = 7 WHERE id = 1")
+        session = self.make_session()
+        self.assertEqual(session.query(Item.hits).scalar(), 0)
+        session.query(Item).filter_by(id=1).update({Item.hits: Item.hits + 1}, synchronize_session=False)
+        session.commit()
+
+        self.assertEqual(self._hits(self.primary), 8)
+        self.assertEqual(self._hits(self.replica), 0)
+        session.close()
+
+    def test_0060_without_replicas(self):
+        session = sessionmaker(bind=self.primary, class_=RoutingSession, query_cls=RoutingQuery)()
+        self.assertEqual(session.query(Item.origin).scalar(), "primary")
+        self.assertEqual(session.query(Item.origin).from_replica().scalar(), "primary")
+        session.close()
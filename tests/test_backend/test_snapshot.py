@@ -0,0 +1,79 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, ForeignKey
+from db_backend import snapshot
+
+
+class TestSchemaSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.engine = create_engine("sqlite:///%s" % os.path.join(self.tempdir, "db.sqlite"))
+        schema = MetaData()
+        Table("ipb_forums", schema,
+              Column("id", Integer, primary_key=True),
+              Column("name", String(100)))
+        Table("ipb_topics", schema,
+              Column("tid", Integer, primary_key=True),
+              Column("forum_id", Integer),
+              Column("title", String(250)))
+        schema.create_all(self.engine)
+
+        self.reflected = MetaData(bind=self.engine)
+        Table("ipb_forums", self.reflected, autoload=True)
+        Table("ipb_topics", self.reflected,
+              Column("forum_id", Integer, ForeignKey("ipb_forums.id")),
+              autoload=True)
+        self.filename = os.path.join(self.tempdir, "schema.snapshot")
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.tempdir)
+
+    def test_0010_roundtrip(self):
+        snapshot.write_snapshot(self.filename, self.reflected, self.engine)
+        loaded = snapshot.load_snapshot(self.filename, self.engine)
+
+        self.assertIsNotNone(loaded)
+        self.assertIs(loaded.bind, self.engine)
+        self.assertEqual(set(loaded.tables), {"ipb_forums", "ipb_topics"})
+        self.assertEqual([c.name for c in loaded.tables["ipb_topics"].columns], ["tid", "forum_id", "title"])
+        self.assertEqual(len(loaded.tables["ipb_topics"].foreign_keys), 1)
+
+    def test_0020_missing_file(self):
+        self.assertIsNone(snapshot.load_snapshot(self.filename, self.engine))
+
+    def test_0030_checksum_mismatch(self):
+        snapshot.write_snapshot(self.filename, self.reflected, self.engine)
+        with open(self.filename, "rb") as f:
+            stored = pickle.load(f)
+        stored["payload"] += b"garbage"
+        with open(self.filename, "wb") as f:
+            pickle.dump(stored, f)
+
+        self.assertIsNone(snapshot.load_snapshot(self.filename, self.engine))
+
+    def test_0040_other_source(self):
+        snapshot.write_snapshot(self.filename, self.reflected, self.engine)
+        other_engine = create_engine("sqlite:///%s" % os.path.join(self.tempdir, "other.sqlite"))
+
+        self.assertIsNone(snapshot.load_snapshot(self.filename, other_engine))
+
+    def test_0050_fingerprint_detects_changes(self):
+        header = snapshot.write_snapshot(self.filename, self.reflected, self.engine)
+        self.assertEqual(header["fingerprint"], snapshot.reflect_fingerprint(self.engine, header["tables"]))
+
+        self.engine.execute("ALTER TABLE ipb_topics ADD COLUMN views INTEGER")
+        self.assertNotEqual(header["fingerprint"], snapshot.reflect_fingerprint(self.engine, header["tables"]))
+
+    def test_0060_marker_detects_migrations(self):
+        snapshot.write_snapshot(self.filename, self.reflected, self.engine)
+        self.assertIsNotNone(snapshot.load_snapshot(self.filename, self.engine))
+
+        self.engine.execute("ALTER TABLE ipb_topics ADD COLUMN views INTEGER")
+        self.assertEqual(snapshot.snapshot_problem(snapshot.read_snapshot(self.filename), self.engine),
+                         "the database schema changed since the snapshot was taken")
+        self.assertIsNone(snapshot.load_snapshot(self.filename, self.engine))
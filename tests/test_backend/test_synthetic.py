@@ -0,0 +1,78 @@
+import datetime
+import unittest
+
+from db_backend import synthetic
+
+synthetic.use_synthetic_database()
+
+from db_backend import mapping
+from db_backend.mapping.config import connection
+from db_backend.utils import user, timestamps
+
+
+class TestSyntheticDatabase(unittest.TestCase):
+    def tearDown(self):
+        connection.session.remove()
+
+    def test_0010_connection_is_sqlite(self):
+        self.assertEqual(connection.engine.url.drivername, "sqlite")
+
+    def test_0020_scale(self):
+        scale = synthetic.Scale.preset("tiny")
+        self.assertEqual(connection.session.query(mapping.DbPosts).count(), scale.posts)
+        self.assertEqual(connection.session.query(mapping.DbMembers).count(), scale.members)
+        self.assertEqual(connection.session.query(mapping.DbEvents).count(), scale.events)
+
+    def test_0030_member_login(self):
+        member = mapping.DbMembers.by_name("user1")
+        self.assertTrue(member.password_valid(synthetic.PASSWORD))
+        self.assertFalse(member.password_valid("wrong"))
+
+    def test_0040_member_masks(self):
+        for member in connection.session.query(mapping.DbMembers):
+            self.assertIn(member.mgroup, member.perm_masks)
+
+    def test_0045_member_masks_from_groups(self):
+        groups = dict((group.g_id, group.permission_masks) for group in connection.session.query(mapping.DbGroups))
+        for member in connection.session.query(mapping.DbMembers).filter(mapping.DbMembers.mgroup_others != ""):
+            expected = set(groups[member.mgroup])
+            for group_id in member.secondary_group_ids:
+                expected.update(groups.get(group_id, ()))
+            self.assertEqual(member.perm_masks, expected)
+
+    def test_0050_forum_permissions(self):
+        guest_forums = set(f.id for f in mapping.DbForums.guest_readable())
+        member_forums = set(f.id for f in mapping.DbForums.readable_by({synthetic.GROUP_MEMBER}))
+        admin_forums = set(f.id for f in mapping.DbForums.readable_by({synthetic.GROUP_ADMIN}))
+
+        self.assertTrue(guest_forums.issubset(member_forums))
+        self.assertEqual(len(admin_forums), synthetic.Scale.preset("tiny").forums)
+        for forum_id in guest_forums:
+            forum = connection.session.query(mapping.DbForums).get(forum_id)
+            self.assertFalse(forum.perms.is_fulfilled(user.GUEST_MASK, user.ForumPermissions.PERM_REPLY))
+
+    def test_0055_materialized_permissions(self):
+        for masks in (user.GUEST_MASK, {synthetic.GROUP_MEMBER}, {synthetic.GROUP_ADMIN}):
+            readable = connection.session.query(mapping.DbForums.id).filter(
+                mapping.DbForumPerms.permits(mapping.DbForums.id, masks))
+            self.assertEqual(set(row.id for row in readable), mapping.DbForums.readable_ids(masks))
+
+    def test_0057_event_index(self):
+        start = timestamps.now_datetime() - datetime.timedelta(days=30)
+        end = start + datetime.timedelta(days=60)
+        forum_ids = mapping.DbForums.readable_ids({synthetic.GROUP_MEMBER})
+        queried = mapping.DbEvents.query_between(start, end).join(mapping.DbEvents.topic) \
+            .filter(mapping.DbTopics.forum_id.in_(forum_ids))
+        self.assertEqual(sorted(mapping.DbEvents.ids_between(start, end, forum_ids=forum_ids)),
+                         sorted(event.event_id for event in queried))
+
+    def test_0060_message_folders(self):
+        for member in connection.session.query(mapping.DbMembers).limit(10):
+            dirs = member.extra.virtual_dirs()
+            for folder in ("in", "sent"):
+                count = mapping.DbMessageTopics.for_user(member).filter_by(mt_vid_folder=folder).count()
+                self.assertEqual(dirs[folder].message_count, count)
+
+    def test_0070_album_thumbnails(self):
+        for album in connection.session.query(mapping.DbPixAlbums):
+            self.assertEqual(album.thumbnail.aid, album.a_id)
@@ -1,7 +1,8 @@
 from datetime import MAXYEAR, timedelta
 import unittest
 from db_backend.utils import timestamps
-from db_backend.utils.user import exma_passhash, ApiUser, GUEST_MASK, parse_permissions, ForumPermissions, UserBan
+from db_backend.utils.user import exma_passhash, ApiUser, GUEST_MASK, parse_permissions, ForumPermissions, UserBan, \
+    mask_bits, parse_permission_bits
 
 
 class TestPasswordHandling(unittest.TestCase):
@@ -108,6 +109,24 @@ class TestForumPermissions(unittest.TestCase):
             for mask in range(0, 11):
                 self.assertFalse(perm.is_fulfilled((mask,), permission))
 
+    def test_0060_bitset_masks(self):
+        perm = ForumPermissions(self.permission_full_ref)
+        self.assertTrue(perm.is_fulfilled(mask_bits([11, 10]), ForumPermissions.PERM_READ))
+        self.assertFalse(perm.is_fulfilled(mask_bits([0, 11, 70]), ForumPermissions.PERM_READ))
+
+
+class TestMaskBits(unittest.TestCase):
+    def test_0010_fold_masks(self):
+        self.assertEqual(mask_bits([]), 0)
+        self.assertEqual(mask_bits((0, 3)), 0b1001)
+        self.assertEqual(mask_bits({2, 2, 100}), (1 << 2) | (1 << 100))
+
+    def test_0020_parse_bits(self):
+        bits = parse_permission_bits(TestForumPermissions.permission_full_ref)
+        self.assertEqual(bits[ForumPermissions.PERM_READ], mask_bits(range(1, 11)))
+        self.assertEqual(parse_permission_bits(TestForumPermissions.permission_empty_ref)[ForumPermissions.PERM_SHOW], 0)
+        self.assertEqual(parse_permission_bits(""), {})
+
 
 class TestUserBanning(unittest.TestCase):
     def _make_ban(self, start, end=None, duration=9999, unit="d"):
@@ -0,0 +1,89 @@
+from datetime import timedelta
+import unittest
+from db_backend.utils import timestamps
+from db_backend.utils.user import UserBan
+from db_backend.utils.user_cache import UserCache, UserSnapshot
+
+
+class FakeMember(object):
+    def __init__(self, member_id, ban=None):
+        self.id = member_id
+        self.name = "user%d" % member_id
+        self.perm_masks = {3, member_id}
+        self.ban = ban
+        self.signature = "signature of %d" % member_id
+
+
+class FakeMembers(object):
+    def __init__(self, *members):
+        self.members = dict((member.id, member) for member in members)
+        self.loads = []
+
+    def __call__(self, member_id):
+        self.loads.append(member_id)
+        return self.members.get(member_id)
+
+
+class TestUserCache(unittest.TestCase):
+    def setUp(self):
+        now = timestamps.now_datetime()
+        self.active_ban = UserBan(now - timedelta(hours=1), now + timedelta(hours=1), timedelta(hours=2))
+        self.members = FakeMembers(FakeMember(1), FakeMember(2), FakeMember(3, self.active_ban))
+
+    def test_0010_snapshot(self):
+        cache = UserCache(self.members)
+        snapshot = cache.snapshot(1)
+        self.assertEqual(snapshot, UserSnapshot(1, "user1", frozenset({1, 3}), None))
+        self.assertFalse(snapshot.is_banned())
+        self.assertIsNone(cache.snapshot(42))
+
+    def test_0020_cached(self):
+        cache = UserCache(self.members)
+        first = cache.snapshot(1)
+        self.assertIs(cache.snapshot(1), first)
+        self.assertEqual(self.members.loads, [1])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_0030_ttl(self):
+        cache = UserCache(self.members, ttl=0)
+        cache.snapshot(1)
+        cache.snapshot(1)
+        self.assertEqual(self.members.loads, [1, 1])
+
+    def test_0040_lru(self):
+        cache = UserCache(self.members, max_size=2)
+        cache.snapshot(1)
+        cache.snapshot(2)
+        cache.snapshot(1)
+        cache.snapshot(3)
+        self.assertEqual(len(cache), 2)
+        cache.snapshot(1)
+        cache.snapshot(2)
+        self.assertEqual(self.members.loads, [1, 2, 3, 2])
+
+    def test_0050_invalidate(self):
+        cache = UserCache(self.members)
+        cache.snapshot(1)
+        cache.snapshot(2)
+        cache.invalidate(1)
+        cache.snapshot(1)
+        cache.snapshot(2)
+        self.assertEqual(self.members.loads, [1, 2, 1])
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_0060_banned_user(self):
+        cache = UserCache(self.members)
+        user = cache.get(3)
+        self.assertTrue(user.is_banned())
+        self.assertFalse(user.authenticated())
+        self.assertTrue(cache.get(1).authenticated())
+
+    def test_0070_lazy_member(self):
+        cache = UserCache(self.members)
+        user = cache.get(2)
+        self.assertEqual((user.id, user.name, user.perm_masks), (2, "user2", {2, 3}))
+        self.assertEqual(self.members.loads, [2])
+        self.assertEqual(user.signature, "signature of 2")
+        self.assertEqual(self.members.loads, [2, 2])
+        self.assertRaises(AttributeError, getattr, user, "unknown")